@@ -1,5 +1,10 @@
 import re
 import os.path
+import time
+import shutil
+import tempfile
+import contextlib
+import concurrent.futures
 
 import click
 import numpy as np
@@ -12,6 +17,7 @@ import parse
 
 from . import pyrnet
 from . import data as pyrdata
+from . import logger as pyrlogger
 from . import utils as pyrutils
 from . import reports as pyrreports
 
@@ -34,6 +40,191 @@ def cli():
 def process():
     print("Process")
 
+def _get_report(report, date_of_maintenance, cfg):
+    # parse maintenance reports
+    if report is None:
+        df_report = None
+    elif report=="online":
+        df_report = pyrreports.get_responses(fn=None, online=cfg["online"])
+    else:
+        df_report = pyrreports.get_responses(fn=report)
+
+    if date_of_maintenance is None:
+        return df_report
+    return pyrreports.parse_report(df_report,
+                                   date_of_maintenance=np.datetime64(date_of_maintenance))
+
+def _parsed_session(cfg):
+    # session with parsed config and meta data files, pickled with its cache to the workers
+    session = pyrdata.ProcessingSession(cfg)
+    session.sconfig
+    session.get_cfmeta()
+    session.meta_index
+    return session
+
+def _station_id(fn, cfg):
+    # station number from the raw file name, None if not found
+    m = re.compile(cfg['filename_parser']).match(os.path.basename(fn))
+    return None if m is None else int(m.group('ID'))
+
+def _stale_files(manifest, level, files, cfg, force=False, report=None):
+    # input files to process and their manifest keys, up to date files are skipped
+    if manifest is None:
+        return files, [None]*len(files)
+    stale, keys = [], []
+    for fn in files:
+        station = None if report is None else _station_id(fn, cfg)
+        key = manifest.task_key([fn], cfg, report=report, station=station)
+        if not force and manifest.is_current(f"{level}:{fn}", key):
+            logging.info(f"{fn} is up to date. Skip.")
+            continue
+        stale.append(fn)
+        keys.append(key)
+    if len(stale) < len(files):
+        click.echo(f"Skip {len(files)-len(stale)} of {len(files)} input files, which are up to date.")
+    return stale, keys
+
+def _raw_to_l1a(fn, report, cfg, session, records=None):
+    filename = os.path.basename(fn)
+    m = re.compile(cfg['filename_parser']).match(filename)
+    try:
+        stationid = int(m.group('ID'))
+    except:
+        raise ValueError(f"Could not find station id in filename {filename} using regex {cfg['filename_parser']}.")
+    logging.info(f"found station number {stationid}")
+
+    return pyrdata.to_l1a(
+        fname=fn,
+        station=stationid,
+        date_of_measure=np.datetime64(cfg['date_of_measure']),
+        report=report,
+        global_attrs=cfg['global_attrs'],
+        records=records,
+        session=session
+    )
+
+@contextlib.contextmanager
+def _atomic_output(outfile, update=False):
+    # write to a temporary file and rename it to outfile on success,
+    # a crashed process never leaves a truncated file. With update, the temporary
+    # file starts as a copy of outfile. Zarr stores are replaced by pyrnet.data itself.
+    if outfile.endswith(".zarr"):
+        yield outfile
+        return
+    tmpfile = outfile + ".tmp"
+    if update and os.path.exists(outfile):
+        shutil.copy2(outfile, tmpfile)
+    try:
+        yield tmpfile
+        os.replace(tmpfile, outfile)
+    finally:
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+
+# state of the pool workers, set once per process by _init_worker
+_worker = {}
+
+def _init_worker(cfg, session, report=None):
+    # parsed config, meta data files and maintenance report of the worker
+    _worker.update(cfg=cfg, session=session, report=report)
+
+def _write(func, *args):
+    # run the write call func(*args) in the background writer of this process,
+    # or at once if there is none
+    writer = _worker.get("writer")
+    if writer is None:
+        return func(*args)
+    _worker["writes"].append(writer.submit(func, *args))
+
+def _readahead(path, blocksize=2**24):
+    # read a file (or the files of a zarr store) once, to have it in the page cache
+    # when it is opened by the next task
+    fnames = [path]
+    if os.path.isdir(path):
+        fnames = [os.path.join(root, fn) for root, _, fns in os.walk(path) for fn in fns]
+    for fname in fnames:
+        with open(fname, "rb") as f:
+            while f.read(blocksize):
+                pass
+
+def _run_tasks(func, tasks, jobs, label, read=None):
+    # run func(*task) for all tasks, serially or in a process pool with the state of
+    # this process. Results and failures are reported in order of the tasks.
+    # Serially, the tasks are pipelined: read(*task) of the next task runs in a background
+    # thread and is passed to func as keyword data, and the writes of func run in a background
+    # writer. A task fails, if one of its writes fails.
+    results = [None]*len(tasks)
+    errors = {}
+    writes = [[] for _ in tasks]
+    with contextlib.ExitStack() as stack:
+        if jobs < 2:
+            _worker["writer"] = stack.enter_context(pyrutils.BackgroundWriter())
+            stack.callback(_worker.pop, "writer")
+            inputs = pyrutils.prefetch(lambda task: None if read is None else read(*task), tasks)
+            stack.callback(inputs.close)
+        else:
+            pool = stack.enter_context(concurrent.futures.ProcessPoolExecutor(
+                jobs,
+                initializer=_init_worker,
+                initargs=(_worker["cfg"], _worker["session"], _worker["report"])
+            ))
+            futures = [pool.submit(func, *task) for task in tasks]
+        with click.progressbar(length=len(tasks), label=label) as bar:
+            for i, task in enumerate(tasks):
+                try:
+                    if jobs < 2:
+                        _, data = next(inputs)
+                        _worker["writes"] = writes[i]
+                        results[i] = func(*task, **({} if read is None else {"data": data.result()}))
+                    else:
+                        results[i] = futures[i].result()
+                except Exception as e:
+                    errors[i] = e
+                bar.update(1)
+    # all background writes are done
+    for i, futures in enumerate(writes):
+        for future in futures:
+            if i not in errors and future.exception() is not None:
+                errors[i] = future.exception()
+    failed = []
+    for i in sorted(errors):
+        logger.error(f"{label} {tasks[i][0]} failed: {errors[i]}", exc_info=errors[i])
+        click.echo(f"{label} failed: {tasks[i][0]}", err=True)
+        failed.append(tasks[i][0])
+    return results, failed
+
+def _read_raw(fn, *args):
+    # parsed record blocks of a raw file, read ahead of _raw_to_l1a. Only a few blocks are
+    # parsed ahead, the blocks are streamed to to_l1a as with reading the file directly.
+    cfg = _worker["cfg"]
+    return pyrutils.BackgroundReader(
+        pyrdata.iter_raw_records(fn, date_of_measure=np.datetime64(cfg['date_of_measure']), config=cfg)
+    )
+
+def _write_l1a(ds, outfile, profile):
+    with _atomic_output(outfile) as tmpfile:
+        pyrdata.to_netcdf(ds, tmpfile, timevar="gpstime", profile=profile)
+
+def _save_l1a(ds, output_path, cfg, sfx="nc", profile=None):
+    outfile = os.path.join(
+        output_path,
+        pyrdata.get_fname(ds, freq="10Hz", timevar="gpstime", sfx=sfx, config=cfg)
+    )
+    _write(_write_l1a, ds, outfile, profile)
+    return outfile
+
+def _l1a_file(fn, output_path, sfx, profile, data=None):
+    # raw -> l1a of one file, data are the parsed records if read ahead
+    filename = os.path.basename(fn)
+    logging.info(f"start raw->l1a: {filename}")
+    ds = _raw_to_l1a(fn, _worker["report"], _worker["cfg"], _worker["session"], records=data)
+    if ds is None:
+        logging.warning(f"Skip {filename}.")
+        return None
+    outfile = _save_l1a(ds, output_path, _worker["cfg"], sfx=sfx, profile=profile)
+    logging.info(f"l1a saved to {outfile}")
+    return outfile
+
 @click.command("l1a")
 @click.argument("input_files", nargs=-1)
 @click.argument("output_path", nargs=1)
@@ -44,19 +235,110 @@ def process():
               help="Specify the maintenance report file. If empty or 'online' it attempts to request it online.")
 @click.option("--date_of_maintenance",
               help="Specify date of maintenance as datetime64 string ('YYYY-MM-DD'). If not specified, try to retrieve from data.")
+@click.option("--cache_dir",
+              help="Specify the directory of the parsed record cache. Overrides 'cache_dir' of the config.")
+@click.option("--zarr", is_flag=True,
+              help="Write Zarr stores instead of netCDF files.")
+@click.option("--encoding_profile",
+              type=click.Choice(list(pyrdata.ENCODING_PROFILES)),
+              help="Chunking and compression profile of the netCDF output. If not specified, the netCDF library defaults are used.")
+@click.option("--jobs","-j", type=int, default=1, show_default=True,
+              help="Number of files processed in parallel.")
+@click.option("--manifest",
+              help="Path of the SQLite processing manifest. Input files, which are recorded with unchanged input, config, meta data files and report, are skipped.")
+@click.option("--force", is_flag=True,
+              help="Only with --manifest. Process all input files anyway and record them.")
 def process_l1a(input_files,
                 output_path,
                 config,
                 report,
-                date_of_maintenance):
+                date_of_maintenance,
+                cache_dir,
+                zarr,
+                encoding_profile,
+                jobs,
+                manifest,
+                force):
     if config is not None:
         config = pyrutils.read_json(config)
     cfg = pyrdata.get_config(config)
+    if cache_dir is not None:
+        cfg["cache_dir"] = cache_dir
+    # parse config, meta data files and report once for all input files and workers
+    session = _parsed_session(cfg)
+    report = _get_report(report, date_of_maintenance, cfg)
+    _init_worker(cfg, session, report)
 
-    # filename parser
-    parse = re.compile(cfg['filename_parser'])
+    sfx = "zarr" if zarr else "nc"
+    manifest = None if manifest is None else pyrdata.ProcessingManifest(manifest)
+    files, keys = _stale_files(
+        manifest, "l1a", [os.path.abspath(fn) for fn in input_files], cfg, force=force, report=report
+    )
+    tasks = [(fn, output_path, sfx, encoding_profile) for fn in files]
+    results, failed = _run_tasks(_l1a_file, tasks, jobs, label='Processing', read=_read_raw)
+    if manifest is not None:
+        for fn, key, outfile in zip(files, keys, results):
+            if fn not in failed:
+                manifest.record(f"l1a:{fn}", key, [] if outfile is None else [outfile])
+        manifest.close()
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(tasks)} files failed.")
+
+
+def _concat_l1a(ds, dsnew):
+    # l1a records of dsnew following the records of ds,
+    # maintenance flags and attributes are taken from dsnew
+    adc = xr.concat([d.drop_dims(["gpstime", "maintenancetime"]) for d in (ds, dsnew)], dim="adctime")
+    gps = xr.concat([d.drop_dims(["adctime", "maintenancetime"]) for d in (ds, dsnew)], dim="gpstime")
+    maintenance = dsnew.drop_dims(["adctime", "gpstime"])
+    dsc = xr.merge([adc, gps, maintenance], combine_attrs="override")
+    dsc.attrs = dict(dsnew.attrs)
+    return dsc
+
+
+@click.command("follow")
+@click.argument("input_file", nargs=1)
+@click.argument("output_path", nargs=1)
+@click.option("--config","-c",
+              nargs=1,
+              help="Specify config files with override the default config.")
+@click.option("--report","-r",
+              help="Specify the maintenance report file. If empty or 'online' it attempts to request it online.")
+@click.option("--l1b", is_flag=True,
+              help="Generate the daily l1b products from the new records as well. The l1b files of the days reached by new records are updated.")
+@click.option("--interval", default=5., show_default=True,
+              help="Seconds to wait between polls of the input file.")
+@click.option("--timeout", type=float,
+              help="Stop, if the input file did not grow for the given seconds. Follow forever if not specified.")
+def process_follow(input_file,
+                   output_path,
+                   config,
+                   report,
+                   l1b,
+                   interval,
+                   timeout):
+    """Follow a raw logger file, which is still written, and update the l1a (and l1b) product.
+
+    Only the records appended since the last poll are converted and appended to the l1a file.
+    The GPS to ADC time fit is updated with the new GPS records and only the new samples are
+    processed to l1b and merged into the daily l1b files. Samples already done keep the
+    calibration and time synchronization of the data at that time. Run the l1b processing
+    on the final l1a file to get the product of the complete file.
+    """
+    if config is not None:
+        config = pyrutils.read_json(config)
+    cfg = pyrdata.get_config(config)
+    # parse config and meta data files once for all updates
+    session = pyrdata.ProcessingSession(cfg)
+
+    filename = os.path.basename(input_file)
+    m = re.compile(cfg['filename_parser']).match(filename)
+    try:
+        stationid = int(m.group('ID'))
+    except:
+        raise ValueError(f"Could not find station id in filename {filename} using regex {cfg['filename_parser']}.")
+    logging.info(f"follow {filename}, station number {stationid}")
 
-    # parse maintenance reports
     if report is None:
         df_report = None
     elif report=="online":
@@ -64,44 +346,139 @@ def process_l1a(input_files,
     else:
         df_report = pyrreports.get_responses(fn=report)
 
-    if date_of_maintenance is None:
-        report = df_report
-    else:
-        report = pyrreports.parse_report(df_report,
-                                  date_of_maintenance=np.datetime64(date_of_maintenance))
-
-    with click.progressbar(input_files,label='Processing') as files:
-        for fn in files:
-            filepath = os.path.abspath(fn)
-            filename = os.path.basename(filepath)
-            logging.info(f"start raw->l1a: {filename}")
-
-            m = parse.match(filename)
-            try:
-                stationid = int(m.group('ID'))
-            except:
-                raise ValueError(f"Could not find station id in filename {filename} using regex {config['filename_parser']}.")
-            logging.info(f"found station number {stationid}")
-
-            ds = pyrdata.to_l1a(
-                fname=fn,
-                station=stationid,
-                date_of_measure=np.datetime64(cfg['date_of_measure']),
-                report=report,
-                config=cfg,
-                global_attrs=cfg['global_attrs']
-            )
-            if ds is None:
-                logging.warning(f"Skip {filename}.")
+    date_of_measure = np.datetime64(cfg['date_of_measure'])
+    stripminutes = np.timedelta64(int(cfg['stripminutes']), 'm')
+    follower = pyrlogger.RecordFollower(input_file, date_of_measure)
+    # records not converted yet, to_l1a needs at least three GPS records
+    rec_adc, rec_gprmc = [], []
+    # end of the converted records: number of ADC records, last ADC record and its time, last GPS time
+    last = None
+    l1afile = None
+    # l1b: fit of the GPS to the ADC time of the converted records, converted records
+    # not processed to l1b yet and the end of the processed period
+    sync, pending, tdone = None, None, None
+    idle = 0.
+    while True:
+        iadc = follower.iadc
+        adc, gprmc = follower.read()
+        if follower.iadc != iadc + adc.shape[0]:
+            # the file has been truncated, build the product from scratch
+            rec_adc, rec_gprmc, last = [], [], None
+        if not (adc.shape[0] or gprmc.size):
+            if timeout is not None and idle>=timeout:
+                logging.info(f"{filename} did not grow for {timeout} s, stop following.")
+                return
+            time.sleep(interval)
+            idle += interval
+            continue
+        idle = 0.
+        if adc.shape[0]:
+            rec_adc.append(adc)
+        rec_gprmc.append(gprmc)
+        if not rec_adc:
+            continue
+
+        # convert only the new records, the ADC time continues from the last converted ADC record
+        tail_adc = np.concatenate(rec_adc if last is None else [last["adc"]] + rec_adc)
+        ds = pyrdata.to_l1a(
+            fname=input_file,
+            station=stationid,
+            date_of_measure=date_of_measure,
+            report=df_report,
+            global_attrs=cfg['global_attrs'],
+            records=[(tail_adc, np.concatenate(rec_gprmc))],
+            session=session
+        )
+        if ds is None:
+            continue
+        rec_adc, rec_gprmc = [], []
+
+        if last is None:
+            head = ds.isel(adctime=slice(0, 0), gpstime=[0])
+            ds.encoding["unlimited_dims"] = {"adctime", "gpstime"}
+            appended = False
+        else:
+            ds = ds.isel(adctime=slice(1, None), gpstime=ds.gpstime.values > last["gpstime"])
+            ds = ds.assign_coords(adctime=ds.adctime.values + last["adctime"])
+            if not pyrdata.append_netcdf_l1a(ds, l1afile):
+                # not written by follow, build the product from scratch
+                logging.warning(f"Can not append to {l1afile}, rewrite it.")
+                follower.reset()
+                rec_adc, rec_gprmc, last = [], [], None
                 continue
+            appended = True
+
+        # iadc of the GPS records counts the ADC records from the start of the file
+        if last is None:
+            sync, pending, tdone = pyrlogger.AdcTimeSync(), None, None
+            adctime, iadc = ds.adctime.values, ds.iadc.values[:,0].astype(int)
+        else:
+            adctime = np.concatenate(([last["adctime"]], ds.adctime.values))
+            iadc = ds.iadc.values[:,0].astype(int) - last["nadc"] + 1
+        sync.update(adctime.astype('timedelta64[ms]')[np.clip(iadc, 0, adctime.size-1)], ds.gpstime.values)
+
+        tprev = None if last is None else last["gpstime"]
+        last = dict(
+            nadc=ds.adctime.size + (0 if tprev is None else last["nadc"]),
+            adc=tail_adc[-1:],
+            adctime=ds.adctime.values[-1],
+            gpstime=ds.gpstime.values[-1] if ds.gpstime.size else tprev
+        )
 
+        if appended:
+            # the filename changes with the covered period
+            period = pd.to_timedelta(last["gpstime"] - head.gpstime.values[0]).floor("s").isoformat()
+            outfile = os.path.join(
+                output_path,
+                pyrdata.get_fname(head, freq="10Hz", period=period, timevar="gpstime", sfx="nc", config=cfg)
+            )
+            if outfile!=l1afile:
+                os.replace(l1afile, outfile)
+        else:
             outfile = os.path.join(
                 output_path,
                 pyrdata.get_fname(ds, freq="10Hz", timevar="gpstime", sfx="nc", config=cfg)
             )
+            # replace the product at once, readers never see a partial file
+            with _atomic_output(outfile) as tmpfile:
+                pyrdata.to_netcdf(ds, tmpfile, timevar="gpstime")
+            if l1afile is not None and l1afile!=outfile:
+                os.remove(l1afile)
+        l1afile = outfile
+        logging.info(f"l1a updated {outfile}")
 
-            pyrdata.to_netcdf(ds, outfile, timevar="gpstime")
-            logging.info(f"l1a saved to {outfile}")
+        if not l1b:
+            continue
+        pending = ds if pending is None else _concat_l1a(pending, ds)
+        if not sync.check():
+            continue
+        # the l1b product ends at the last full l1b interval before the last record minus stripminutes,
+        # the samples after it stay pending for the next poll
+        if tdone is None:
+            tdone = pd.Timestamp(sync.to_utc(np.timedelta64(0, 'ms')) + stripminutes).ceil(cfg["l1bfreq"]).to_datetime64()
+        tbound = pd.Timestamp(sync.to_utc(last["adctime"]) - stripminutes).floor(cfg["l1bfreq"]).to_datetime64()
+        if tbound <= tdone:
+            continue
+        for dsd in pyrdata.iter_l1b_daily(
+            pending,
+            global_attrs=cfg['global_attrs'],
+            session=session,
+            sync=sync,
+            period=(tdone, tbound)
+        ):
+            outfile = os.path.join(
+                output_path,
+                pyrdata.get_fname(dsd, period="P1D", freq=cfg["l1bfreq"], timevar="time", sfx="nc", config=cfg)
+            )
+            pyrdata.to_netcdf_l1b(dsd, outfile, freq=cfg["l1bfreq"], session=session)
+            logging.info(f"l1b updated {outfile}")
+        tdone = tbound
+        # keep the samples after tbound and the GPS records from the last one before tbound
+        gpstime = pending.gpstime.values
+        pending = pending.isel(
+            adctime=slice(np.searchsorted(sync.to_utc(pending.adctime.values), tbound), None),
+            gpstime=slice(max(np.searchsorted(gpstime, tbound, side='right')-1, 0), None)
+        )
 
 
 @click.command("l1b")
@@ -110,43 +487,189 @@ def process_l1a(input_files,
 @click.option("--config","-c",
               nargs=1,
               help="Specify config files with override the default config.")
+@click.option("--from_raw", is_flag=True,
+              help="Input files are logger raw files, which are processed to l1b in memory without the l1a netCDF.")
+@click.option("--report","-r",
+              help="Only with --from_raw. Specify the maintenance report file. If empty or 'online' it attempts to request it online.")
+@click.option("--date_of_maintenance",
+              help="Only with --from_raw. Specify date of maintenance as datetime64 string ('YYYY-MM-DD'). If not specified, try to retrieve from data.")
+@click.option("--cache_dir",
+              help="Only with --from_raw. Specify the directory of the parsed record cache. Overrides 'cache_dir' of the config.")
+@click.option("--l1a_path",
+              help="Only with --from_raw. Save the l1a files to this directory as well.")
+@click.option("--zarr", is_flag=True,
+              help="Write Zarr stores instead of netCDF files.")
+@click.option("--encoding_profile",
+              type=click.Choice(list(pyrdata.ENCODING_PROFILES)),
+              help="Chunking and compression profile of the netCDF output. If not specified, the netCDF library defaults are used.")
+@click.option("--jobs","-j", type=int, default=1, show_default=True,
+              help="Number of files processed in parallel.")
+@click.option("--manifest",
+              help="Path of the SQLite processing manifest. Input files, which are recorded with unchanged input, config, meta data files and report, are skipped.")
+@click.option("--force", is_flag=True,
+              help="Only with --manifest. Process all input files anyway and record them.")
 def process_l1b(input_files: list[str],
                 output_path: str,
-                config:str):
+                config:str,
+                from_raw: bool,
+                report: str,
+                date_of_maintenance: str,
+                cache_dir: str,
+                l1a_path: str,
+                zarr: bool,
+                encoding_profile: str,
+                jobs: int,
+                manifest: str,
+                force: bool):
 
     if config is not None:
         config = pyrutils.read_json(config)
     cfg = pyrdata.get_config(config)
+    if cache_dir is not None:
+        cfg["cache_dir"] = cache_dir
+    # parse config, meta data files and report once for all input files and workers
+    session = _parsed_session(cfg)
+    if from_raw:
+        report = _get_report(report, date_of_maintenance, cfg)
+    _init_worker(cfg, session, report if from_raw else None)
+    sfx = "zarr" if zarr else "nc"
+    manifest = None if manifest is None else pyrdata.ProcessingManifest(manifest)
+    files, keys = _stale_files(
+        manifest, "l1b", [os.path.abspath(fn) for fn in input_files], cfg,
+        force=force, report=report if from_raw else None
+    )
 
-    with click.progressbar(input_files,label='Processing') as files:
-        for fn in files:
-            filepath = os.path.abspath(fn)
-            filename = os.path.basename(filepath)
-            logging.info(f"start l1a->l1b: {filename}")
+    with tempfile.TemporaryDirectory(dir=output_path) as tmpdir:
+        # process l1b of every input file first. Days with a single input file are written
+        # at once, days of several input files are stored in a temporary directory and
+        # routed to one writer per output file
+        shared = _shared_days(files, cfg, from_raw)
+        tasks = [
+            (fn, output_path, tmpdir, i, sfx, from_raw, l1a_path, encoding_profile, shared)
+            for i, fn in enumerate(files)
+        ]
+        results, failed = _run_tasks(_l1b_file, tasks, jobs, label='Processing', read=_read_l1b)
+        days = {}
+        for result in results:
+            for outfile, tmpfile, _ in result or []:
+                if tmpfile is not None:
+                    days.setdefault(outfile, []).append(tmpfile)
 
-            ds = pyrdata.to_l1b(
-                filepath,
-                config=config,
-                global_attrs=cfg['global_attrs']
-            )
-            if ds is None:
-                logger.debug(f"{filename} is skipped.")
-                continue
+        # merge the daily datasets into the output files in order of the input files
+        tasks = [(outfile, days[outfile], encoding_profile) for outfile in days]
+        _, failed_writes = _run_tasks(_l1b_write, tasks, jobs, label='Writing', read=_read_days)
+    if manifest is not None:
+        for fn, key, result in zip(files, keys, results):
+            outfiles = sorted(set(outfile for outfile, _, _ in result or []))
+            if fn not in failed and not any(outfile in failed_writes for outfile in outfiles):
+                manifest.record(f"l1b:{fn}", key, outfiles)
+        manifest.close()
+    if failed or failed_writes:
+        raise click.ClickException(
+            f"{len(failed)} of {len(files)} files and {len(failed_writes)} of {len(days)} merged outputs failed."
+        )
 
-            box = int(ds.station.values[0])
-            udays = np.unique(ds.time.values.astype("datetime64[D]"))
-            for day in udays:
-                day = pd.to_datetime(day)
-                logging.info(f"process day {day:%Y-%m-%d}")
-                dsd = ds.sel(time=f"{day:%Y-%m-%d}")
+def _read_l1b(fn, output_path, tmpdir, ifile, sfx, from_raw, *args):
+    # parsed records of a raw file, or an l1a file in the page cache, read ahead of _l1b_file.
+    # The l1a file is not loaded, it is read one day at a time.
+    if from_raw:
+        return _read_raw(fn)
+    _readahead(fn)
 
-                outfile = os.path.join(
-                    output_path,
-                    pyrdata.get_fname(dsd, period="P1D", freq=cfg["l1bfreq"], timevar="time", sfx="nc", config=cfg)
-                )
+def _save_day(ds, fname):
+    # storage layout of the l1a file does not apply
+    ds["maintenancetime"].encoding.pop("contiguous", None)
+    ds.to_netcdf(fname)
+
+def _shared_days(files, cfg, from_raw):
+    # (station, day) of the l1b files, which several input files contribute to. The days of
+    # raw files are not known before processing, all days of a station are shared (station, None)
+    # if the station has several raw files.
+    count = {}
+    for fn in files:
+        if from_raw:
+            keys = [(_station_id(fn, cfg), None)]
+        else:
+            with xr.open_dataset(fn) as ds:
+                station = int(ds.station.values[0])
+                days = np.arange(
+                    ds.gpstime.values.min().astype("datetime64[D]"),
+                    ds.gpstime.values.max().astype("datetime64[D]") + np.timedelta64(1, "D")
+                ).astype(str)
+            keys = [(station, day) for day in days]
+        for key in keys:
+            count[key] = count.get(key, 0) + 1
+    return {key for key, n in count.items() if n > 1}
+
+def _l1b_file(fn, output_path, tmpdir, ifile, sfx, from_raw, l1a_path, profile, shared=None, data=None):
+    # l1a (or raw) -> daily l1b datasets of one file, returns output file, temporary file and
+    # day of every dataset. Days in shared (all days if None) are saved to tmpdir to be merged
+    # with the other input files, the others are written to the output file at once (no temporary file).
+    cfg, session = _worker["cfg"], _worker["session"]
+    filename = os.path.basename(fn)
+    if from_raw:
+        logging.info(f"start raw->l1b: {filename}")
+        l1a = _raw_to_l1a(fn, _worker["report"], cfg, session, records=data)
+        if l1a is None:
+            logging.warning(f"Skip {filename}.")
+            return []
+        if l1a_path is not None:
+            outfile = _save_l1a(l1a, l1a_path, cfg, sfx=sfx, profile=profile)
+            logging.info(f"l1a saved to {outfile}")
+    else:
+        logging.info(f"start l1a->l1b: {filename}")
+        l1a = fn
+
+    # process one day at a time to limit memory usage
+    days = []
+    for dsd in pyrdata.iter_l1b_daily(
+        l1a,
+        global_attrs=cfg['global_attrs'],
+        session=session
+    ):
+        day = pd.to_datetime(dsd.time.values[0])
+        logging.info(f"process day {day:%Y-%m-%d}")
 
-                pyrdata.to_netcdf_l1b(dsd, fname=outfile, freq=cfg["l1bfreq"])
-                logging.info(f"l1b saved to {outfile}")
+        outfile = os.path.join(
+            output_path,
+            pyrdata.get_fname(dsd, period="P1D", freq=cfg["l1bfreq"], timevar="time", sfx=sfx, config=cfg)
+        )
+        dstr = np.datetime_as_string(dsd.time.values[0], unit='D')
+        station = int(dsd.station.values[0])
+        if shared is not None and (station, dstr) not in shared and (station, None) not in shared:
+            _write(_l1b_write, outfile, [], profile, [dsd])
+            days.append((outfile, None, dstr))
+            continue
+        tmpfile = os.path.join(tmpdir, f"{ifile}_{len(days)}.nc")
+        _write(_save_day, dsd, tmpfile)
+        days.append((outfile, tmpfile, dstr))
+    if len(days)==0:
+        logger.debug(f"{filename} is skipped.")
+    return days
+
+def _read_days(outfile, fnames, *args):
+    # daily datasets, read ahead of _l1b_write and _l1b_network_day
+    return [xr.load_dataset(fn) for fn in fnames]
+
+def _l1b_write(outfile, fnames, profile=None, data=None):
+    # the only writer of outfile, merges the daily datasets one after another
+    cfg, session = _worker["cfg"], _worker["session"]
+    if data is None:
+        data = map(xr.load_dataset, fnames)
+    with _atomic_output(outfile, update=True) as tmpfile:
+        for ds in data:
+            pyrdata.to_netcdf_l1b(ds, fname=tmpfile, freq=cfg["l1bfreq"], session=session, profile=profile)
+    logging.info(f"l1b saved to {outfile}")
+    return outfile
+
+def _l1b_network_day(outfile, fnames, profile=None, data=None):
+    # assemble one network day file from the l1b datasets of all stations
+    cfg, session = _worker["cfg"], _worker["session"]
+    dslist = _read_days(outfile, fnames) if data is None else data
+    with _atomic_output(outfile, update=True) as tmpfile:
+        pyrdata.to_netcdf_l1b(dslist, fname=tmpfile, freq=cfg["l1bfreq"], session=session, profile=profile)
+    logging.info(f"l1b_network saved to {outfile}")
+    return outfile
 
 @click.command("l1b_network")
 @click.argument("input_files", nargs=-1)
@@ -154,13 +677,32 @@ def process_l1b(input_files: list[str],
 @click.option("--config","-c",
               nargs=1,
               help="Specify config files with override the default config.")
+@click.option("--jobs","-j", type=int, default=1, show_default=True,
+              help="Number of network days assembled in parallel.")
+@click.option("--manifest",
+              help="Path of the SQLite processing manifest. Input files, which are recorded with unchanged input, config, meta data files and report, are skipped.")
+@click.option("--force", is_flag=True,
+              help="Only with --manifest. Process all input files anyway and record them.")
+@click.option("--zarr", is_flag=True,
+              help="Write Zarr stores instead of netCDF files.")
+@click.option("--encoding_profile",
+              type=click.Choice(list(pyrdata.ENCODING_PROFILES)),
+              help="Chunking and compression profile of the netCDF output. If not specified, the netCDF library defaults are used.")
 def process_l1b_network(input_files: list[str],
                 output_path: str,
-                config:str):
+                config:str,
+                jobs:int,
+                zarr:bool,
+                encoding_profile:str,
+                manifest:str,
+                force:bool):
 
     if config is not None:
         config = pyrutils.read_json(config)
     cfg = pyrdata.get_config(config)
+    # parse config and meta data files once for all input files and workers
+    session = _parsed_session(cfg)
+    _init_worker(cfg, session)
 
     # get unique station numbers
     stations = []
@@ -170,48 +712,413 @@ def process_l1b_network(input_files: list[str],
         stations.append(result["station"])
     Nstations = len(np.unique(stations))
 
-    with click.progressbar(input_files,label='Processing') as files:
-        for fn in files:
-            filepath = os.path.abspath(fn)
-            filename = os.path.basename(filepath)
-            logging.info(f"start l1a->l1b: {filename}")
+    # network days of changed input files are merged with the existing network files
+    manifest = None if manifest is None else pyrdata.ProcessingManifest(manifest)
+    files, keys = _stale_files(
+        manifest, "l1b_network", [os.path.abspath(fn) for fn in input_files], cfg, force=force
+    )
 
-            ds = pyrdata.to_l1b(
-                filepath,
-                config=config,
-                global_attrs=cfg['global_attrs']
-            )
-            if ds is None:
-                logger.debug(f"{filename} is skipped.")
-                continue
+    with tempfile.TemporaryDirectory(dir=output_path) as tmpdir:
+        # process l1b of every station first, the daily datasets are stored
+        # in a temporary directory and grouped by network file
+        days = {}
+        outputs = {}
+        ntmp = 0
+        # the next l1a file is read ahead and the daily datasets are written in the background
+        writes = []
+        with pyrutils.BackgroundWriter() as writer, click.progressbar(
+            pyrutils.prefetch(_readahead, files), length=len(files), label='Processing'
+        ) as bar:
+            for filepath, readahead in bar:
+                readahead.result()
+                filename = os.path.basename(filepath)
+                logging.info(f"start l1a->l1b: {filename}")
 
-            udays = np.unique(ds.time.values.astype("datetime64[D]"))
-            for day in udays:
-                day = pd.to_datetime(day)
-                logging.info(f"process day {day:%Y-%m-%d}")
-                dsd = ds.sel(time=f"{day:%Y-%m-%d}")
-
-                outfile = os.path.join(
-                    output_path,
-                    pyrdata.get_fname(
-                        dsd,
-                        period="P1D",
-                        kind='n',
-                        station=0, #Nstations,
-                        freq=cfg["l1bfreq"],
-                        timevar="time",
-                        sfx="nc",
-                        config=cfg
+                # process one day at a time to limit memory usage,
+                # quality flags are added once for the whole network
+                ndays = 0
+                for dsd in pyrdata.iter_l1b_daily(
+                    filepath,
+                    global_attrs=cfg['global_attrs'],
+                    session=session,
+                    add_qc=False
+                ):
+                    ndays += 1
+                    day = pd.to_datetime(dsd.time.values[0])
+                    logging.info(f"process day {day:%Y-%m-%d}")
+
+                    outfile = os.path.join(
+                        output_path,
+                        pyrdata.get_fname(
+                            dsd,
+                            period="P1D",
+                            kind='n',
+                            station=0, #Nstations,
+                            freq=cfg["l1bfreq"],
+                            timevar="time",
+                            sfx="zarr" if zarr else "nc",
+                            config=cfg
+                        )
                     )
+                    tmpfile = os.path.join(tmpdir, f"{ntmp}.nc")
+                    ntmp += 1
+                    writes.append(writer.submit(_save_day, dsd, tmpfile))
+                    days.setdefault(outfile, []).append(tmpfile)
+                    outputs.setdefault(filepath, []).append(outfile)
+                if ndays==0:
+                    logger.debug(f"{filename} is skipped.")
+        for future in writes:
+            future.result()
+
+        # assemble every network day in one pass
+        tasks = [(outfile, days[outfile], encoding_profile) for outfile in days]
+        _, failed = _run_tasks(_l1b_network_day, tasks, jobs, label='Merging', read=_read_days)
+    if manifest is not None:
+        for fn, key in zip(files, keys):
+            outfiles = outputs.get(fn, [])
+            if not any(outfile in failed for outfile in outfiles):
+                manifest.record(f"l1b_network:{fn}", key, outfiles)
+        manifest.close()
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(tasks)} network days failed.")
+
+
+@click.command("bench-encoding")
+@click.argument("input_file", nargs=1)
+@click.option("--profile","-p", multiple=True,
+              type=click.Choice(list(pyrdata.ENCODING_PROFILES)),
+              help="Encoding profile to measure, can be given multiple times. The default is all profiles.")
+@click.option("--repeat", type=int, default=3, show_default=True,
+              help="Number of repetitions, the minimum time is reported.")
+def bench_encoding(input_file, profile, repeat):
+    """Measure write time, file size and read latency of the encoding profiles on a netCDF file."""
+    df = pyrdata.bench_encoding(input_file, profiles=list(profile) if profile else None, repeat=repeat)
+    click.echo(df.round(3).to_string())
+
+def _path_size(path):
+    # size of a file or a directory (zarr store) in bytes
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, fn)) for root, _, fns in os.walk(path) for fn in fns)
+
+def _campaign_l1b(output_path, tmpdir, ifile, sfx, profile, l1afile):
+    # l1a -> daily l1b datasets, the l1a file is the result of the upstream task
+    return _l1b_file(l1afile, output_path, tmpdir, ifile, sfx, False, None, profile)
+
+def _campaign_l1b_day(day, profile, *results):
+    # the only writer of the l1b file of one station and day, merges the datasets
+    # of all l1a files covering the day
+    parts = [(outfile, tmpfile) for result in results for outfile, tmpfile, pday in result if pday==day]
+    if len(parts)==0:
+        return None
+    return _l1b_write(parts[0][0], [tmpfile for _, tmpfile in parts], profile)
+
+def _campaign_network_day(output_path, sfx, profile, *l1bfiles):
+    # assemble the network file of one day from the l1b files of all stations
+    fnames = [fn for fn in l1bfiles if fn is not None]
+    if len(fnames)==0:
+        return None
+    with xr.open_dataset(fnames[0]) as ds:
+        outfile = os.path.join(
+            output_path,
+            pyrdata.get_fname(
+                ds,
+                period="P1D",
+                kind='n',
+                station=0,
+                freq=_worker["cfg"]["l1bfreq"],
+                timevar="time",
+                sfx=sfx,
+                config=_worker["cfg"]
+            )
+        )
+    return _l1b_network_day(outfile, fnames, profile)
+
+@click.group("campaign")
+def campaign():
+    pass
+
+@click.command("run")
+@click.argument("input_files", nargs=-1)
+@click.argument("output_path", nargs=1)
+@click.option("--config","-c",
+              nargs=1,
+              help="Specify config files with override the default config.")
+@click.option("--report","-r",
+              help="Specify the maintenance report file. If empty or 'online' it attempts to request it online.")
+@click.option("--date_of_maintenance",
+              help="Specify date of maintenance as datetime64 string ('YYYY-MM-DD'). If not specified, try to retrieve from data.")
+@click.option("--cache_dir",
+              help="Specify the directory of the parsed record cache. Overrides 'cache_dir' of the config.")
+@click.option("--zarr", is_flag=True,
+              help="Write Zarr stores instead of netCDF files.")
+@click.option("--encoding_profile",
+              type=click.Choice(list(pyrdata.ENCODING_PROFILES)),
+              help="Chunking and compression profile of the netCDF output. If not specified, the netCDF library defaults are used.")
+@click.option("--jobs","-j", type=int, default=1, show_default=True,
+              help="Number of tasks processed in parallel.")
+@click.option("--memory", type=float,
+              help="Memory limit of the running tasks in GB. The default is half of the physical memory. The memory estimates of the tasks are set by the memory_* keys of the config.")
+def campaign_run(input_files,
+                 output_path,
+                 config,
+                 report,
+                 date_of_maintenance,
+                 cache_dir,
+                 zarr,
+                 encoding_profile,
+                 jobs,
+                 memory):
+    """Process raw files to l1a, l1b and l1b_network files of a campaign.
+
+    The l1a, l1b and l1b_network files are stored in the respective subdirectories of OUTPUT_PATH.
+    Every task starts as soon as its input files are available: the l1b files of a station and day
+    once the l1a files of the station covering the day are processed, and the network file of a day
+    once the l1b files of this day are written.
+    """
+    if config is not None:
+        config = pyrutils.read_json(config)
+    cfg = pyrdata.get_config(config)
+    if cache_dir is not None:
+        cfg["cache_dir"] = cache_dir
+    # parse config, meta data files and report once for all tasks and workers
+    session = _parsed_session(cfg)
+    report = _get_report(report, date_of_maintenance, cfg)
+    if memory is None:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 2
+    else:
+        memory = memory * 2**30
+    sfx = "zarr" if zarr else "nc"
+    paths = {level: os.path.join(output_path, level) for level in ["l1a", "l1b", "l1b_network"]}
+    for path in paths.values():
+        os.makedirs(path, exist_ok=True)
+
+    # station number of every raw file
+    files = [os.path.abspath(fn) for fn in input_files]
+    stations = {fn: _station_id(fn, cfg) for fn in files}
+
+    graph = pyrutils.TaskGraph()
+    for fn in files:
+        graph.add(
+            ("l1a", fn), _l1a_file,
+            args=(fn, paths["l1a"], sfx, encoding_profile),
+            memory=cfg["memory_l1a"]*os.path.getsize(fn)
+        )
+
+    with tempfile.TemporaryDirectory(dir=output_path) as tmpdir:
+        # days covered by the l1a file of every raw file
+        coverage = {}
+        def _on_done(key, result):
+            logging.info(f"campaign task {key} done")
+            if key[0] != "l1a":
+                return
+            fn = key[1]
+            days = []
+            if result is not None:
+                with xr.open_dataset(result) as ds:
+                    days = list(np.arange(
+                        ds.gpstime.values.min().astype("datetime64[D]"),
+                        ds.gpstime.values.max().astype("datetime64[D]") + np.timedelta64(1, "D")
+                    ).astype(str))
+                graph.add(
+                    ("l1b", fn), _campaign_l1b,
+                    args=(paths["l1b"], tmpdir, len(coverage), sfx, encoding_profile),
+                    deps=[key],
+                    memory=cfg["memory_l1b"]*_path_size(result)/len(days) + cfg["memory_day"]
                 )
+            coverage[fn] = days
+
+            # all l1a files of the station are processed, the days of the station are known
+            sfiles = [f for f in files if stations[f]==stations[fn]]
+            if all(f in coverage for f in sfiles):
+                for day in sorted(set(day for f in sfiles for day in coverage[f])):
+                    graph.add(
+                        ("l1b_day", stations[fn], day), _campaign_l1b_day,
+                        args=(day, encoding_profile),
+                        deps=[("l1b", f) for f in sfiles if day in coverage[f]],
+                        memory=cfg["memory_day"]
+                    )
+            # all l1a files are processed, the stations of every day are known
+            if len(coverage)==len(files):
+                for day in sorted(set(day for f in files for day in coverage[f])):
+                    deps = [k for k in graph.tasks if k[0]=="l1b_day" and k[2]==day]
+                    graph.add(
+                        ("l1b_network", day), _campaign_network_day,
+                        args=(paths["l1b_network"], sfx, encoding_profile),
+                        deps=deps,
+                        memory=cfg["memory_day"]*len(deps)
+                    )
+
+        results, failed = graph.run(
+            jobs=jobs,
+            memory=memory,
+            callback=_on_done,
+            initializer=_init_worker,
+            initargs=(cfg, session, report)
+        )
+    for level in ["l1a", "l1b_day", "l1b_network"]:
+        ndone = len([key for key in results if key[0]==level and results[key] is not None])
+        nfailed = len([key for key in failed if key[0]==level])
+        click.echo(f"{level}: {ndone} files written, {nfailed} failed.")
+    for key in failed:
+        click.echo(f"failed: {key}", err=True)
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(graph.tasks)} tasks failed.")
+
+def _watch_file(fn, paths, sfx, profile):
+    # raw -> l1a and l1b of one file, the l1b days are merged into the l1b files of
+    # the station and into the network files of these days
+    outputs = []
+    # the only input file, the days are written at once without temporary files
+    for outfile, _, _ in _l1b_file(fn, paths["l1b"], None, 0, sfx, True, paths["l1a"], profile, shared=set()):
+        outputs.append(outfile)
+        outputs.append(_campaign_network_day(paths["l1b_network"], sfx, profile, outfile))
+    return outputs
 
+def _inotify(path):
+    # inotify instance watching path for completed files, None if inotify is not available
+    try:
+        import inotify_simple
+    except ImportError:
+        return None
+    ino = inotify_simple.INotify()
+    flags = inotify_simple.flags
+    ino.add_watch(path, flags.CLOSE_WRITE | flags.MOVED_TO | flags.MODIFY)
+    return ino
 
-                pyrdata.to_netcdf_l1b(dsd, fname=outfile, freq=cfg["l1bfreq"])
-                logging.info(f"l1b_network saved to {outfile}")
+@click.command("watch")
+@click.argument("raw_dir", nargs=1)
+@click.argument("output_path", nargs=1)
+@click.option("--config","-c",
+              nargs=1,
+              help="Specify config files with override the default config.")
+@click.option("--report","-r",
+              help="Specify the maintenance report file. If empty or 'online' it attempts to request it online. A report file is read again, if it changes.")
+@click.option("--date_of_maintenance",
+              help="Specify date of maintenance as datetime64 string ('YYYY-MM-DD'). If not specified, try to retrieve from data.")
+@click.option("--cache_dir",
+              help="Specify the directory of the parsed record cache. Overrides 'cache_dir' of the config.")
+@click.option("--zarr", is_flag=True,
+              help="Write Zarr stores instead of netCDF files.")
+@click.option("--encoding_profile",
+              type=click.Choice(list(pyrdata.ENCODING_PROFILES)),
+              help="Chunking and compression profile of the netCDF output. If not specified, the netCDF library defaults are used.")
+@click.option("--manifest",
+              help="Path of the SQLite processing manifest. The default is 'manifest.sqlite' in OUTPUT_PATH.")
+@click.option("--interval", default=5., show_default=True,
+              help="Seconds to wait between scans of RAW_DIR. With inotify, a scan starts as soon as a file is written.")
+@click.option("--settle", default=30., show_default=True,
+              help="Seconds a raw file has to be unchanged, before it is processed.")
+@click.option("--once", is_flag=True,
+              help="Process the raw files of RAW_DIR and exit, once no file is pending.")
+def watch(raw_dir,
+          output_path,
+          config,
+          report,
+          date_of_maintenance,
+          cache_dir,
+          zarr,
+          encoding_profile,
+          manifest,
+          interval,
+          settle,
+          once):
+    """Watch RAW_DIR and process new or changed raw files as they arrive.
+
+    A raw file is processed once it did not change for --settle seconds, partially uploaded
+    files are not touched. The l1a, l1b and l1b_network files are stored in the respective
+    subdirectories of OUTPUT_PATH. Only the l1b files of the station and the network files of
+    the days covered by the raw file are updated. Processed raw files are recorded in the manifest
+    and are skipped after a restart, as long as they are unchanged.
+    """
+    if config is not None:
+        config = pyrutils.read_json(config)
+    cfg = pyrdata.get_config(config)
+    if cache_dir is not None:
+        cfg["cache_dir"] = cache_dir
+    # parse config, meta data files and report once for all raw files,
+    # the session reloads changed config and meta data files itself
+    session = _parsed_session(cfg)
+    _init_worker(cfg, session, _get_report(report, date_of_maintenance, cfg))
+    report_mtime = None
+    if report not in [None, "online"]:
+        report_mtime = os.path.getmtime(report)
+
+    sfx = "zarr" if zarr else "nc"
+    paths = {level: os.path.join(output_path, level) for level in ["l1a", "l1b", "l1b_network"]}
+    for path in paths.values():
+        os.makedirs(path, exist_ok=True)
+    if manifest is None:
+        manifest = os.path.join(output_path, "manifest.sqlite")
+    manifest = pyrdata.ProcessingManifest(manifest)
+    parser = re.compile(cfg['filename_parser'])
 
+    ino = None if once else _inotify(raw_dir)
+    logging.info(f"watch {raw_dir}, {'inotify' if ino else 'polling'} every {interval}s")
+    click.echo(f"Watching {raw_dir} ...")
+    seen = {} # raw file -> (size, mtime) of the last scan
+    done = {} # raw file -> (size, mtime) when processed
+    try:
+        while True:
+            if report_mtime is not None and os.path.getmtime(report) != report_mtime:
+                report_mtime = os.path.getmtime(report)
+                logging.info(f"reload report {report}")
+                _worker["report"] = _get_report(report, date_of_maintenance, cfg)
+
+            pending = 0
+            for filename in sorted(os.listdir(raw_dir)):
+                fn = os.path.abspath(os.path.join(raw_dir, filename))
+                if parser.match(filename) is None or not os.path.isfile(fn):
+                    continue
+                st = os.stat(fn)
+                state = (st.st_size, st.st_mtime)
+                if done.get(fn) == state:
+                    continue
+                # debounce, the file has to be unchanged since the last scan and for settle seconds
+                last, seen[fn] = seen.get(fn), state
+                if last != state or time.time() - st.st_mtime < settle:
+                    pending += 1
+                    continue
+
+                key = manifest.task_key([fn], cfg, report=_worker["report"], station=_station_id(fn, cfg))
+                if manifest.is_current(f"watch:{fn}", key):
+                    logging.info(f"{fn} is up to date. Skip.")
+                    done[fn] = state
+                    continue
+                logging.info(f"start watch: {filename}")
+                t0 = time.time()
+                try:
+                    outputs = _watch_file(fn, paths, sfx, encoding_profile)
+                except Exception as e:
+                    # retry, once the file changes again
+                    logger.exception(f"watch {filename} failed: {e}")
+                    click.echo(f"{filename} failed: {e}", err=True)
+                else:
+                    manifest.record(f"watch:{fn}", key, outputs)
+                    click.echo(f"{filename} processed in {time.time()-t0:.1f}s, {len(outputs)} files updated.")
+                done[fn] = state
+
+            if once and pending == 0:
+                break
+            if ino is None:
+                time.sleep(interval)
+            else:
+                # wake up on the first event, but scan at least every interval
+                ino.read(timeout=int(interval*1000))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if ino is not None:
+            ino.close()
+        manifest.close()
 
 cli.add_command(process)
+cli.add_command(bench_encoding)
+cli.add_command(campaign)
+cli.add_command(watch)
+campaign.add_command(campaign_run)
 process.add_command(process_l1a)
+process.add_command(process_follow)
 process.add_command(process_l1b)
 process.add_command(process_l1b_network)
 
@@ -254,9 +1161,9 @@ def merge(input_files, output_file,freq=None,timevar=None):
         for i, fn in enumerate(files):
             dst = xr.open_dataset(fn)
             # unify time dimension to speed up merging
-            date = dst.time.values[0].astype("datetime64[D]")
-            timeidx = pd.date_range(date, date + np.timedelta64(1, 'D'), freq=freq, inclusive='left')
-            dst = dst.reindex(time=timeidx, method='nearest', tolerance=np.timedelta64(1, 'ms'))
+            date = dst[timevar].values[0].astype("datetime64[D]")
+            nday = pd.Timedelta(1, 'D') // pd.Timedelta(freq)
+            dst = pyrutils.align_to_grid(dst, timevar, date, freq, nday)
 
             # add gti for single stations
             if "gti" not in dst:
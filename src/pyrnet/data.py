@@ -1,17 +1,28 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/pyrnet/data.ipynb.
 
 # %% auto 0
-__all__ = ['pyrnet_version', 'logger', 'get_fname', 'update_coverage_meta', 'stretch_resolution', 'to_netcdf', 'to_netcdf_l1b',
-           'resample', 'get_config', 'get_sensor_config', 'get_cfmeta', 'calc_encoding', 'add_encoding', 'to_l1a',
-           'to_l1b', 'merge_l1b']
+__all__ = ['pyrnet_version', 'logger', 'ENCODING_PROFILES', 'get_fname', 'update_coverage_meta', 'stretch_resolution',
+           'to_netcdf', 'to_netcdf_l1b', 'append_netcdf_l1a', 'to_zarr', 'to_zarr_l1b', 'resample', 'get_config',
+           'get_sensor_config', 'get_cfmeta', 'ProcessingSession', 'ProcessingManifest', 'calc_encoding',
+           'add_encoding', 'apply_encoding_profile', 'bench_encoding', 'iter_raw_records', 'to_l1a', 'to_l1b',
+           'iter_l1b_daily', 'to_l1b_from_records', 'gap_index', 'merge_l1b']
 
 # %% ../../nbs/pyrnet/data.ipynb 2
 import os
+import json
+import shutil
+import time
+import sqlite3
+import hashlib
+import tempfile
 import numpy as np
 import pandas as pd
 import xarray as xr
+import netCDF4
+from xarray.backends.locks import HDF5_LOCK, NETCDFC_LOCK, combine_locks
 import logging
 from toolz import assoc_in, merge_with
+from collections.abc import Iterable, Iterator
 #import pkg_resources as pkg_res
 import importlib.resources
 import warnings
@@ -110,67 +121,478 @@ def stretch_resolution(ds: xr.Dataset) -> xr.Dataset:
     return ds
 
 # %% ../../nbs/pyrnet/data.ipynb 12
-def to_netcdf(ds, fname, timevar="time"):
+def to_netcdf(ds, fname, timevar="time", profile=None):
     """xarray to netcdf, but merge if exist
+
+    If *fname* ends with '.zarr', the dataset is written to a Zarr store instead (see `to_zarr`).
+    If *profile* is given, the chunking and compression of the encoding profile is applied (see `apply_encoding_profile`).
     """
+    if _is_zarr(fname):
+        return to_zarr(ds, fname, timevar=timevar)
     # save to netCDF4
     ds = update_coverage_meta(ds, timevar=timevar)
-    ds.to_netcdf(fname,
-                 encoding={timevar:{'dtype':'float64'}}) # for OpenDAP 2 compatibility
-#|export
-def to_netcdf_l1b(ds, fname, freq='1s', timevar="time"):
+    if profile is None:
+        ds.to_netcdf(fname,
+                     encoding={timevar:{'dtype':'float64'}}) # for OpenDAP 2 compatibility
+    else:
+        ds = apply_encoding_profile(ds, profile, timevar=timevar)
+        ds.to_netcdf(fname)
+
+# %% ../../nbs/pyrnet/data.ipynb 13
+# The netCDF-C and HDF5 libraries are not thread safe. xarray holds these locks for each
+# open, read and write of a netCDF file, direct netCDF4 calls have to hold them as well,
+# e.g. in the background writer of the command line interface while the next file is read.
+# Acquired in the same order as xarray, not reentrant: no xarray file access within.
+_NETCDF_LOCK = combine_locks([NETCDFC_LOCK, HDF5_LOCK])
+
+_QC_WINDOW = 30*60 # samples of the trailing window of the qc comparison test (pyrnet.qcrad)
+
+def _set_ncattr(ncobj, key, value):
+    # write attribute like xarray does, lists of strings as NC_STRING array
+    value = list(value) if isinstance(value, (list, tuple)) else value
+    if key in ncobj.ncattrs():
+        old = pyrnet.utils.make_iter(ncobj.getncattr(key))
+        if np.array_equal(old, pyrnet.utils.make_iter(value)):
+            return
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        ncobj.setncattr_string(key, value)
+    else:
+        ncobj.setncattr(key, value)
+
+def _update_netcdf_l1b(ds, fname, freq='1s', timevar="time"):
+    """Merge ds into an existing daily l1b file in place.
+
+    Only the time region covered by *ds* is written, plus the qc flags within the
+    window of the qc comparison test. Returns False if the file can not be
+    updated in place, e.g. it is not on the full day time grid, station or
+    maintenancetime are not unlimited dimensions, or *ds* adds variables or
+    stations in between the existing ones.
+    """
+    qcvars = ["ghi", "gti"]
+    step = pd.to_timedelta(freq).to_timedelta64()
+    with xr.open_dataset(fname) as dsf:
+        unlimited = dsf.encoding.get("unlimited_dims", set())
+        if "station" not in unlimited or "maintenancetime" not in unlimited:
+            return False
+        
+        # file and data have to be on the same full day time grid
+        ftime = dsf[timevar].values
+        day = ftime[0].astype("datetime64[D]")
+        N = ftime.size
+        if not np.array_equal(ftime, pd.date_range(day, day+np.timedelta64(1,'D'), freq=freq, inclusive='left').values):
+            return False
+        dt = ds[timevar].values - day
+        itime = np.round(dt / step).astype(int)
+        if np.any(np.abs(dt - itime*step) > np.timedelta64(1,'ms')) or itime.min()<0 or itime.max()>=N:
+            return False
+        
+        # variables have to exist with the same dimensions
+        for var in ds:
+            if var not in dsf or dsf[var].dims != ds[var].dims:
+                return False
+        
+        # new stations can only be appended
+        fstations = dsf.station.values
+        new = ~np.isin(ds.station.values, fstations)
+        if np.any(new) and np.min(ds.station.values[new]) <= np.max(fstations):
+            return False
+        stations = np.concatenate((fstations, ds.station.values[new].astype(fstations.dtype)))
+        
+        # merge attributes, values of ds overwrite the file values
+        merged_gattrs = _merge_gattrs_by_station([dsf.copy(), ds.copy()], merge_gattrs=_MERGE_GATTRS)
+        _, merged_attrs = _merge_vattrs_by_station([dsf.copy(), ds.copy()], merge_attrs=_MERGE_ATTRS)
+        # changed tilt angles affect the qc flags of the whole day
+        for var in qcvars:
+            if var not in dsf:
+                continue
+            for attr in ["vangle", "hangle"]:
+                old = pyrnet.utils.make_iter(dsf[var].attrs.get(attr, 0))
+                if not np.allclose(np.array(old, dtype=float),
+                                   np.array(merged_attrs[var][attr][:fstations.size], dtype=float)):
+                    return False
+        
+        # region of new values and affected qc flags
+        s0, s1 = itime.min(), itime.max()+1
+        r0, r1 = max(0, s0-_QC_WINDOW+1), min(N, s1+_QC_WINDOW-1)
+        tsvars = [var for var in dsf if dsf[var].dims == (timevar, "station")]
+        dsr = dsf[tsvars].isel({timevar: slice(r0, r1)}).load()
+        dsr = dsr.reindex(station=stations)
+        svars = [var for var in dsf if dsf[var].dims == ("station",)]
+        dss = dsf[svars].load().reindex(station=stations)
+        mvars = [var for var in dsf if dsf[var].dims == ("maintenancetime", "station")]
+        dsm = dsf[mvars].load().reindex(station=stations)
+        M = dsm.maintenancetime.size
+        
+        # full day ghi of the updated stations for the maintenance time snapping
+        ustations = ds.station.values
+        ghi = np.full((N, ustations.size), np.nan)
+        for j, station in enumerate(ustations):
+            if station in fstations:
+                ghi[:,j] = dsf.ghi.sel(station=station).values
+    
+    # overlay new values, values of ds overwrite the file values
+    dsn = ds.reindex(station=stations, method='nearest', tolerance=1e-6)
+    ovars = [var for var in dsn if var in tsvars and var not in [f"qc_flag_{v}" for v in qcvars]]
+    for var in ovars:
+        values = dsr[var].values.astype(float)
+        region = values[itime-r0]
+        newvalues = dsn[var].values
+        mask = ~np.isnan(newvalues)
+        region[mask] = newvalues[mask]
+        values[itime-r0] = region
+        dsr[var].values = values
+    for var in [var for var in dsn if var in svars]:
+        mask = np.isnan(dss[var].values)
+        dss[var].values[mask] = dsn[var].values[mask]
+    
+    # merge maintenance times
+    dsm = dsm.reindex(maintenancetime=np.union1d(dsm.maintenancetime, ds.maintenancetime))
+    for var in [var for var in dsn if var in mvars]:
+        values = dsm[var].values.astype(float)
+        newvalues = dsn[var].reindex(maintenancetime=dsm.maintenancetime).values
+        mask = ~np.isnan(newvalues)
+        values[mask] = newvalues[mask]
+        dsm[var].values = values
+    # snap maintenance times of the updated stations
+    if "ghi" in ds:
+        region = ghi[itime, :]
+        mask = ~np.isnan(ds.ghi.values)
+        region[mask] = ds.ghi.values[mask]
+        ghi[itime, :] = region
+    # only the gaps of the updated stations can change
+    snaptimes = np.full(stations.size, np.datetime64("NaT"), dtype=ftime.dtype)
+    snaptimes[pd.Index(stations).get_indexer(ustations)] = _gap_snap_times(ftime, ghi)
+    mtimes = _snap_maintenancetime(
+        dsm.maintenancetime.values,
+        dsm.maintenance_flag_ghi.values,
+        day,
+        snaptimes
+    )
+    dsm = dsm.assign_coords({"maintenancetime": ("maintenancetime", mtimes)})
+    dsm = _merge_maintenancetime_duplicates(dsm)
+    if dsm.maintenancetime.size < M:
+        # unlimited dimension can not shrink
+        return False
+    
+    # update qc flags
+    dsq = xr.merge([dsr, dss[["esd"]]])
+    for var in qcvars:
+        if var not in dsq:
+            continue
+        for attr in ["vangle", "hangle"]:
+            dsq[var].attrs[attr] = merged_attrs[var][attr]
+    dsq = pyrnet.qcrad.add_qc_flags(dsq, qcvars)
+    
+    # write to file
+    i0, i1 = s0-r0, s1-r0
+    q0, q1 = s0-r0, r1-r0
+    S, S1 = fstations.size, stations.size
+    with _NETCDF_LOCK, netCDF4.Dataset(fname, 'a') as nc:
+        if S1 > S:
+            nc["station"][S:S1] = stations[S:]
+        for var in ovars:
+            nc[var][s0:s1, :S1] = np.ma.masked_invalid(dsr[var].values[i0:i1])
+        for var in svars:
+            nc[var][:S1] = np.ma.masked_invalid(dss[var].values)
+        for var in [f"qc_flag_{v}" for v in qcvars if v in dsq]:
+            if S1 > S:
+                nc[var][:, S:S1] = np.zeros((N, S1-S), dtype=np.ubyte)
+            nc[var][s0:r1, :S1] = dsq[var].values[q0:q1]
+        mnum, _, _ = xr.coding.times.encode_cf_datetime(
+            dsm.maintenancetime.values,
+            units=nc["maintenancetime"].units,
+            calendar=nc["maintenancetime"].calendar
+        )
+        nc["maintenancetime"][:mnum.size] = mnum
+        for var in mvars:
+            nc[var][:mnum.size, :S1] = np.ma.masked_invalid(dsm[var].values)
+        
+        # update attributes
+        now = pd.to_datetime(np.datetime64("now"))
+        gattrs = update_coverage_meta(
+            xr.Dataset(
+                {"lat": ("station", dss.lat.values), "lon": ("station", dss.lon.values)},
+                coords={timevar: ftime}
+            ),
+            timevar=timevar
+        ).attrs
+        gattrs["history"] = f"{now.isoformat()}: Merged level l1b by pyrnet version {pyrnet_version}; "
+        for attr in merged_gattrs:
+            if attr in nc.ncattrs():
+                gattrs[attr] = merged_gattrs[attr]
+        for attr in gattrs:
+            _set_ncattr(nc, attr, gattrs[attr])
+        for var in merged_attrs:
+            if var not in nc.variables:
+                continue
+            for attr in merged_attrs[var]:
+                if attr in nc[var].ncattrs():
+                    _set_ncattr(nc[var], attr, merged_attrs[var][attr])
+    return True
+
+def to_netcdf_l1b(ds, fname, freq='1s', timevar="time", session=None, profile=None):
     """xarray to netcdf, but merge if exist
+
+    Daily l1b files are written on the full day time grid with unlimited station
+    and maintenancetime dimensions. If the file exists and a single dataset is
+    given, only the time region of the new data is updated in place.
+    Otherwise, the file is merged with the new data and rewritten. Values of the
+    new data overwrite the values of the file.
+    If *profile* is given, the encoding profile is applied when the file is (re)written.
+    If *fname* ends with '.zarr', the daily Zarr store is written instead (see `to_zarr_l1b`).
     """
+    if _is_zarr(fname):
+        return to_zarr_l1b(ds, fname, freq=freq, timevar=timevar, session=session)
     # merge if necessary
     if isinstance(ds, xr.Dataset):
         dslist = [ds]
     else:
-        dslist = ds
+        dslist = list(ds)
     
     if os.path.exists(fname):
-        ds1 = xr.load_dataset(fname)
-        dslist.append(ds1)
+        if len(dslist)==1 and _update_netcdf_l1b(dslist[0], fname, freq=freq, timevar=timevar):
+            logger.info(f"Updated {fname} in place.")
+            return
+        dslist = [xr.load_dataset(fname)] + dslist
         
-    ds = merge_l1b(dslist, freq=freq, timevar=timevar)
+    ds = merge_l1b(dslist, freq=freq, timevar=timevar, session=session)
     # save to netCDF4
     ds = update_coverage_meta(ds, timevar=timevar)
     
     if os.path.exists(fname): 
         os.remove(fname)
-    ds.to_netcdf(fname,
-                 encoding={timevar:{'dtype':'float64'}}) # for OpenDAP 2 compatibility
+    if profile is None:
+        ds.to_netcdf(fname,
+                     unlimited_dims=["station", "maintenancetime"],
+                     encoding={timevar:{'dtype':'float64'}}) # for OpenDAP 2 compatibility
+    else:
+        ds = apply_encoding_profile(ds, profile, timevar=timevar)
+        ds.to_netcdf(fname, unlimited_dims=["station", "maintenancetime"])
+
+
+def append_netcdf_l1a(ds, fname):
+    """Append the records of *ds* to an existing l1a file in place.
+
+    *ds* holds the records following the records of the file, with the ADC time continued
+    from the last ADC sample of the file, e.g. the new records of a growing logger file.
+    Only the new records are written, the maintenance flags and the coverage attributes are updated.
+    Returns False if the file can not be appended in place, i.e. adctime and gpstime are not
+    unlimited dimensions, or the variables or the station differ.
+    """
+    with xr.open_dataset(fname) as dsf:
+        unlimited = dsf.encoding.get("unlimited_dims", set())
+        if "adctime" not in unlimited or "gpstime" not in unlimited:
+            return False
+        for var in ds:
+            if var not in dsf or dsf[var].dims != ds[var].dims:
+                return False
+        if not np.array_equal(dsf.station.values, ds.station.values):
+            return False
+        # GPS records are small, the coverage is computed from all of them
+        dsg = dsf[["lat", "lon"]].load()
+    dsg = xr.concat([dsg, ds[["lat", "lon"]]], dim="gpstime")
+    
+    with _NETCDF_LOCK, netCDF4.Dataset(fname, 'a') as nc:
+        A, G = nc.dimensions["adctime"].size, nc.dimensions["gpstime"].size
+        A1, G1 = A + ds.adctime.size, G + ds.gpstime.size
+        anum, _ = xr.coding.times.encode_cf_timedelta(ds.adctime.values, units=nc["adctime"].units)
+        nc["adctime"][A:A1] = anum
+        if G1>G:
+            gnum, _, _ = xr.coding.times.encode_cf_datetime(
+                ds.gpstime.values,
+                units=nc["gpstime"].units,
+                calendar=nc["gpstime"].calendar
+            )
+            nc["gpstime"][G:G1] = gnum
+        mnum, _, _ = xr.coding.times.encode_cf_datetime(
+            ds.maintenancetime.values,
+            units=nc["maintenancetime"].units,
+            calendar=nc["maintenancetime"].calendar
+        )
+        nc["maintenancetime"][:mnum.size] = mnum
+        for var in ds:
+            dim = ds[var].dims[0]
+            if dim == "adctime":
+                nc[var][A:A1, :] = np.ma.masked_invalid(ds[var].values)
+            elif dim == "gpstime" and G1>G:
+                nc[var][G:G1, :] = np.ma.masked_invalid(ds[var].values)
+            elif dim == "maintenancetime":
+                nc[var][:mnum.size, :] = ds[var].values
+        
+        # update attributes
+        gattrs = update_coverage_meta(dsg, timevar="gpstime").attrs
+        for attr in [attr for attr in gattrs if attr in nc.ncattrs()]:
+            _set_ncattr(nc, attr, gattrs[attr])
+    return True
+
+# %% ../../nbs/pyrnet/data.ipynb 15
+# encoding keys applicable to zarr stores, the storage layout of netCDF files does not apply
+_ZARR_ENCODING = ["dtype", "scale_factor", "add_offset", "_FillValue", "units", "calendar"]
+
+def _is_zarr(fname):
+    return str(fname).rstrip("/").endswith(".zarr")
+
+def _zarr_encoding(ds, timevar="time"):
+    # keep packing and time encoding, one chunk per station
+    encoding = {}
+    for var in ds.variables:
+        encoding[var] = {key: val for key, val in ds[var].encoding.items() if key in _ZARR_ENCODING}
+        encoding[var]["chunks"] = tuple(
+            1 if dim=="station" else ds.sizes[dim] for dim in ds[var].dims
+        )
+    encoding[timevar]["dtype"] = "float64"
+    return encoding
+
+def _zarr_attrs(attrs):
+    # zarr attributes are stored as json, numpy values to python types
+    return {
+        key: np.asarray(val).tolist() if isinstance(val, (np.ndarray, np.generic, list, tuple)) else val
+        for key, val in attrs.items()
+    }
+
+def _write_zarr(ds, store, timevar="time"):
+    # write to a temporary store first and replace the existing store
+    ds = ds.copy()
+    ds.attrs = _zarr_attrs(ds.attrs)
+    for var in ds.variables:
+        ds[var].attrs = _zarr_attrs(ds[var].attrs)
+    tmpstore = store.rstrip("/") + ".tmp"
+    if os.path.exists(tmpstore):
+        shutil.rmtree(tmpstore)
+    ds.to_zarr(tmpstore, mode="w", encoding=_zarr_encoding(ds, timevar=timevar), consolidated=True)
+    if os.path.exists(store):
+        shutil.rmtree(store)
+    os.rename(tmpstore, store)
+
+def to_zarr(ds, store, timevar="time"):
+    """xarray to zarr store, an existing store is replaced.
+
+    Parameters
+    ----------
+    ds: xr.Dataset
+        Dataset of any processing level, the encoding of `add_encoding` is applied.
+    store: str
+        Path of the Zarr store.
+    timevar: str
+        Name of the time coordinate. The default is 'time'.
+    """
+    ds = update_coverage_meta(ds, timevar=timevar)
+    _write_zarr(ds, store, timevar=timevar)
+
+def _update_zarr_l1b(ds, store, stations, timevar="time"):
+    """Write the station chunks of *stations* and the quality flags of all stations to an existing store.
+
+    Returns False if the store can not be updated in place, i.e. coordinates or variables differ.
+    """
+    import zarr
+    with xr.open_zarr(store) as dsf:
+        for dim in [timevar, "station", "maintenancetime"]:
+            if not np.array_equal(dsf[dim].values, ds[dim].values):
+                return False
+        if set(dsf.data_vars) != set(ds.data_vars):
+            return False
+    
+    ds = ds.drop_encoding()
+    qcvars = [var for var in ds if var.startswith("qc_flag_")]
+    svars = [var for var in ds if "station" in ds[var].dims and var not in qcvars]
+    # stations are written one chunk at a time, regions of other stations are never touched
+    for station in stations:
+        i = int(np.argwhere(ds.station.values==station)[0][0])
+        ds[svars].isel(station=slice(i, i+1)).drop_vars(
+            [timevar, "maintenancetime"], errors="ignore"
+        ).to_zarr(store, region={"station": slice(i, i+1)}, consolidated=False)
+    # quality flags are tested with all stations of the network
+    ds[qcvars].drop_vars(
+        [timevar, "station", "maintenancetime"], errors="ignore"
+    ).to_zarr(store, region={timevar: slice(None), "station": slice(None)}, consolidated=False)
+    
+    # update attributes
+    group = zarr.open_group(store, mode="r+")
+    group.attrs.update(_zarr_attrs(ds.attrs))
+    for var in ds:
+        group[var].attrs.update(_zarr_attrs(ds[var].attrs))
+    zarr.consolidate_metadata(store)
+    return True
+
+def to_zarr_l1b(ds, store, freq='1s', timevar="time", session=None):
+    """Daily l1b datasets to a Zarr store, but merge if exist
+
+    Like `to_netcdf_l1b`, the datasets are merged with an existing store, values of the
+    new data overwrite the values of the store. If the stations, time and maintenance
+    times of the store do not change, only the chunks of the new stations and the
+    quality flags are written, else the store is replaced.
+    Concurrent writers have to write to different daily stores.
+
+    Parameters
+    ----------
+    ds: xr.Dataset or list of xr.Dataset
+        l1b datasets of one day.
+    store: str
+        Path of the daily Zarr store.
+    freq: str
+        Sampling frequency of the regular time grid. The default is '1s'.
+    timevar: str
+        Name of the time coordinate. The default is 'time'.
+    session: ProcessingSession or None
+        Session providing the parsed cfmeta. The default is None.
+    """
+    if isinstance(ds, xr.Dataset):
+        dslist = [ds]
+    else:
+        dslist = list(ds)
+    stations = np.unique(np.concatenate([dst.station.values for dst in dslist]))
+    
+    exists = os.path.exists(store)
+    if exists:
+        dslist = [xr.load_dataset(store, engine="zarr")] + dslist
+    ds = merge_l1b(dslist, freq=freq, timevar=timevar, session=session)
+    ds = update_coverage_meta(ds, timevar=timevar)
+    
+    if exists and _update_zarr_l1b(ds, store, stations, timevar=timevar):
+        logger.info(f"Updated {store} in place.")
+        return
+    _write_zarr(ds, store, timevar=timevar)
 
-# %% ../../nbs/pyrnet/data.ipynb 14
+# %% ../../nbs/pyrnet/data.ipynb 17
 def resample(ds, freq, methods='mean', kwargs={}):
-    """ Resample xarray dataset using pandas for speed.
-    https://github.com/pydata/xarray/issues/4498#issuecomment-706688398
+    """ Resample the time dimension of a xarray dataset to a regular grid of width freq.
+    All methods (statistics) are calculated in one sweep by pyrnet.utils.binned_statistics,
+    NaN values are skipped. Returns one dataset per method.
     """
     if isinstance(methods,str):
         methods = [methods]
 
-    dsr = ds.to_dataframe().resample(freq)
-    dsouts = []
-    for method in methods:
-        # what we want (quickly), but in Pandas form
-        with warnings.catch_warnings():
-            warnings.simplefilter(action='ignore', category=FutureWarning)
-            df_h = dsr.apply(method)
-        # rebuild xarray dataset with attributes
-        vals = []
-        for c in df_h.columns:
-            vals.append(
-                xr.DataArray(data=df_h[c],
-                             dims=['time'],
-                             coords={'time': df_h.index},
-                             attrs=ds[c].attrs)
-            )
-        dsouts.append(xr.Dataset(dict(zip(df_h.columns, vals)), attrs=ds.attrs))
+    slots, start = pyrnet.utils.time_slots(ds.time.values, freq)
+    nslots = int(slots.max()) + 1
+    time = start + np.arange(nslots)*pd.Timedelta(freq).to_timedelta64()
+
+    dsouts = [xr.Dataset(coords={"time": time}, attrs=ds.attrs) for _ in methods]
+    # all time dependent variables as rows of one array
+    tvars = [ds[var].transpose(..., "time") for var in ds if "time" in ds[var].dims]
+    values = [da.values.reshape(-1, ds.time.size) for da in tvars]
+    res = pyrnet.utils.binned_statistics(
+        np.concatenate(values) if values else np.empty((0, ds.time.size)),
+        slots,
+        nslots,
+        stats=methods,
+        axis=1
+    )
+    irow = np.cumsum([0] + [v.shape[0] for v in values])
+    for i, da in enumerate(tvars):
+        coords = {k: v for k, v in da.coords.items() if "time" not in v.dims}
+        for method, dsout in zip(methods, dsouts):
+            data = res[method][irow[i]:irow[i+1]].reshape(da.shape[:-1] + (nslots,))
+            dsout[da.name] = xr.DataArray(data, coords=coords, dims=da.dims, attrs=da.attrs).transpose("time", ...)
+    for var in ds:
+        if "time" not in ds[var].dims:
+            for dsout in dsouts:
+                dsout[var] = ds[var]
 
     if len(dsouts) == 1:
         dsouts = dsouts[0]
     return dsouts
 
-# %% ../../nbs/pyrnet/data.ipynb 16
+# %% ../../nbs/pyrnet/data.ipynb 19
 def get_config(config: dict|None = None) -> dict:
     """Read default config and merge with input config
     """
@@ -220,7 +642,187 @@ def get_cfmeta(config: dict|None = None) -> dict:
     vattrs, vencode = pyrnet.utils.get_attrs_enc(d)
     return gattrs, vattrs, vencode
 
-# %% ../../nbs/pyrnet/data.ipynb 18
+# %% ../../nbs/pyrnet/data.ipynb 21
+class ProcessingSession:
+    """
+    Cache of the parsed config, sensor config, cfmeta, calibration and station map files.
+    A cached value is parsed again, if the modification time of one of its files changed.
+    Sessions can be pickled to pass them to pool workers.
+
+    Parameters
+    ----------
+    config: dict or None
+        Config overwriting the default config, see get_config.
+    sconfig: dict or None
+        Sensor config overwriting the default sensor config, see get_sensor_config.
+    """
+    def __init__(self, config: dict|None = None, sconfig: dict|None = None):
+        self._config = config
+        self._sconfig = sconfig
+        self._cache = {}
+
+    def _cached(self, key, fnames, func):
+        mtimes = tuple(os.stat(fn).st_mtime_ns for fn in fnames)
+        if key not in self._cache or self._cache[key][0] != mtimes:
+            logger.debug(f"Parse {', '.join(fnames)}")
+            self._cache[key] = (mtimes, func())
+        return self._cache[key][1]
+
+    @property
+    def config(self) -> dict:
+        """Processing config, see get_config"""
+        fn_config = os.path.join(importlib.resources.files("pyrnet"), "share/pyrnet_config.json")
+        return self._cached("config", [fn_config], lambda: get_config(self._config))
+
+    @property
+    def sconfig(self) -> dict:
+        """Sensor config, see get_sensor_config"""
+        fn_config = os.path.join(importlib.resources.files("pyrnet"), "share/pyrnet_sensor_config.json")
+        return self._cached("sconfig", [fn_config], lambda: get_sensor_config(self._sconfig))
+
+    def get_cfmeta(self) -> (dict, dict, dict):
+        """Global attributes, variable attributes and encoding, see get_cfmeta.
+        The global attributes are a copy and can be updated in place.
+        """
+        config = self.config
+        fn_config = os.path.join(importlib.resources.files("pyrnet"), "share/pyrnet_config.json")
+        gattrs, vattrs, vencode = self._cached(
+            "cfmeta", [fn_config, config["file_cfmeta"]], lambda: get_cfmeta(config)
+        )
+        return dict(gattrs), vattrs, vencode
+
+    def read_json(self, fname: str) -> dict:
+        """Parsed json file, see pyrnet.utils.read_json"""
+        return self._cached(("json", fname), [fname], lambda: pyrnet.utils.read_json(fname))
+
+    @property
+    def meta_index(self) -> pyrnet.pyrnet.MetaIndex:
+        """Compiled calibration and box - serial number mapping, see pyrnet.pyrnet.MetaIndex"""
+        config = self.config
+        fnames = [config['file_calibration'], config['file_mapping']]
+        return self._cached(("meta_index",)+tuple(fnames), fnames, lambda: pyrnet.pyrnet.MetaIndex(*fnames))
+
+    def meta_lookup(self, date, *, box=None, serial=None) -> tuple:
+        """Box number, serials, calibration factors and cosine correction coefficients,
+        see pyrnet.pyrnet.meta_lookup"""
+        return self.meta_index.lookup(date, box=box, serial=serial)
+
+# %% ../../nbs/pyrnet/data.ipynb 23
+class ProcessingManifest:
+    """
+    SQLite manifest of processed input files and their outputs.
+    File hashes are cached and only computed again, if size or modification time of a file changed.
+
+    Parameters
+    ----------
+    fname: str
+        Path of the SQLite database, created if it does not exist.
+    """
+    def __init__(self, fname: str):
+        self.fname = fname
+        self._db = sqlite3.connect(fname)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, hash TEXT)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tasks (task TEXT PRIMARY KEY, key TEXT, version TEXT, outputs TEXT, updated TEXT)"
+            )
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def file_hash(self, fname: str) -> str:
+        """sha1 of the file content (or of all files of a directory, e.g. zarr stores)"""
+        fname = os.path.abspath(fname)
+        if os.path.isdir(fname):
+            fnames = sorted(os.path.join(root, fn) for root, _, fns in os.walk(fname) for fn in fns)
+            h = hashlib.sha1()
+            for fn in fnames:
+                h.update(f"{os.path.relpath(fn, fname)}:{self.file_hash(fn)}".encode())
+            return h.hexdigest()
+        st = os.stat(fname)
+        row = self._db.execute("SELECT size, mtime, hash FROM files WHERE path=?", (fname,)).fetchone()
+        if row is not None and row[0]==st.st_size and row[1]==st.st_mtime_ns:
+            return row[2]
+        h = hashlib.sha1()
+        with open(fname, 'rb') as f:
+            while data := f.read(2**20):
+                h.update(data)
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (fname, st.st_size, st.st_mtime_ns, h.hexdigest())
+            )
+        return h.hexdigest()
+
+    def task_key(self, inputs: list[str], config: dict, report=None, station=None) -> str:
+        """
+        Key of a processing task.
+
+        Parameters
+        ----------
+        inputs: list of str
+            Input files of the task.
+        config: dict
+            Processing config, see get_config. The content of all referenced files (file_* keys),
+            as well as the default config and sensor config files are included.
+        report: dict, pd.DataFrame or None
+            Maintenance report. For parsed reports, only the entry of *station* is included.
+        station: int or None
+            Station number of the task.
+
+        Returns
+        -------
+        str
+            sha1 of the task dependencies.
+        """
+        share = importlib.resources.files("pyrnet")
+        files = [
+            os.path.join(share, "share/pyrnet_config.json"),
+            os.path.join(share, "share/pyrnet_sensor_config.json"),
+        ] + [config[k] for k in sorted(config) if k.startswith("file_") and config[k] is not None]
+        if isinstance(report, dict) and station is not None:
+            report = report.get(f"{station:03d}", None)
+        elif isinstance(report, pd.DataFrame):
+            report = report.to_json()
+        deps = dict(
+            version=pyrnet_version,
+            inputs=[self.file_hash(fn) for fn in inputs],
+            config={k: v for k, v in config.items() if k!="cache_dir"},
+            files=[self.file_hash(fn) for fn in files],
+            report=report
+        )
+        return hashlib.sha1(json.dumps(deps, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_current(self, task: str, key: str) -> bool:
+        """True, if the task was recorded with the same key and all of its outputs exist"""
+        row = self._db.execute("SELECT key, outputs FROM tasks WHERE task=?", (task,)).fetchone()
+        if row is None or row[0]!=key:
+            return False
+        return all(os.path.exists(fn) for fn in json.loads(row[1]))
+
+    def record(self, task: str, key: str, outputs: list[str]):
+        """Record the key and output files of a done task.
+        Tasks without outputs are not recorded, they run again next time.
+        """
+        now = pd.to_datetime(np.datetime64("now"))
+        with self._db:
+            if len(outputs)==0:
+                self._db.execute("DELETE FROM tasks WHERE task=?", (task,))
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)",
+                (task, key, pyrnet_version, json.dumps([os.path.abspath(fn) for fn in outputs]), now.isoformat())
+            )
+
+# %% ../../nbs/pyrnet/data.ipynb 25
 def calc_encoding(sconfig:dict, ADCV=3.3, ADCbits=10) -> dict:
     ADCfac = ADCV / (2**ADCbits-1) # Last bit is reserved 
     sencoding = {}
@@ -235,8 +837,8 @@ def calc_encoding(sconfig:dict, ADCV=3.3, ADCbits=10) -> dict:
         )
     return sencoding
 
-# %% ../../nbs/pyrnet/data.ipynb 24
-def add_encoding(ds, vencode=None):
+# %% ../../nbs/pyrnet/data.ipynb 31
+def add_encoding(ds, vencode=None, session=None):
     """
     Set valid_range attribute and encoding to every variable of the dataset.
 
@@ -247,6 +849,8 @@ def add_encoding(ds, vencode=None):
         determined by the global attribute 'processing_level'.
     vencode: dict or None
         Dictionary of encoding attributes by variable name, will be merged with pyrnet default cfmeta. The default is None.
+    session: ProcessingSession or None
+        Session providing the parsed cfmeta. The default is None (parse the default cfmeta).
 
     Returns
     -------
@@ -254,7 +858,10 @@ def add_encoding(ds, vencode=None):
         The input dataset but with encoding and valid_range attribute.
     """
     # prepare netcdf encoding
-    _, vattrs_default, vencode_default = get_cfmeta()
+    if session is None:
+        _, vattrs_default, vencode_default = get_cfmeta()
+    else:
+        _, vattrs_default, vencode_default = session.get_cfmeta()
 
     # Add valid range temporary to encoding dict.
     # As valid_range is not implemented in xarray encoding,
@@ -324,7 +931,174 @@ def add_encoding(ds, vencode=None):
         raise ValueError("Dataset has no 'processing_level' attribute.")
     return ds
 
-# %% ../../nbs/pyrnet/data.ipynb 29
+# %% ../../nbs/pyrnet/data.ipynb 36
+# chunk sizes along time and station dimensions (None: whole dimension)
+ENCODING_PROFILES = {
+    "archive": dict(
+        chunks={"time": 86400, "station": None},
+        shuffle=True,
+        complevel=9,
+        time_dtype="float64"
+    ),
+    "timeseries": dict(
+        chunks={"time": 86400, "station": 1},
+        shuffle=True,
+        complevel=4,
+        time_dtype="int64"
+    ),
+    "snapshot": dict(
+        chunks={"time": 600, "station": None},
+        shuffle=True,
+        complevel=1,
+        time_dtype="int64"
+    ),
+}
+_TIME_DIMS = ["time", "gpstime", "adctime"]
+
+def apply_encoding_profile(ds, profile, timevar="time"):
+    """
+    Set chunk shapes, compression and time dtype of a named encoding profile.
+
+    Parameters
+    ----------
+    ds: xr.Dataset
+        Dataset of any processing level, usually with encoding from `add_encoding`.
+    profile: str
+        Name of the profile, one of ENCODING_PROFILES.
+    timevar: str
+        Name of the time coordinate. The default is 'time'.
+
+    Returns
+    -------
+    xr.Dataset
+        Shallow copy of the input dataset with updated encoding.
+    """
+    if profile not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile {profile}, choose one of {list(ENCODING_PROFILES)}.")
+    config = ENCODING_PROFILES[profile]
+    ds = ds.copy()
+    for var in ds.variables:
+        encoding = _merged_encoding(ds[var].encoding)
+        if ds[var].ndim > 0 and ds[var].dtype.kind not in "OSU":
+            chunks = []
+            for dim in ds[var].dims:
+                if dim in _TIME_DIMS:
+                    size = config["chunks"]["time"]
+                else:
+                    size = config["chunks"].get(dim, None)
+                chunks.append(max(1, ds.sizes[dim] if size is None else min(size, ds.sizes[dim])))
+            encoding.update({
+                "zlib": True,
+                "shuffle": config["shuffle"],
+                "complevel": config["complevel"],
+                "chunksizes": tuple(chunks),
+            })
+        ds[var].encoding = encoding
+    
+    # integer time in milliseconds
+    ds[timevar].encoding["dtype"] = config["time_dtype"]
+    units = ds[timevar].encoding.get("units", "")
+    if config["time_dtype"].startswith("int") and units.startswith("seconds since"):
+        ds[timevar].encoding["units"] = "milli" + units
+    return ds
+
+def bench_encoding(fname, profiles=None, repeat=3):
+    """
+    Measure write time, file size and read latencies of encoding profiles.
+
+    The read latencies are measured for the time series of the first station
+    and for all stations at the middle time step of the first
+    variable with time and station dimensions.
+
+    Parameters
+    ----------
+    fname: str
+        Path of a pyrnet netCDF file of any processing level.
+    profiles: list of str or None
+        Names of the profiles. The default is None (all ENCODING_PROFILES).
+    repeat: int
+        Number of repetitions, the minimum time is reported. The default is 3.
+
+    Returns
+    -------
+    pd.DataFrame
+        Write time (s), file size (MB), station read and snapshot read latency (ms) by profile.
+        The input file is reported as profile 'input'.
+    """
+    if profiles is None:
+        profiles = list(ENCODING_PROFILES)
+    ds = xr.load_dataset(fname)
+    timevar = "time" if "time" in ds.dims else "gpstime"
+    var = [var for var in ds if len(ds[var].dims)==2 and "station" in ds[var].dims][0]
+    tdim = [dim for dim in ds[var].dims if dim!="station"][0]
+    
+    def _read(fn, indexer):
+        t0 = time.perf_counter()
+        with _NETCDF_LOCK, netCDF4.Dataset(fn) as nc:
+            nc[var].set_auto_maskandscale(True)
+            nc[var][indexer]
+        return time.perf_counter() - t0
+    
+    dims = ds[var].dims
+    istation = {tdim: slice(None), "station": 0}
+    isnapshot = {tdim: ds.sizes[tdim]//2, "station": slice(None)}
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in ["input"] + list(profiles):
+            fn = os.path.join(tmpdir, f"{profile}.nc")
+            twrite = np.nan
+            if profile == "input":
+                fn = fname
+            else:
+                twrite = np.inf
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    to_netcdf(ds, fn, timevar=timevar, profile=profile)
+                    twrite = min(twrite, time.perf_counter() - t0)
+            results.append({
+                "profile": profile,
+                "write_s": twrite,
+                "size_MB": os.path.getsize(fn) / 2**20,
+                "read_station_ms": 1e3*min(_read(fn, tuple(istation[d] for d in dims)) for _ in range(repeat)),
+                "read_snapshot_ms": 1e3*min(_read(fn, tuple(isnapshot[d] for d in dims)) for _ in range(repeat)),
+            })
+    return pd.DataFrame(results).set_index("profile")
+
+# %% ../../nbs/pyrnet/data.ipynb 38
+def iter_raw_records(
+        fname: str,
+        date_of_measure: np.datetime64 = np.datetime64("now"),
+        config: dict|None = None
+) -> Iterator:
+    """
+    Parse a raw logger file block by block, or read the parsed records from the record cache.
+
+    Parameters
+    ----------
+    fname: str
+        Path of the raw logger file.
+    date_of_measure: np.datetime64
+        Rough date of measurement to account for GPS week rollover.
+    config: dict
+        Config dictionary, the record cache is used if "cache_dir" is set. The default is None (default config).
+
+    Yields
+    ------
+    rec_adc, rec_gprmc: ndarray
+        Consecutive blocks of parsed records, see pyrnet.logger.iter_records.
+    """
+    if config is None:
+        config = get_config()
+    date_of_measure = pyrnet.utils.to_datetime64(date_of_measure)
+    if config["cache_dir"] is None:
+        return pyrnet.logger.iter_records(fname=fname, date_of_measure=date_of_measure)
+    return pyrnet.logger.iter_cached_records(
+        fname=fname,
+        date_of_measure=date_of_measure,
+        cache_dir=config["cache_dir"],
+        cache_size=config["cache_size"]
+    )
+
 def to_l1a(
         fname : str,
         *,
@@ -333,7 +1107,9 @@ def to_l1a(
         date_of_measure : np.datetime64 = np.datetime64("now"),
         config: dict|None = None,
         sconfig: dict|None = None,
-        global_attrs: dict|None = None
+        global_attrs: dict|None = None,
+        records: Iterable|None = None,
+        session: ProcessingSession|None = None
 ) -> xr.Dataset|None:
     """
     Read logger raw file and parse it to xarray Dataset. Thereby, attributes and names are defined via cfmeta.json file and sun position values are calculated and added.
@@ -356,10 +1132,18 @@ def to_l1a(
             * cfjson -> path to cfmeta.json, the default is "../share/pyrnet_cfmeta.json"
             * stripminutes -> number of minutes to be stripped from the data at start and end,
                 the default is 5.
+            * cache_dir -> directory of the parsed record cache, the default is None (no caching).
+            * cache_size -> maximum size of the record cache in bytes.
     sconfig: dict
         Config for ADC and amplifier for each sensor. The default is "../share/pyrnet_sensor_config.json"
     global_attrs: dict
         Additional global attributes for the Dataset. (Overrides cfmeta.json attributes)
+    records: iterable or None
+        Consecutive blocks of parsed (rec_adc, rec_gprmc) records of the file, e.g. from
+        pyrnet.logger.follow_records. If given, fname is not read. The default is None.
+    session: ProcessingSession or None
+        Session providing the parsed config and meta data files. If given, config and sconfig
+        are taken from the session. The default is None.
     Returns
     -------
     xarray.Dataset
@@ -369,11 +1153,13 @@ def to_l1a(
     ADCbits = 10
     
     # load and merge  default config
-    config = get_config(config)
-    gattrs, vattrs, vencode = get_cfmeta(config)
+    if session is None:
+        session = ProcessingSession(config, sconfig)
+    config = session.config
+    gattrs, vattrs, vencode = session.get_cfmeta()
     
     # update encoding with sensor config for l1a
-    sconfig = get_sensor_config(sconfig)
+    sconfig = session.sconfig
     sencoding = calc_encoding(sconfig, ADCV=ADCV, ADCbits=ADCbits)
     # update encoding with sensor config for l1a
     for var, enc in sencoding.items():
@@ -389,19 +1175,31 @@ def to_l1a(
 
     date_of_measure = pyrnet.utils.to_datetime64(date_of_measure)
 
-    # 1. Parse raw file
-    rec_adc, rec_gprmc = pyrnet.logger.read_records(fname=fname, date_of_measure=date_of_measure)
-
-    if type(rec_adc)==bool or len(rec_gprmc.time)<3:
+    # 1. Parse raw file block by block, or read the parsed records from cache
+    if records is None:
+        records = iter_raw_records(fname, date_of_measure=date_of_measure, config=config)
+    adctime, adc_volts, rec_gprmc = [], [], []
+    for rec_adc, gprmc in records:
+        rec_gprmc.append(gprmc)
+        if rec_adc.shape[0]==0:
+            continue
+        # Get ADC time, continued from the last record of the previous block
+        if adctime:
+            ta = pyrnet.logger.get_adc_time(np.concatenate((last_adc, rec_adc)))[1:] + adctime[-1][-1]
+        else:
+            ta = pyrnet.logger.get_adc_time(rec_adc)
+        adctime.append(ta)
+        last_adc = rec_adc[-1:]
+        # ADC to Volts
+        # Drop time and internal battery sensor output (columns 0 and 1)
+        adc_volts.append(ADCV * rec_adc[:,2:] / float(2**ADCbits - 1))
+
+    if not adctime or sum(len(r) for r in rec_gprmc)<3:
         logger.debug("Failed to load the data from the file, because of not enough stable GPS data, or file is empty.")
         return None
-
-    # Get ADC time
-    adctime = pyrnet.logger.get_adc_time(rec_adc)
-
-    # ADC to Volts
-    # Drop time and internal battery sensor output (columns 0 and 1)
-    adc_volts = ADCV * rec_adc[:,2:] / float(2**ADCbits - 1)
+    adctime = np.concatenate(adctime)
+    adc_volts = np.concatenate(adc_volts)
+    rec_gprmc = np.concatenate(rec_gprmc).view(np.recarray)
 
     # 2. Get Logbook maintenance quality flags
     key = f"{station:03d}"
@@ -460,7 +1258,7 @@ def to_l1a(
     })
     # add site information
     if config['sites'] is not None:
-        sites = pyrnet.utils.read_json(config['file_site'])[config['sites']]
+        sites = session.read_json(config['file_site'])[config['sites']]
         if key in sites:
             gattrs.update({ "site" : sites[key]})
 
@@ -470,7 +1268,7 @@ def to_l1a(
     vattrs = assoc_in(vattrs, ["gti","vangle"], 0.)
     # update with angles from mapping file
     if config['gti_angles'] is not None:
-        gti_angles = pyrnet.utils.read_json(config['file_gti_angles'])[config['gti_angles']]
+        gti_angles = session.read_json(config['file_gti_angles'])[config['gti_angles']]
         if key in gti_angles:
             hangle = np.nan if gti_angles[key][0] is None else gti_angles[key][0]
             vangle = np.nan if gti_angles[key][1] is None else gti_angles[key][1]
@@ -537,75 +1335,156 @@ def to_l1a(
             ds[key].attrs.update(v)
 
     # add encoding to Dataset
-    ds = add_encoding(ds, vencode)
+    ds = add_encoding(ds, vencode, session=session)
 
     return ds
 
-# %% ../../nbs/pyrnet/data.ipynb 62
-def to_l1b(
-        fname: str,
-        *,
-        config: dict | None = None,
-        global_attrs: dict | None = None,
-        check_adc_sync: bool = True
-) -> xr.Dataset|None:
-
-    config = get_config(config)
-    gattrs, vattrs, vencode = get_cfmeta(config)
+# %% ../../nbs/pyrnet/data.ipynb 71
+def _searchsorted_utc(sync, adctime, t, side='left'):
+    # same as np.searchsorted(sync.to_utc(adctime), t, side), without converting all samples
+    ta = adctime.astype('timedelta64[ms]').astype(np.int64)
+    i = np.searchsorted(ta, sync.to_adctime(t), side=side)
+    # correct for rounding of the fit
+    i0, i1 = max(i-10, 0), min(i+10, ta.size)
+    return i0 + int(np.searchsorted(sync.to_utc(ta[i0:i1]), t, side=side))
+
+def _iter_l1b(fname, config, global_attrs, check_adc_sync, daily, session, add_qc=True, days=None, sync=None, period=None):
+    # l1a -> l1b, processed as a whole or one UTC day at a time
+    if session is None:
+        session = ProcessingSession(config)
+    config = session.config
+    gattrs, vattrs, vencode = session.get_cfmeta()
 
     if global_attrs is not None:
         gattrs.update(global_attrs)
 
     ######################################################################################
-    ## Load l1a data
-    ds_l1a = xr.open_dataset(fname)
+    ## Load l1a data (lazy, the adc time dependent variables are read per chunk)
+    if isinstance(fname, xr.Dataset):
+        ds_l1a = fname
+        fname = ds_l1a.encoding.get("source", "l1a dataset")
+    else:
+        ds_l1a = xr.open_dataset(fname)
     # check correct file
     if ds_l1a.processing_level != "l1a":
         logger.warning(f"{fname} is not a l1a file. Skip.")
-        return None
+        return
+
+    adctime = ds_l1a.adctime.values
+    if sync is not None:
+        # ADC time synced by the caller, e.g. the new records of a growing file,
+        # only the samples within period are processed
+        tstart, tend = period
+        istart = _searchsorted_utc(sync, adctime, tstart, side='left')
+        iend = _searchsorted_utc(sync, adctime, tend, side='left')
+        if iend <= istart:
+            return
+    else:
+        ######################################################################################
+        ## Sync GPS to ADC time, the fit is done once for the whole file
+        iadc = ds_l1a.iadc.squeeze().values.astype(int)
+        sync = pyrnet.logger.AdcTimeSync()
+        sync.update(adctime.astype('timedelta64[ms]')[iadc], ds_l1a.gpstime.values)
+        if not sync.check() and check_adc_sync:
+            logger.warning(f"Could not fit GPS to ADC time for file {fname}. Skip.")
+            return
+
+        tfirst, tlast = sync.to_utc(adctime[[0,-1]])
+        logger.info(f"Dataset time coverage before strip: {tfirst} - {tlast}")
+
+        ######################################################################################
+        ## Drop first and last <stripminutes> minutes of data to avoid bad data due to maintenance
+        stripminutes = np.timedelta64(int(config['stripminutes']), 'm')
+        if (tfirst + 3*stripminutes) > tlast:
+            logger.warning(f"{fname} has not enough data. Skip.")
+            return
+
+        tstart, tend = tfirst + stripminutes, tlast - stripminutes
+        istart = _searchsorted_utc(sync, adctime, tstart, side='right')
+        iend = _searchsorted_utc(sync, adctime, tend, side='left')
+        if iend - istart < 10:
+            logger.warning(f"{fname} has not enough data, after strip. Skip.")
+            return
+
+    tfirst, tlast = sync.to_utc(adctime[[istart, iend-1]])
+    logger.info(f"Dataset time coverage after strip: {tfirst} - {tlast}")
 
     ######################################################################################
-    ## Sync GPS to ADC time
-    adctime = pyrnet.logger.sync_adc_time(
-        adctime = ds_l1a.adctime.values,
-        gpstime = ds_l1a.gpstime.values,
-        iadc = ds_l1a.iadc.squeeze().values.astype(int),
-        check_results = check_adc_sync
-    )
-    
-    if adctime is None:
-        logger.warning(f"Could not fit GPS to ADC time for file {fname}. Skip.")
-        return None
+    ## Values of the whole interval
+    # calibration is looked up for the start of the interval
+    slots, tbin = pyrnet.utils.time_slots([tfirst, tlast], config['l1bfreq'])
+    box = ds_l1a.station.values[0]
+    meta = session.meta_lookup(tbin, box=box)
+    logger.info(f"Meta Lookup:")
+    logger.info(f">> Box={box}")
+    logger.info(f">> serial(s)={meta[1]}")
+    logger.info(f">> calibration factor(s)={meta[2]}")
+
+    # earth sun distance is averaged over the interval
+    esd = np.mean(sp.earth_sun_distance(
+        tbin + np.arange(slots[-1]+1)*pd.Timedelta(config['l1bfreq']).to_timedelta64()
+    ))
+
+    # GPS records are small, keep them in memory
+    ds_gps = ds_l1a.drop_dims("adctime")
+    ds_gps = ds_gps.drop_vars(['iadc']).load()
+    # Decide whether geo coordinates should be averaged or not
+    if config['average_latlon']:
+        ds_gps = ds_gps.mean('gpstime', skipna=True, keep_attrs=True)
+
+    ######################################################################################
+    ## Process chunks
+    if daily:
+        alldays = np.arange(
+            tfirst.astype('datetime64[D]'),
+            tlast.astype('datetime64[D]') + np.timedelta64(1, 'D')
+        )
+        if days is not None:
+            alldays = alldays[np.isin(alldays, np.asarray(days, dtype='datetime64[D]'))]
+        # the flags of the qc comparison test depend on the samples of a trailing window,
+        # days start with the samples of the window before the day, which are dropped after the qc
+        context = np.timedelta64(0, 'ms')
+        if add_qc:
+            context = _QC_WINDOW*pd.to_timedelta(config['l1bfreq']).to_timedelta64()
+        chunks = []
+        for day in alldays:
+            i0 = max(_searchsorted_utc(sync, adctime, day - context, side='left'), istart)
+            i1 = min(_searchsorted_utc(sync, adctime, day + np.timedelta64(1, 'D'), side='left'), iend)
+            chunks.append((slice(i0, i1), day, day + np.timedelta64(1, 'D')))
+    else:
+        context = np.timedelta64(0, 'ms')
+        chunks = [(slice(istart, iend), tfirst, tlast + np.timedelta64(1, 'ms'))]
+
+    # samples within [istart, iend) and the chunk period
+    for isel, t0, t1 in chunks:
+        ds_l1b = ds_l1a.isel(adctime=isel).drop_dims('gpstime')
+        time = sync.to_utc(ds_l1b.adctime.values)
+        mask = (time>=t0-context) * (time<t1)
+        if np.sum(mask * (time>=t0)) == 0:
+            continue
+        ds_l1b = _l1b_chunk(
+            ds_l1b.isel(adctime=mask), time[mask],
+            ds_l1a=ds_l1a, ds_gps=ds_gps, meta=meta, esd=esd,
+            config=config, vattrs=vattrs, vencode=vencode, session=session,
+            add_qc=add_qc, tmin=t0 if context else None
+        )
+        yield ds_l1b
 
+def _l1b_chunk(ds_l1b, time, ds_l1a, ds_gps, meta, esd, config, vattrs, vencode, session, add_qc=True, tmin=None):
+    # processing of the ADC samples of one chunk to l1b, samples before tmin
+    # are the context of the qc and dropped afterwards
     ######################################################################################
     ## Create new dataset (l1b)
-    ds_l1b = ds_l1a.drop_dims('gpstime')
     ds_l1b = ds_l1b.drop_vars(['maintenance_flag_ghi','maintenance_flag_gti']) # keep only time dependent variables
-    ds_l1b = ds_l1b.assign({'time': ('adctime', adctime)})
+    ds_l1b = ds_l1b.assign({'time': ('adctime', time)})
     ds_l1b = ds_l1b.swap_dims({"adctime":"time"})
     ds_l1b = ds_l1b.drop_vars("adctime")
 
+    tunits = ds_l1b.time.data[0] if tmin is None else max(ds_l1b.time.data[0], tmin)
     ds_l1b["time"].encoding.update({
         "dtype": 'float64',
-        "units": f"seconds since {np.datetime_as_string(ds_l1b.time.data[0], unit='D')}T00:00Z",
+        "units": f"seconds since {np.datetime_as_string(tunits, unit='D')}T00:00Z",
     })
-    logger.info(f"Dataset time coverage before strip: {ds_l1b.time.values[0]} - {ds_l1b.time.values[-1]}")
-
-    ######################################################################################
-    ## Drop first and last <stripminutes> minutes of data to avoid bad data due to maintenance
-    stripminutes = np.timedelta64(int(config['stripminutes']), 'm')
-    if (ds_l1b.time.values[0] + 3*stripminutes) > ds_l1b.time.values[-1]:
-        logger.warning(f"{fname} has not enough data. Skip.")
-        return None
-
-    ds_l1b = ds_l1b.isel(time=ds_l1b.time>ds_l1b.time.values[0] + stripminutes)
-    ds_l1b = ds_l1b.isel(time=ds_l1b.time<ds_l1b.time.values[-1] - stripminutes)
-    if ds_l1b.time.size < 10:
-        logger.warning(f"{fname} has not enough data, after strip. Skip.")
-        return None
-
-
-    logger.info(f"Dataset time coverage after strip: {ds_l1b.time.values[0]} - {ds_l1b.time.values[-1]}")
 
     #####################################################################################
     ## resample to desired resolution
@@ -616,12 +1495,12 @@ def to_l1b(
     # resample on time dimension with specified methods
     methods = ['mean'] + config["l1b_resample_stats"]
     res = resample(
-        ds_l1b.squeeze().drop_vars("station"), # drop station coordinate and variable
+        ds_l1b.squeeze("station").drop_vars("station"), # drop station coordinate and variable
         freq=config['l1bfreq'],
         methods=methods,
         kwargs=dict(skipna=True)
     )
-    
+
     # add standard names for new variables
     # apply for variables if both in config['radflux_varname'] and ds_l1b.keys()
     radflux_vars = list(set(config['radflux_varname'])&set(ds_l1b.keys()))
@@ -632,23 +1511,17 @@ def to_l1b(
             ds_l1b[f"{var}_{method}"].attrs.update({
                 "standard_name": f"{method}_"+ds_l1b[f"{var}_{method}"].attrs["standard_name"]
             })
-    
+
     # add station dimension back again
     ds_l1b = ds_l1b.expand_dims(station_dim, axis=-1)
     ds_l1b["station"].attrs.update(station_attrs)
-    
+
     # add maintenancetime coord
     ds_l1b = ds_l1b.assign_coords({"maintenancetime":ds_l1a.maintenancetime})
-    
+
     ######################################################################################
     ## Interpolate GPS coordinates to l1b time
-    ds_gps = ds_l1a.drop_dims("adctime")
-    ds_gps = ds_gps.drop_vars(['iadc'])
-
-    # Decide whether geo coordinates should be averaged or not
-    if config['average_latlon']:
-        ds_gps = ds_gps.mean('gpstime', skipna=True, keep_attrs=True)
-    else:
+    if not config['average_latlon']:
         ds_gps = ds_gps.interp(gpstime=ds_l1b.time)
         ds_gps = ds_gps.drop_vars("gpstime")
 
@@ -664,12 +1537,10 @@ def to_l1b(
     szen  = szen.squeeze()
     sazi = sazi.squeeze()
 
-    esd = np.mean(sp.earth_sun_distance(ds_l1b.time.values))
-
     ds_l1b = ds_l1b.assign(
         {
-            "szen": (("time", "station"), szen[:,None]),
-            "sazi": (("time", "station"), sazi[:,None]),
+            "szen": (("time", "station"), szen.reshape(-1,1)),
+            "sazi": (("time", "station"), sazi.reshape(-1,1)),
             "esd": ("station", [esd])
         }
     )
@@ -679,17 +1550,7 @@ def to_l1b(
 
     ######################################################################################
     ## rad flux calibration
-    box = ds_l1b.station.values[0]
-    boxnumber, serial, cfac, CCcoef = pyrnet.pyrnet.meta_lookup(
-        ds_l1b.time.values[0],
-        box=box,
-        cfile=config['file_calibration'],
-        mapfile=config['file_mapping'],
-    )
-    logger.info(f"Meta Lookup:")
-    logger.info(f">> Box={box}")
-    logger.info(f">> serial(s)={serial}")
-    logger.info(f">> calibration factor(s)={cfac}")
+    boxnumber, serial, cfac, CCcoef = meta
 
     mu0 = np.cos(np.deg2rad(ds_l1b.szen.values))
     
@@ -741,7 +1602,10 @@ def to_l1b(
 
     ######################################################################################  
     ## add quality flags
-    ds_l1b = pyrnet.qcrad.add_qc_flags(ds_l1b, config["radflux_varname"])
+    if add_qc:
+        ds_l1b = pyrnet.qcrad.add_qc_flags(ds_l1b, config["radflux_varname"])
+    if tmin is not None:
+        ds_l1b = ds_l1b.isel(time=ds_l1b.time.values>=tmin)
 
     ######################################################################################
     ## Update variables, global attributes and encoding
@@ -753,54 +1617,172 @@ def to_l1b(
     ds_l1b.attrs["history"] = ds_l1b.history + f"{now.isoformat()}: Generated level l1b  by pyrnet version {pyrnet_version}; "
 
     # update encoding
-    ds_l1b = add_encoding(ds_l1b, vencode=vencode)
+    ds_l1b = add_encoding(ds_l1b, vencode=vencode, session=session)
 
     return ds_l1b
 
-# %% ../../nbs/pyrnet/data.ipynb 72
+def to_l1b(
+        fname: str|xr.Dataset,
+        *,
+        config: dict | None = None,
+        global_attrs: dict | None = None,
+        check_adc_sync: bool = True,
+        session: ProcessingSession | None = None
+) -> xr.Dataset|None:
+    """
+    Process l1a to l1b data, the whole maintenance interval at once.
+    See iter_l1b_daily to process long intervals with less memory.
+    """
+    for ds_l1b in _iter_l1b(fname, config, global_attrs, check_adc_sync, daily=False, session=session):
+        return ds_l1b
+    return None
+
+def iter_l1b_daily(
+        fname: str|xr.Dataset,
+        *,
+        config: dict | None = None,
+        global_attrs: dict | None = None,
+        check_adc_sync: bool = True,
+        session: ProcessingSession | None = None,
+        add_qc: bool = True,
+        days: list | None = None,
+        sync: pyrnet.logger.AdcTimeSync | None = None,
+        period: tuple | None = None
+) -> Iterator[xr.Dataset]:
+    """
+    Process l1a to l1b data one UTC day at a time. The ADC clock is synced once,
+    then the samples of each day are read, resampled, calibrated and quality controlled.
+    Peak memory is about one day of l1a data.
+
+    Parameters
+    ----------
+    fname: str or xarray.Dataset
+        Path of the l1a file or the l1a Dataset itself.
+    config: dict or None
+        Config overwriting the default config, see get_config.
+    global_attrs: dict or None
+        Additional global attributes.
+    check_adc_sync: bool
+        If True, skip files with implausible ADC clock drift. The default is True.
+    session: ProcessingSession or None
+        Session providing the parsed config and meta data files. If given, config is taken
+        from the session. The default is None.
+    add_qc: bool
+        If True, add the automatic quality flags. Set to False if the flags are
+        computed later on the merged data anyway, e.g. for network files. The default is True.
+    days: list of np.datetime64 or None
+        Only process these UTC days, e.g. the days touched by new data. The default is None (all days).
+    sync: pyrnet.logger.AdcTimeSync or None
+        Fit of the GPS to the ADC time, e.g. kept up to date with the records of a growing file.
+        If given, the ADC time is not synced again and only the samples within period are processed.
+        The default is None.
+    period: tuple of np.datetime64 or None
+        Only with sync. Start (inclusive) and end (exclusive) UTC time of the samples to process.
+
+    Yields
+    ------
+    xarray.Dataset
+        l1b Dataset of one day.
+    """
+    yield from _iter_l1b(fname, config, global_attrs, check_adc_sync, daily=True, session=session, add_qc=add_qc, days=days, sync=sync, period=period)
+
+def to_l1b_from_records(
+        fname: str,
+        *,
+        station: int,
+        report: dict|pd.DataFrame|None,
+        date_of_measure: np.datetime64 = np.datetime64("now"),
+        config: dict|None = None,
+        sconfig: dict|None = None,
+        global_attrs: dict|None = None,
+        records: Iterable|None = None,
+        l1a_fname: str|None = None,
+        check_adc_sync: bool = True,
+        session: ProcessingSession|None = None
+) -> xr.Dataset|None:
+    """
+    Process a logger raw file directly to l1b. The parsed records are synced, resampled,
+    calibrated and quality controlled in memory, without writing and reading back the l1a netCDF.
+
+    Parameters
+    ----------
+    fname, station, report, date_of_measure, config, sconfig, records:
+        See to_l1a.
+    global_attrs: dict or None
+        Additional global attributes for l1a and l1b.
+    l1a_fname: str or None
+        If given, the l1a Dataset is written to this file as side output. The default is None.
+    check_adc_sync: bool
+        See to_l1b.
+    session: ProcessingSession or None
+        See to_l1a.
+
+    Returns
+    -------
+    xarray.Dataset or None
+        l1b Dataset of the whole maintenance interval, see iter_l1b_daily to process it per day.
+    """
+    if session is None:
+        session = ProcessingSession(config, sconfig)
+    ds_l1a = to_l1a(
+        fname,
+        station=station,
+        report=report,
+        date_of_measure=date_of_measure,
+        global_attrs=global_attrs,
+        records=records,
+        session=session
+    )
+    if ds_l1a is None:
+        return None
+    if l1a_fname is not None:
+        to_netcdf(ds_l1a, l1a_fname, timevar="gpstime")
+    return to_l1b(
+        ds_l1a,
+        global_attrs=global_attrs,
+        check_adc_sync=check_adc_sync,
+        session=session
+    )
+
+
+
+# %% ../../nbs/pyrnet/data.ipynb 81
 def _sort_by_station(dslist):
     # sort dslist for first station
     station0 = []
     for i in range(len(dslist)):
         station0.append(int(dslist[i]["station"].values[0]))
-    isort = np.argsort(station0).ravel()
+    # stable, datasets of the same station keep their order
+    isort = np.argsort(station0, kind="stable").ravel()
     dslist = [dslist[i] for i in isort]
     return dslist
 
 
-# %% ../../nbs/pyrnet/data.ipynb 75
+# %% ../../nbs/pyrnet/data.ipynb 84
+def _last_by_station(stations, values):
+    # keep the value of the last dataset for every station, sorted by station
+    stations = np.asarray(stations)
+    _, idx = np.unique(stations[::-1], return_index=True)
+    idx = len(stations) - 1 - idx
+    return [values[i] for i in idx]
+
 def _merge_gattrs_by_station(dslist, merge_gattrs):
-    # merge variable attrs:
-    merge_gattrs_fill_value = [merge_gattrs[key] for key in merge_gattrs] 
-    merge_gattrs = [key for key in merge_gattrs]
-    
-    merged_gattrs = {}
-    gattrs_idx = {}
-    for i in range(len(dslist)):
-        dst = dslist[i]
-        for j,attr in enumerate(merge_gattrs):
+    # columnar table of station index and attribute values, appended per dataset
+    table = {attr: ([], []) for attr in merge_gattrs}
+    for dst in dslist:
+        stations = list(dst.station.values.astype(int))
+        for attr in merge_gattrs:
             if attr not in dst.attrs:
-                fill_value = dst.station.size * [merge_gattrs_fill_value[j]]
                 dst.attrs.update({
-                    attr: fill_value
+                    attr: dst.station.size * [merge_gattrs[attr]]
                 })
-            # save station index, as attributes are related to station dimension
-            attridx = list(dst.station.values.astype(int))
-            attrval = list(pyrnet.utils.make_iter(dst.attrs[attr]))
-            # merge attributes, overwrite values of same station
-            if attr in merged_gattrs:
-                mattrval = merged_gattrs[attr] + attrval
-                mattridx = gattrs_idx[attr] + attridx
-                _,idx = np.unique(mattridx, return_index=True)
-                attridx = [mattridx[i] for i in idx]
-                attrval = [mattrval[i] for i in idx]
-            gattrs_idx = assoc_in(
-                gattrs_idx, [attr], attridx
-            )
-            merged_gattrs = assoc_in(
-                merged_gattrs, [attr], attrval
-            )
-    return merged_gattrs
+            table[attr][0].extend(stations)
+            table[attr][1].extend(pyrnet.utils.make_iter(dst.attrs[attr]))
+    
+    # merge attributes, overwrite values of same station
+    return {
+        attr: _last_by_station(*table[attr]) for attr in table
+    }
 
 def _merge_vattrs_by_station(dslist, merge_attrs):
     # add missing gti variables
@@ -827,53 +1809,43 @@ def _merge_vattrs_by_station(dslist, merge_attrs):
                 })
         dslist[i] = dst
     
-    merged_attrs = {}
-    mattrs_idx = {}
-    for i in range(len(dslist)):
-        dst = dslist[i]
-        for var in dst:
+    # columnar table of station index and attribute values per variable and attribute
+    table = {}
+    for dst in dslist:
+        stations = list(dst.station.values.astype(int))
+        for var in dst.data_vars:
+            # variable attrs, without creating a DataArray for every variable
+            vattrs = dst.variables[var].attrs
             for attr in merge_attrs:
-                skip = True
-                for apply_to in merge_attrs[attr]["apply_to"]:
-                    if var.startswith(apply_to):
-                        skip = False
-                if skip:
+                if not any(var.startswith(apply_to) for apply_to in merge_attrs[attr]["apply_to"]):
                     continue
-                if attr not in dst[var].attrs:
+                if attr not in vattrs:
                     fill_value = dst.station.size * [merge_attrs[attr]["fill_value"]]
-                    dst[var].attrs.update({
+                    vattrs.update({
                         attr: fill_value
                      })
-                # save station index, as attributes are related to station dimension
-                attridx = list(dst.station.values.astype(int))
-                attrval = list(pyrnet.utils.make_iter(dst[var].attrs[attr]))
-
-                # merge attributes, overwrite values of same station
-                if var not in merged_attrs:
-                    merged_attrs.update({var:{}})
-                    mattrs_idx.update({var:{}})
-                if attr in merged_attrs[var]:
-                    mattrval = merged_attrs[var][attr] + attrval
-                    mattridx = mattrs_idx[var][attr] + attridx
-                    
-                    _,idx = np.unique(mattridx, return_index=True)
-                    attridx = [mattridx[i] for i in idx]
-                    attrval = [mattrval[i] for i in idx]
-                mattrs_idx = assoc_in(
-                    mattrs_idx, [var,attr], attridx
-                )
-                merged_attrs = assoc_in(
-                    merged_attrs, [var,attr], attrval
-                )
+                table.setdefault((var, attr), ([], []))
+                table[(var, attr)][0].extend(stations)
+                table[(var, attr)][1].extend(pyrnet.utils.make_iter(vattrs[attr]))
+    
+    # merge attributes, overwrite values of same station
+    merged_attrs = {}
+    for var, attr in table:
+        merged_attrs.setdefault(var, {})
+        merged_attrs[var][attr] = _last_by_station(*table[(var, attr)])
     return dslist, merged_attrs
     
 
-# %% ../../nbs/pyrnet/data.ipynb 78
-def _reindex_time(dslist, freq='1s', timevar='time'):
+# %% ../../nbs/pyrnet/data.ipynb 87
+def _union_index(dslist, freq='1s', timevar='time'):
+    # union of the full days, stations and maintenance times of all datasets
     dates = []
+    stations = []
+    mtimes = []
     for i in range(len(dslist)):
-        # reindex to full day
         dates.append(dslist[i][timevar].values[0].astype("datetime64[D]"))
+        stations += list(dslist[i].station.values)
+        mtimes += list(dslist[i].maintenancetime.values)
     udates = np.unique(dates)
     
     timeidx = pd.DatetimeIndex([])
@@ -884,137 +1856,213 @@ def _reindex_time(dslist, freq='1s', timevar='time'):
             freq=freq,
             inclusive='left'
         ))
-    
-    for i in range(len(dslist)):
-        dslist[i] = dslist[i].reindex(
-            {timevar:timeidx},
-            method='nearest',
-            tolerance=np.timedelta64(1, 'ms')
-        )
-    return dslist
+    return {
+        timevar: timeidx,
+        "station": np.unique(stations),
+        "maintenancetime": np.unique(mtimes)
+    }
 
-def _reindex_station(dslist):
-    stations = []
-    for i in range(len(dslist)):
-        # reindex to full day
-        stations += list(dslist[i].station.values)
-    ustations = np.unique(stations)
+def _get_indexers(dslist, index, freq='1s', timevar='time'):
+    # integer positions of each dataset coordinate in the union index, -1 if missing
+    days = np.unique(index[timevar].values.astype("datetime64[D]"))
+    nday = len(index[timevar]) // len(days)
+    indexers = []
     for i in range(len(dslist)):
-        dslist[i] = dslist[i].reindex(
-            {"station":ustations},
-            method='nearest',
-            tolerance=1e-6
-        )
-    return dslist
+        # time slots on the grid of each day
+        itime = np.full(dslist[i][timevar].size, -1)
+        for iday, day in enumerate(days):
+            slots, on_grid = pyrnet.utils.grid_slots(
+                dslist[i][timevar].values, day, freq, size=nday
+            )
+            itime[on_grid] = iday*nday + slots[on_grid]
+        indexers.append({
+            timevar: itime,
+            "station": pd.Index(index["station"]).get_indexer(
+                dslist[i]["station"].values,
+                method='nearest',
+                tolerance=1e-6
+            ),
+            "maintenancetime": pd.Index(index["maintenancetime"]).get_indexer(
+                dslist[i]["maintenancetime"].values
+            ),
+        })
+    return indexers
 
-def _reindex_maintenancetime(dslist):
-    mtimes = []
-    for i in range(len(dslist)):
-        # reindex to full day
-        mtimes += list(dslist[i].maintenancetime.values)
-    umtimes = np.unique(mtimes)
-    for i in range(len(dslist)):
-        dslist[i] = dslist[i].reindex(
-            {"maintenancetime":umtimes},
-            method='nearest',
-            tolerance=np.timedelta64(1, 'ms')
-        )
-    return dslist
+# storage layout of the source files, does not apply to merged variables
+_LAYOUT_ENCODING = ["chunksizes", "contiguous", "preferred_chunks", "source", "original_shape"]
+
+def _merged_encoding(encoding):
+    return {key: encoding[key] for key in encoding if key not in _LAYOUT_ENCODING}
+
+def _assemble(dslist, index, indexers, select, fill_first=False):
+    # preallocate the selected variables on the union index and scatter the values of each dataset,
+    # non-nan values of later datasets overwrite earlier ones, or fill only nan values if fill_first
+    dtypes = {}
+    for dst in dslist:
+        for var in dst:
+            if not select(dst[var].dims):
+                continue
+            dtypes[var] = dtypes.get(var, []) + [dst[var].dtype]
+    
+    variables = {}
+    for var in dtypes:
+        dtype = np.result_type(*dtypes[var])
+        if dtype.kind != 'f':
+            dtype = np.dtype(float)
+        for dst, idx in zip(dslist, indexers):
+            if var not in dst:
+                continue
+            dims = dst[var].dims
+            if var not in variables:
+                shape = tuple(len(index[dim]) for dim in dims)
+                variables[var] = xr.Variable(
+                    dims,
+                    np.full(shape, np.nan, dtype=dtype),
+                    attrs=dst[var].attrs.copy(),
+                    encoding=_merged_encoding(dst[var].encoding)
+                )
+            # scatter the values within the union index
+            valid = [idx[dim] >= 0 for dim in dims]
+            target = np.ix_(*[idx[dim][v] for dim, v in zip(dims, valid)])
+            values = dst[var].values[np.ix_(*valid)].astype(dtype)
+            block = variables[var].values[target]
+            if fill_first:
+                mask = np.isnan(block)
+            else:
+                mask = ~np.isnan(values)
+            block[mask] = values[mask]
+            variables[var].values[target] = block
+    return variables
+
+# %% ../../nbs/pyrnet/data.ipynb 89
+def gap_index(ds, var="ghi", timevar="time"):
+    """
+    Index of all data gaps (consecutive missing values) of a (time, station) variable.
+
+    Parameters
+    ----------
+    ds: xarray.Dataset
+        Dataset with station dimension, e.g. pyrnet l1b or l1b_network data.
+    var: str
+        Variable name. The default is 'ghi'.
+    timevar: str
+        Name of the time variable. The default is 'time'.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per gap with the columns station, start, end (time of first and last missing value)
+        and duration (end - start).
+    """
+    time = ds[timevar].values
+    values = ds[var].transpose(timevar, "station").values
+    icolumn, istart, iend = pyrnet.utils.nan_runs(values)
+    return pd.DataFrame({
+        "station": ds.station.values[icolumn],
+        "start": time[istart],
+        "end": time[iend],
+        "duration": time[iend] - time[istart],
+    })
+
+def _gap_snap_times(time, ghi):
+    # time to snap the maintenance time of each station to, NaT if no matching gap
+    ghi = ghi.reshape(ghi.shape[0], -1)
+    icolumn, istart, iend = pyrnet.utils.nan_runs(ghi)
+    duration = time[iend] - time[istart]
+    # assume maintenance takes at least 10 min and maximum 2h
+    match = (np.timedelta64(10, "m") < duration) & (duration < np.timedelta64(2, 'h'))
+    # skip stations with only a few missing values
+    match &= np.sum(np.isnan(ghi), axis=0)[icolumn] >= 10
+    # snap to the latest matching gap
+    ilatest = np.full(ghi.shape[1], -1)
+    np.maximum.at(ilatest, icolumn[match], istart[match])
+    return np.where(ilatest >= 0, time[ilatest], np.datetime64("NaT"))
+
+def _snap_day(mtime, day):
+    # consider only same or next day maintenance times for snapping
+    dtime = mtime.astype("datetime64[D]") - day
+    return (np.timedelta64(0,"D") <= dtime) & (dtime <= np.timedelta64(1,"D"))
+
+def _snap_maintenancetime(mtimes, flags, day, snaptimes):
+    # snap maintenance times of the same or next day to the matching gap of their station
+    # lookup station, the first station with maintenance flags
+    hasflag = ~np.isnan(flags)
+    snaptimes = snaptimes[np.argmax(hasflag, axis=1)]
+    snap = _snap_day(mtimes, day) & np.any(hasflag, axis=1) & ~np.isnat(snaptimes)
+    return np.where(snap, snaptimes, mtimes)
+
+def _merge_maintenancetime_duplicates(ds):
+    # sort by maintenance time and merge duplicates, fill missing values from later duplicates
+    ds = ds.sortby("maintenancetime")
+    _, ifirst, inverse = np.unique(ds.maintenancetime.values, return_index=True, return_inverse=True)
+    if len(ifirst) == ds.maintenancetime.size:
+        return ds
+    ds_merged = ds.isel(maintenancetime=ifirst)
+    for var in [var for var in ds if "maintenancetime" in ds[var].dims]:
+        axis = ds[var].dims.index("maintenancetime")
+        values = np.moveaxis(ds[var].values, axis, 0)
+        # first non-nan value of each duplicate group
+        first = pd.DataFrame(values.reshape(values.shape[0], -1)).groupby(inverse).first().values
+        ds_merged[var].values = np.moveaxis(
+            first.reshape((len(ifirst),) + values.shape[1:]), 0, axis
+        ).astype(values.dtype)
+    return ds_merged
 
-# %% ../../nbs/pyrnet/data.ipynb 80
 def _maintenancetime_snap_to_gap(ds):
-    old_mtimes = ds.maintenancetime.values
-    new_mtimes = old_mtimes.copy()
-    for i, mtime in enumerate(old_mtimes):
-        dtime = mtime.astype("datetime64[D]") - ds.time.values[0].astype("datetime64[D]")
-        # consider only same or next day maintenance times for snapping
-        if (dtime > np.timedelta64(1,"D") or
-            dtime < np.timedelta64(0,"D")):
-            continue
-        # lookup station
-        istation = np.argwhere(~np.isnan(
-            ds.maintenance_flag_ghi.values[i,:]
-        ))[0][0]
-        # identify gaps and gap length
-        igap = np.argwhere(np.isnan(
-            ds.ghi.isel(station=istation).values
-        )).ravel()
-        if len(igap)<10:
-            continue
-        digap = np.diff(igap)
-        istartgaps = np.insert(digap,0,0)!=1
-        iendgaps = np.insert(digap,-1,0)!=1
-        # checkout only gaps of certain length
-        gaptimes = []
-        gapidxs = []
-        for istart,iend in zip(igap[istartgaps],igap[iendgaps]):
-            gaptime = ds.time.values[iend] - ds.time.values[istart]
-            # assume maintenance takes at least 10 min and maximum 2h
-            if (np.timedelta64(10, "m") < gaptime < np.timedelta64(2, 'h')):
-                gapidxs.append(istart)
-                gaptimes.append(ds.time.values[istart])
-        if len(gaptimes)==0:
-            continue
-        # snap maintenance time to the closest matching gap
-        new_mtimes[i] = gaptimes[np.argmin([mtime-gtime for gtime in gaptimes])]
+    new_mtimes = _snap_maintenancetime(
+        ds.maintenancetime.values,
+        ds.maintenance_flag_ghi.transpose("maintenancetime", "station").values,
+        ds.time.values[0].astype("datetime64[D]"),
+        _gap_snap_times(ds.time.values, ds.ghi.transpose("time", "station").values)
+    )
     # update maintenancetime coordinate
     ds = ds.assign_coords({
         "maintenancetime": ("maintenancetime", new_mtimes)
     })
-    ds = ds.sortby("maintenancetime")
-    
     # merge duplicates
-    dates, counts = np.unique(ds.maintenancetime.values,return_counts=True)
-    duplets = dates[counts>1]
-    if len(duplets)>0:
-        dsold = ds.copy()
-        ds = ds.drop_duplicates(dim='maintenancetime', keep='first')
-        for ddate in duplets:
-            dst = dsold.sel(maintenancetime=ddate)
-            vars = [var for var in dst if "maintenancetime" in  dst[var].dims]
-            for var in vars:
-                for i in range(dst.maintenancetime.size-1):
-                    mask = np.isnan(ds[var].sel(maintenancetime=ddate).values)
-                    ds[var].sel(maintenancetime=ddate).values[mask] = dst[var].isel(maintenancetime=i+1).values[mask]
-    
-    return ds
+    return _merge_maintenancetime_duplicates(ds)
+
+# %% ../../nbs/pyrnet/data.ipynb 91
+# station dependent attributes merged by merge_l1b
+_MERGE_GATTRS = {"site":""}
+_MERGE_ATTRS = {
+    "calibration_Cabsolute":dict(
+        fill_value=0,
+        apply_to=["ghi", "gti"]
+    ),
+    "serial":dict(
+        fill_value="",
+        apply_to=["ghi", "gti"]
+    ),
+    "vangle":dict(
+        fill_value=0,
+        apply_to=["ghi", "gti"]
+    ),
+    "hangle":dict(
+        fill_value=0,
+        apply_to=["ghi", "gti"]
+    ),
+    "note_general":dict(
+        fill_value="",
+        apply_to=["maintenance"]
+    ),
+    "note_clean":dict(
+        fill_value="",
+        apply_to=["maintenance"]
+    ),
+    "note_level":dict(
+        fill_value="",
+        apply_to=["maintenance"]
+    ),
+}
 
-# %% ../../nbs/pyrnet/data.ipynb 82
 def merge_l1b(
         dslist,
         freq='1s',
         timevar='time',
-        merge_gattrs={"site":""},
-        merge_attrs={
-            "calibration_Cabsolute":dict(
-                fill_value=0,
-                apply_to=["ghi", "gti"]
-            ),
-            "serial":dict(
-                fill_value="",
-                apply_to=["ghi", "gti"]
-            ),
-            "vangle":dict(
-                fill_value=0,
-                apply_to=["ghi", "gti"]
-            ),
-            "hangle":dict(
-                fill_value=0,
-                apply_to=["ghi", "gti"]
-            ),
-            "note_general":dict(
-                fill_value="",
-                apply_to=["maintenance"]
-            ),
-            "note_clean":dict(
-                fill_value="",
-                apply_to=["maintenance"]
-            ),
-            "note_level":dict(
-                fill_value="",
-                apply_to=["maintenance"]
-            ),
-        }
+        merge_gattrs=_MERGE_GATTRS,
+        merge_attrs=_MERGE_ATTRS,
+        session=None
 ):
     logger.info(f"Merging {len(dslist)} datasets.")
     # sort by first station coordinate
@@ -1029,70 +2077,44 @@ def merge_l1b(
     
     #####################################################################
     ## Unify datasets
-    # reindex timevar:
-    dslist = _reindex_time(dslist, freq=freq, timevar=timevar)
-    # reindex station var:
-    dslist = _reindex_station(dslist)
-    # reindex maintenancetime var:
-    dslist = _reindex_maintenancetime(dslist)
+    # union of time, station and maintenancetime coordinates
+    index = _union_index(dslist, freq=freq, timevar=timevar)
+    indexers = _get_indexers(dslist, index, freq=freq, timevar=timevar)
     
     #####################################################################
     ## Merge datasets
-    # merge vars with (time,station) dims
-    for i in range(len(dslist)):
-        dst = dslist[i].copy()
-        dst = dst.drop_vars(
-            [var for var in dst if not (timevar in dst[var].dims and "station" in dst[var].dims)]
-        )
-        if i==0:
-            ds_time_station = dst.copy()
-        else:
-            # handle overlapping values by dropping from the first (override from second)
-            for var in dst:
-                overlap = (~np.isnan(dst[var].values))*(~np.isnan(dst[var].values))
-                ds_time_station[var].values = ds_time_station[var].values.astype(float)
-                ds_time_station[var].values[overlap] = np.nan
-            ds_time_station = ds_time_station.merge(dst)
-            
+    # merge vars with (time,station) dims, override overlapping values from later datasets
+    variables = _assemble(
+        dslist, index, indexers,
+        select=lambda dims: timevar in dims and "station" in dims
+    )
+    # merge vars with (station) dims, keep values of existing stations,
+    # but fill nan values if available in later datasets
+    variables.update(_assemble(
+        dslist, index, indexers,
+        select=lambda dims: len(dims)==1 and "station" in dims,
+        fill_first=True
+    ))
     # merge vars with (maintenancetime, station) dims
-    for i in range(len(dslist)):
-        dst = dslist[i].copy()
-        dst = dst.drop_vars(
-            [var for var in dst if not ("maintenancetime" in dst[var].dims and "station" in dst[var].dims)]
-        )
-        if i==0:
-            ds_mtime_station = dst.copy()
-        else:
-            for var in dst:
-                overlap = (~np.isnan(dst[var].values))*(~np.isnan(dst[var].values))
-                ds_mtime_station[var].values = ds_mtime_station[var].values.astype(float)
-                ds_mtime_station[var].values[overlap] = np.nan
-            ds_mtime_station = ds_mtime_station.merge(dst)
+    variables.update(_assemble(
+        dslist, index, indexers,
+        select=lambda dims: "maintenancetime" in dims and "station" in dims
+    ))
     
-    # merge vars with (station) dims
-    for i in range(len(dslist)):
-        dst = dslist[i].copy()
-        dst = dst.drop_vars(
-            [var for var in dst if not (len(dst[var].dims)==1 and "station" in dst[var].dims)]
+    coords = {}
+    for dim in index:
+        dst = [dst for dst in dslist if dim in dst.coords][0]
+        coords[dim] = xr.Variable(
+            dim, index[dim],
+            attrs=dst[dim].attrs.copy(),
+            encoding=_merged_encoding(dst[dim].encoding)
         )
-        if i==0:
-            ds_station = dst.copy()
-        else:
-            try:
-                # works there is no overlap with non null values ( new stations )
-                ds_station = ds_station.merge(dst, compat='no_conflicts')
-            except:
-                # override if station already exists
-                # but fill nan values if available in second dataset
-                ustations = np.unique(list(ds_station.station.values)+list(dst.station.values))
-                ds_station = ds_station.reindex(station=ustations)
-                dst = dst.reindex(station=ustations)
-                for key in list(set(ds_station.keys())&set(dst.keys())):
-                    mask = np.isnan(ds_station[key].values)
-                    ds_station[key].values[mask] = dst[key].values[mask]
-                ds_station = ds_station.merge(dst, compat='override')
-    
-    ds_merged = xr.merge([ds_time_station,ds_station,ds_mtime_station],compat='no_conflicts')
+    ds_merged = xr.Dataset(
+        coords={dim: coords[dim] for dim in ["station", timevar]},
+        attrs=dslist[0].attrs.copy()
+    )
+    ds_merged = ds_merged.assign(variables)
+    ds_merged = ds_merged.assign_coords({"maintenancetime": coords["maintenancetime"]})
     
     ###########################################################################
     ## add merged attrs
@@ -1122,7 +2144,7 @@ def merge_l1b(
     # update automatic quality flags
     ds_merged = pyrnet.qcrad.add_qc_flags(ds_merged, ["ghi","gti"])
     # add encoding
-    ds_merged = add_encoding(ds_merged)
+    ds_merged = add_encoding(ds_merged, session=session)
     logger.info("... merging done.")
     return ds_merged
 
@@ -1,13 +1,19 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/pyrnet/logger.ipynb.
 
 # %% auto 0
-__all__ = ['logger', 'dtype_gprmc', 'parse_gprmc', 'parse_adc', 'read_records', 'get_adc_time', 'sync_adc_time', 'adc_binning',
-           'resample_mean', 'interpolate_coords']
+__all__ = ['logger', 'dtype_gprmc', 'parse_gprmc', 'parse_adc', 'parse_gprmc_lines', 'iter_cached_records', 'iter_records',
+           'read_records', 'RecordFollower', 'follow_records', 'get_adc_time', 'AdcTimeSync', 'sync_adc_time',
+           'adc_binning', 'resample_mean', 'interpolate_coords']
 
 # %% ../../nbs/pyrnet/logger.ipynb 2
 from numpy.typing import NDArray,ArrayLike
+import os
 import re
+import time
 import gzip
+import hashlib
+import collections
+import concurrent.futures
 import numpy as np
 import pandas as pd
 from scipy.stats import linregress
@@ -101,6 +107,543 @@ def parse_adc(s):
     return tuple(map(int,s.split()))
 
 # %% ../../nbs/pyrnet/logger.ipynb 15
+_BLOCKSIZE = 2**24 # bytes per parsing block
+
+def _open_raw(fname: str):
+    '''
+    Open the (gzip compressed) logger file in binary mode.
+    '''
+    if fname[-3:]=='.gz':
+        return gzip.open(fname,'rb')
+    return open(fname,'rb')
+
+def _decode_buffer(buf: bytes) -> bytes:
+    '''
+    Non UTF-8 characters are dropped and newlines are translated,
+    same as reading in text mode with errors='ignore'.
+    '''
+    if not buf.isascii():
+        # non UTF-8 characters may arise in broken GPS strings from time to time
+        buf = buf.decode('utf-8', errors='ignore').encode('utf-8')
+    if b'\r' in buf:
+        buf = buf.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return buf
+
+def _line_bounds(newline, isws):
+    '''
+    Start and end (trailing whitespace stripped) of all newline terminated lines.
+    '''
+    starts = np.empty_like(newline)
+    starts[:1] = 0
+    starts[1:] = newline[:-1] + 1
+    # rstrip lines
+    ends = newline.copy()
+    idx = np.flatnonzero(ends>starts)
+    while idx.size:
+        idx = idx[isws[ends[idx]-1]]
+        ends[idx] -= 1
+        idx = idx[ends[idx]>starts[idx]]
+    return starts, ends
+
+_GPRMC_WIDTH = 128 # maximum line length of GPRMC records
+_NDIGITPAD = 8 # non digits in front of the digit values of a block
+
+def _rollover_period(date_of_measure):
+    '''
+    Period of the GPS week rollover correction, same as in parse_gprmc:
+    0 -> none, 1 -> two digit years are 19xx, 2 -> 1024 weeks are added.
+    '''
+    if date_of_measure<=np.datetime64("2019-04-06"):
+        return 0
+    elif date_of_measure<np.datetime64("2019-08-17"):
+        return 1
+    return 2
+
+def _columns(lines, cols):
+    '''
+    Bytes of each line (row) of lines at the column positions cols.
+    '''
+    n, width = lines.shape
+    if np.ndim(cols)==0:
+        return lines[:, np.clip(cols, 0, width-1)]
+    return np.take(lines, np.arange(0, n*width, width) + np.clip(cols, 0, width-1))
+
+def _window(lines, start, size):
+    '''
+    Bytes of each line (row) of lines in the columns [start, start+size).
+    Columns outside of the lines are undefined.
+    '''
+    n, width = lines.shape
+    if np.ndim(start)==0 and 0<=start<=width-size:
+        # same columns for all lines, a view of the matrix
+        return lines[:, start:start+size]
+    # lines is C contiguous, the window of row i starts at the flat index i*width+start.
+    # The sliding window view of the flat bytes has a window of size bytes at each index
+    # (no copy), windows running over the end of a row continue in the next row and windows
+    # outside of the matrix are clipped, hence the empty first and last row of the callers
+    flat = np.lib.stride_tricks.sliding_window_view(lines.reshape(-1), size)
+    return flat[np.clip(np.arange(0, n*width, width) + start, 0, flat.shape[0]-1)]
+
+def _digits(lines, start, stop, maxlen):
+    '''
+    Integer value of the digits in columns [start, stop) of each line.
+    Returns the values and a mask of fields with one to maxlen digits.
+    '''
+    nmax = int(np.clip(np.max(stop-start, initial=0), 1, maxlen))
+    d = _window(lines, stop-nmax, nmax)
+    # the window ends at stop for all lines, its first columns are in front of shorter fields
+    skip = np.asarray(start-stop+nmax)
+    value = np.zeros(d.shape[0], dtype=np.int64)
+    ok = (stop>start) & (stop-start<=maxlen)
+    for k in range(nmax):
+        digit = d[:,k] - np.uint8(48)
+        isfield = skip<=k
+        ok = ok & ((digit<10) | ~isfield)
+        value = value*10 + digit*isfield
+    return value, ok
+
+def _comma_columns(lines, lengths):
+    '''
+    Columns of the first eleven commas of each line, missing commas are set to the
+    checksum delimiter. Returns the columns (one row per comma) and the number of commas.
+    '''
+    n, width = lines.shape
+    iscomma = (lines==44) & (np.arange(width)<lengths[:,None])
+    # flat positions of the commas, sorted by line
+    pos = np.flatnonzero(iscomma)
+    ncomma = np.bincount(pos//width, minlength=n)
+    pos = pos%width
+    k = np.arange(11)
+    # index of the k-th comma of each line in pos
+    idx = (np.cumsum(ncomma) - ncomma)[:,None] + k
+    c = np.where(k<ncomma[:,None], pos[np.minimum(idx, pos.size-1)] if pos.size else 0, lengths[:,None]-3)
+    return np.ascontiguousarray(c.T), ncomma
+
+def _decode_fields(lines, lengths, c, valid, date_of_measure):
+    '''
+    Decode the fields of GPRMC lines given the comma columns c, see _decode_gprmc.
+    lengths and c are either arrays with a value per line or scalars for lines
+    of the same layout, which are decoded with slices instead of gathers.
+    The first and last line of the matrix have to be empty.
+    '''
+    n, width = lines.shape
+    def char(c, ch):
+        return (c>=0) & (c<lengths) & (_columns(lines, c)==ord(ch))
+
+    # prefix "date,time n $GPRMC,", anything but the comma and the two spaces are digits
+    w = int(np.clip(np.max(c[1]-6, initial=0), 0, width))
+    isprefix = np.arange(w)<np.asarray(c[1]-6)[...,None]
+    valid &= np.count_nonzero(((lines[:,:w]-np.uint8(48))>=10) & isprefix, axis=1)==3
+    valid &= (c[0]>=1) & (c[0]<=16) & (c[1]-9-c[0]>=2) & (c[1]-9-c[0]<=17)
+    valid &= char(c[1]-9, ' ') & char(c[1]-7, ' ')
+    valid &= np.all(_window(lines, c[1]-6, 6)==np.frombuffer(b'$GPRMC', dtype=np.uint8), axis=1)
+    # checksum, XOR of the characters between "$" (column c[1]-6) and "*" (column length-3)
+    tail = _window(lines, lengths-3, 3)
+    isdec = (tail[:,1:]-48)<10
+    ishex = isdec | (((tail[:,1:]|32)-97)<6)
+    valid &= (lengths>=3) & (tail[:,0]==42) & np.all(ishex, axis=1)
+    hexval = np.where(isdec, tail[:,1:]-48, (tail[:,1:]|32)-87)
+    if np.ndim(c[1])==0 and 0<=c[1]-6<=lengths-4:
+        checksum = np.bitwise_xor.reduce(lines[:, c[1]-5:lengths-3], axis=1)
+    else:
+        # xor[:,j] is the XOR of the columns 0..j, as x^x==0 the XOR of the
+        # columns i+1..j is xor[:,j]^xor[:,i] for each line
+        xor = np.bitwise_xor.accumulate(lines, axis=1)
+        checksum = _columns(xor, lengths-4) ^ _columns(xor, c[1]-6)
+    valid &= checksum==(hexval[:,0]*16 + hexval[:,1])
+
+    # time hhmmss(.s{1,3}) and status
+    hms, ok = _digits(lines, c[1]+1, c[1]+7, 6)
+    valid &= ok
+    hasms = c[2]-c[1]>7
+    ms, ok = _digits(lines, c[1]+8, c[2], 3)
+    valid &= np.where(hasms, ok & char(c[1]+7, '.'), c[2]-c[1]==7)
+    ms = np.where(hasms, ms*10**np.clip(11-c[2]+c[1], 0, 2), 0)
+    valid &= (c[3]==c[2]+2) & char(c[2]+1, 'A')
+
+    # latitude ddmm(.m{1,9}) and longitude dddmm(.m{1,9})
+    def coordinate(a, b, ndeg):
+        # the decimal point follows one to four digits of minutes
+        isdot = _window(lines, a+ndeg+1, 4)==46
+        dot = a + ndeg + 1 + isdot.argmax(axis=1)
+        hasdot = isdot.any(axis=1) & (dot<b)
+        dot = np.where(hasdot, dot, b)
+        if np.ndim(a)==0 and np.all(dot[1:-1]==dot[1]):
+            # same column of the decimal point in all lines (but the empty ones)
+            dot = int(dot[1])
+        # degrees and one to four digits of integer minutes
+        value, ok = _digits(lines, a, dot, ndeg+4)
+        nmin = dot - a - ndeg
+        ok &= nmin>=1
+        deg, imin = np.divmod(value, 10**np.clip(nmin, 0, 4))
+        fmin, okfrac = _digits(lines, dot+1, b, 9)
+        ok &= ~hasdot | okfrac
+        # fractional digits, same rounding as float()
+        scale = 10.**np.where(hasdot, b-dot-1, 0)
+        minutes = (imin*scale + np.where(hasdot, fmin, 0))/scale
+        return deg + minutes/60, ok
+    lat, ok = coordinate(c[3]+1, c[4], 2)
+    valid &= ok
+    lat[(c[5]==c[4]+2) & char(c[4]+1, 'S')] *= -1.0
+    lon, ok = coordinate(c[5]+1, c[6], 3)
+    valid &= ok
+    lon[(c[7]==c[6]+2) & char(c[6]+1, 'W')] *= -1.0
+
+    # date ddmmyy
+    dmy, ok = _digits(lines, c[9]+1, c[10], 6)
+    valid &= ok & (c[10]-c[9]==7)
+    # account for gps week rollover
+    period = _rollover_period(date_of_measure)
+    year = (1900 if period==1 else 2000) + dmy%100
+    month = dmy//100%100
+    day = dmy//10000
+    hour = hms//10000
+    minute = hms//100%100
+    second = hms%100
+    valid &= (month>=1)&(month<=12)&(day>=1)&(hour<24)&(minute<60)&(second<60)
+    tmonth = ((year-1970)*12 + np.where(valid, month, 1) - 1).astype('datetime64[M]')
+    tday = tmonth.astype('datetime64[D]') + (day-1).astype('timedelta64[D]')
+    valid &= tday.astype('datetime64[M]')==tmonth
+    time = tday.astype('datetime64[ms]') + (((hour*60 + minute)*60 + second)*1000 + ms).astype('timedelta64[ms]')
+    # date jump 1024 weeks back at 2019-04-06
+    time += np.timedelta64(1024*(period>0),'W')
+    return time, lat, lon, valid
+
+def _decode_gprmc(lines, lengths, date_of_measure):
+    '''
+    Decode GPRMC lines of the format
+    "date,time n $GPRMC,hhmmss.sss,A,ddmm.mmmm,N,dddmm.mmmm,E,...,ddmmyy,...*hh" at once.
+    The NMEA checksum hh has to match the characters between "$" and "*".
+
+    Parameters
+    ----------
+    lines: ndarray
+        uint8 matrix of the lines, one line per row.
+    lengths: ndarray
+        Length of each line.
+    date_of_measure: numpy.datetime64
+        Date of measurement to account for gps rollover
+
+    Returns
+    -------
+    time, lat, lon: ndarray
+        The decoded GPRMC records.
+    valid: ndarray(bool)
+        Lines of a valid fix (status "A") with valid checksum, date and time.
+    '''
+    n, width = lines.shape
+    time = np.full(n, _nat)
+    lat = np.full(n, np.nan)
+    lon = np.full(n, np.nan)
+    valid = np.zeros(n, dtype=bool)
+    if n==0:
+        return time, lat, lon, valid
+
+    def decode(rows, layout=None):
+        # empty first and last line, so that windows of the lines stay within the matrix
+        sub = np.zeros((rows.size+2, width), dtype=np.uint8)
+        np.take(lines, rows, axis=0, out=sub[1:-1])
+        if layout is None:
+            length = np.concatenate(([0], lengths[rows], [0]))
+            c, ncomma = _comma_columns(sub, length)
+        else:
+            length, c, ncomma = layout
+        result = _decode_fields(sub, length, c, np.full(sub.shape[0], ncomma>=10), date_of_measure)
+        for out, res in zip((time, lat, lon, valid), result):
+            out[rows] = res[1:-1]
+
+    # the logger writes the fields with fixed widths, lines of the most common length
+    # usually have their commas in the same columns and share the column of each field
+    first = np.argmax(lengths==np.argmax(np.bincount(lengths)))
+    length = int(lengths[first])
+    commas = np.flatnonzero(lines[first,:length]==44)
+    same = (lengths==length) & (np.add.reduce(lines[:,:length]==44, axis=1, dtype=np.uint8)==commas.size)
+    same &= np.all(lines[:,commas]==44, axis=1)
+    c, ncomma = _comma_columns(lines[first:first+1], lengths[first:first+1])
+    decode(np.flatnonzero(same), (length, [int(col) for col in c[:,0]], int(ncomma[0])))
+    # all other lines with the commas of each line
+    if not np.all(same):
+        decode(np.flatnonzero(~same))
+    return time, lat, lon, valid
+
+def _parse_block(buf: bytes, start: int, stop: int, date_of_measure, adc_len=None):
+    '''
+    Parse the newline terminated lines of a logger file in buf[start:stop] at once.
+
+    Returns
+    -------
+    rec_adc: ndarray
+        The ADC readings, None if the block has no ADC record.
+    rec_gprmc: ndarray
+        The valid GPRMC records, iadc counted from the start of the block.
+    adc_len: int
+        Number of columns of the first ADC record.
+    '''
+    # The block is scanned as flat bytes, the lines are either ADC records
+    # "dddd dddd ... dddd\n" or GPRMC records "date,time n $GPRMC,...*hh\n". Per line
+    # quantities are computed from the positions of the newlines and whitespace.
+    arr = np.frombuffer(buf, dtype=np.uint8, count=stop-start, offset=start)
+    # digit values, characters other than digits are >=10,
+    # the buffer is preceded by _NDIGITPAD non digits
+    dpad = np.empty(arr.size+_NDIGITPAD, dtype=np.uint8)
+    dpad[:_NDIGITPAD] = 255
+    digits = np.subtract(arr, np.uint8(48), out=dpad[_NDIGITPAD:])
+    # control, space and non ASCII characters (byte-33 wraps around for bytes <33), found in one pass
+    irare = np.flatnonzero((arr - np.uint8(33))>=95)
+    rare = arr[irare]
+    inewline = np.flatnonzero(rare==10)
+    newline = irare[inewline]
+    # whitespace, same as str.isspace for ASCII, newlines excluded
+    isspace = ((rare-9)<5) & (rare!=10) | ((rare-28)<5)
+    wspos = irare[isspace]
+    isws = arr==32
+    isws[irare[isspace & (rare!=32)]] = True
+    starts, ends = _line_bounds(newline, isws)
+    isline = ends>starts
+
+    # ADC records consist of digits separated by single whitespace characters (_re_adc),
+    # look for lines with anything else, trailing whitespace is stripped,
+    # whitespace is no digit, so XOR clears it from the non digits
+    isbad = (digits>=10) ^ isws
+    isbad[:-1] |= isws[:-1] & isws[1:]
+    bounds = np.empty(2*starts.size, dtype=starts.dtype)
+    bounds[0::2] = starts
+    bounds[1::2] = ends
+    # reduceat over the interleaved starts and ends reduces [start, end) of each line at the
+    # even indices and the trailing whitespace [end, next start) at the odd ones,
+    # empty lines (start==end) give the single byte at start and are masked
+    hasbad = np.logical_or.reduceat(isbad, bounds)[0::2] & isline
+    # number of whitespace characters before the newline and before the end of each line,
+    # the characters in between are the stripped trailing whitespace. All characters
+    # in front of a newline in irare but the newlines and other control or non ASCII
+    # characters (usually none) are whitespace.
+    iother = np.flatnonzero(~isspace & (rare!=10))
+    nws = inewline - np.arange(inewline.size) - np.searchsorted(iother, inewline)
+    iend = nws - (newline - ends)
+    # index of the first whitespace of each line in wspos
+    iws = np.empty_like(iend)
+    iws[:1] = 0
+    iws[1:] = nws[:-1]
+    ncols = iend - iws + 1
+    isadc = isline & (digits[np.minimum(starts, arr.size-1)]<10) & (ncols>1) & ~hasbad
+    # lines with non ASCII characters, all other lines with
+    # anything but digits and whitespace are GPRMC candidates
+    isnonascii = np.zeros(starts.size, dtype=bool)
+    isnonascii[np.searchsorted(newline, irare[rare>=128])] = True
+    isgps = hasbad & ~isnonascii
+
+    # slow path for lines with non ASCII characters,
+    # GPRMC records are plain ASCII and dropped
+    slow_adc = {}
+    for i in np.flatnonzero(isnonascii):
+        l = buf[start+starts[i]:start+ends[i]].decode('utf-8').rstrip()
+        if _re_adc.match(l):
+            slow_adc[i] = parse_adc(l)
+            isadc[i] = True
+            ncols[i] = len(slow_adc[i])
+
+    # if record line is incomplete (due to power cut off)
+    # the line is dropped
+    iadclines = np.flatnonzero(isadc)
+    if adc_len is None and iadclines.size:
+        adc_len = int(ncols[iadclines[0]])
+    isadc &= ncols==adc_len
+    iadclines = np.flatnonzero(isadc)
+    # number of adc values before each line
+    nadc = np.cumsum(isadc) - isadc
+
+    rec_adc = None
+    if iadclines.size:
+        rec_adc = np.empty((iadclines.size, adc_len), dtype=np.uint16)
+        isfast = ~isnonascii[iadclines]
+        ifast = iadclines[isfast]
+        if ifast.size:
+            # numbers are delimited by line start, whitespace and line end, the adc_len-1
+            # whitespace separators of a line follow each other in wspos from iws of the line,
+            # a row of the sliding window view of wspos at iws
+            tend = np.empty((ifast.size, adc_len), dtype=np.int64)
+            tend[:,:-1] = np.lib.stride_tricks.sliding_window_view(wspos, adc_len-1)[iws[ifast]]
+            tend[:,-1] = ends[ifast]
+            # add up the digits in front of the number ends, until the delimiting whitespace
+            # (or newline of the previous line) is reached, the k-th digit in front of the ends
+            # is taken from the view dpad[_NDIGITPAD-k:] at the ends, without index arithmetic
+            values = np.take(dpad[_NDIGITPAD-1:], tend).astype(np.uint32)
+            isnum = np.ones(tend.shape, dtype=bool)
+            scale = 1
+            k = 1
+            while True:
+                k += 1
+                if k<=_NDIGITPAD:
+                    digit = np.take(dpad[_NDIGITPAD-k:], tend)
+                else:
+                    # long runs of leading zeros, indices in front of the buffer are clipped to the padding
+                    digit = np.take(dpad, tend+(_NDIGITPAD-k), mode='clip')
+                isnum &= digit<10
+                if not np.any(isnum):
+                    break
+                scale *= 10
+                digit *= isnum
+                if scale>10000:
+                    # only leading zeros fit into uint16
+                    if np.any(digit):
+                        raise OverflowError("ADC record out of bounds for uint16")
+                else:
+                    values += digit*np.uint32(scale)
+            if np.any(values>np.iinfo(np.uint16).max):
+                raise OverflowError("ADC record out of bounds for uint16")
+            if ifast.size==iadclines.size:
+                rec_adc = values.astype(np.uint16)
+            else:
+                rec_adc[isfast] = values
+        for j in np.flatnonzero(~isfast):
+            rec_adc[j] = slow_adc[iadclines[j]]
+
+    # GPRMC records, longer lines are damaged
+    igps = np.flatnonzero(isgps)
+    igps = igps[ends[igps]-starts[igps]<=_GPRMC_WIDTH]
+    rec_gprmc = np.empty(0, dtype=dtype_gprmc)
+    if igps.size:
+        length = ends[igps] - starts[igps]
+        # at least as wide as the widest field window
+        width = max(int(np.max(length)), 16)
+        pad = np.concatenate((arr, np.zeros(width, dtype=np.uint8)))
+        matrix = np.lib.stride_tricks.sliding_window_view(pad, width)[starts[igps]]
+        dt, lat, lon, valid = _decode_gprmc(matrix, length, date_of_measure)
+        rec_gprmc = np.empty(np.count_nonzero(valid), dtype=dtype_gprmc)
+        rec_gprmc['time'] = dt[valid]
+        rec_gprmc['status'] = b'A'
+        rec_gprmc['lat'] = lat[valid]
+        rec_gprmc['lon'] = lon[valid]
+        rec_gprmc['iadc'] = nadc[igps[valid]]
+    return rec_adc, rec_gprmc, adc_len
+
+def parse_gprmc_lines(lines: ArrayLike,
+                      date_of_measure: np.datetime64 = np.datetime64('now')) -> NDArray:
+    '''
+    Parse an array of GPRMC logger lines at once. Lines with an invalid NMEA checksum are rejected.
+
+    Parameters
+    ----------
+    lines: array_like
+        GPRMC lines (str or bytes) as written by the logger, e.g. "10,123456 1 $GPRMC,...*hh"
+    date_of_measure: datetime or datetime64
+        A rough time, when the measurements happen to account for GPS rollover, see parse_gprmc.
+
+    Returns
+    -------
+    rec_gprmc: ndarray
+        The GPRMC records (dtype_gprmc), one per line. Invalid lines get time NaT, status "V" and
+        NaN coordinates. iadc is zero.
+    '''
+    date_of_measure = utils.to_datetime64(date_of_measure)
+    lines = np.char.rstrip(np.char.encode(np.asarray(lines, dtype=str), 'utf-8'))
+    lengths = np.char.str_len(lines).reshape(-1)
+    width = max(lines.dtype.itemsize, 16)
+    matrix = np.zeros((lengths.size, width), dtype=np.uint8)
+    matrix[:,:lines.dtype.itemsize] = np.frombuffer(lines.tobytes(), dtype=np.uint8).reshape(lengths.size, lines.dtype.itemsize)
+    dt, lat, lon, valid = _decode_gprmc(matrix, lengths, date_of_measure)
+    valid &= ~np.any(matrix>=128, axis=1)
+    rec_gprmc = np.zeros(lengths.size, dtype=dtype_gprmc)
+    rec_gprmc['time'] = np.where(valid, dt, _nat)
+    rec_gprmc['status'] = np.where(valid, b'A', b'V')
+    rec_gprmc['lat'] = np.where(valid, lat, np.nan)
+    rec_gprmc['lon'] = np.where(valid, lon, np.nan)
+    return rec_gprmc
+
+# %% ../../nbs/pyrnet/logger.ipynb 17
+_CACHESIZE = 2**31
+_CACHEVERSION = 2
+
+def _cache_key(fname, date_of_measure):
+    st = os.stat(fname)
+    h = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        while data := f.read(_BLOCKSIZE):
+            h.update(data)
+    key = f"{_CACHEVERSION}:{st.st_size}:{st.st_mtime_ns}:{h.hexdigest()}:{_rollover_period(date_of_measure)}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def _cache_evict(cache_dir, cache_size):
+    entries = []
+    for fn in os.listdir(cache_dir):
+        if not fn.endswith('.npz'):
+            continue
+        try:
+            st = os.stat(os.path.join(cache_dir, fn))
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, fn))
+    total = sum(e[1] for e in entries)
+    for _, size, fn in sorted(entries):
+        if total<=cache_size:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, fn))
+        except FileNotFoundError:
+            pass
+        total -= size
+        logger.debug(f"Removed {fn} from record cache.")
+
+def iter_cached_records(fname: str,
+                        date_of_measure: np.datetime64 = np.datetime64('now'),
+                        cache_dir: str = '.pyrnet_cache',
+                        cache_size: int = _CACHESIZE,
+                        processes: int|None = None):
+    '''
+    Same as iter_records, but the parsed records are read from, or stored to the record cache.
+
+    Parameters
+    ----------
+    fname: string
+        The filename of the logger file
+    date_of_measure: numpy.datetime64
+        Date of measurement to account for gps rollover
+    cache_dir: str
+        Directory of the record cache. Created if it does not exist.
+    cache_size: int
+        Maximum size of the record cache in bytes. The default is 2 GiB.
+    processes: int or None
+        Number of worker processes to parse the file on a cache miss, see iter_records.
+
+    Yields
+    ------
+    rec_adc: ndarray
+        The 10bit ADC readings
+    rec_gprmc: ndarray
+        The GPRMC GPS records (dtype_gprmc). A cache hit yields all records at once.
+    '''
+    date_of_measure = utils.to_datetime64(date_of_measure)
+    os.makedirs(cache_dir, exist_ok=True)
+    fcache = os.path.join(cache_dir, _cache_key(fname, date_of_measure) + '.npz')
+    try:
+        with np.load(fcache, allow_pickle=False) as npz:
+            rec_adc, rec_gprmc = npz['adc'], npz['gprmc']
+    except (OSError, ValueError, KeyError):
+        pass
+    else:
+        logger.info(f"Read records of {fname} from cache: {fcache}")
+        # mark as recently used
+        os.utime(fcache)
+        yield rec_adc, rec_gprmc
+        return
+
+    rec_adc, rec_gprmc = [], []
+    for adc, gprmc in iter_records(fname, date_of_measure, processes=processes):
+        rec_adc.append(adc)
+        rec_gprmc.append(gprmc)
+        yield adc, gprmc
+    if not rec_gprmc:
+        return
+
+    # store atomically, concurrent readers see either nothing or the complete entry
+    ftmp = f"{fcache}.{os.getpid()}.tmp"
+    with open(ftmp, 'wb') as f:
+        np.savez(f, adc=np.concatenate(rec_adc), gprmc=np.concatenate(rec_gprmc))
+    os.replace(ftmp, fcache)
+    logger.info(f"Stored records of {fname} in cache: {fcache}")
+    _cache_evict(cache_dir, cache_size)
+
+# %% ../../nbs/pyrnet/logger.ipynb 19
 dtype_gprmc = [
     ( 'time',   'datetime64[ms]' ),
     ( 'status', 'S1' ),
@@ -109,8 +652,124 @@ dtype_gprmc = [
     ( 'iadc',   'u4' )
 ]
 
+def _iter_blocks(fname: str, blocksize: int):
+    '''
+    Read the logger file block by block and yield the buffers of complete lines.
+    The cleanup at the end of the file is applied to the last buffer.
+    '''
+    nlines = 0
+    pending = b''
+    rest = b''
+    with _open_raw(fname) as f:
+        while True:
+            data = f.read(blocksize)
+            rest += data
+            if data:
+                # split after the last line break, a trailing '\r' might be followed by '\n'
+                cut = max(rest.rfind(b'\n'), rest.rfind(b'\r', 0, len(rest)-1)) + 1
+            else:
+                cut = len(rest)
+            chunk = _decode_buffer(rest[:cut])
+            rest = rest[cut:]
+            pending += chunk
+            if not data:
+                break
+            nlines += chunk.count(b'\n')
+            if nlines<20:
+                continue
+            # the last two lines are kept until the end of the file is reached
+            stop = pending.rfind(b'\n', 0, pending.rfind(b'\n', 0, len(pending)-1)) + 1
+            if stop>0:
+                yield pending[:stop]
+                pending = pending[stop:]
+
+    ##- skip almost empty files
+    if nlines + chunk.count(b'\n') + (len(chunk)>0 and not chunk.endswith(b'\n')) < 20:
+        logger.info("Skip file, as number of records is < 20.")
+        return
+
+    # remove last line -> mostly damaged or empty
+    stop = pending.rfind(b'\n', 0, len(pending)-pending.endswith(b'\n')) + 1
+    # remove gps line at the end -> else processing issues
+    last = pending.rfind(b'\n', 0, stop-1) + 1
+    if _re_gprmc.match(pending[last:stop].decode('utf-8').rstrip()):
+        stop = last
+    yield pending[:stop]
+
+def _parse_lines(buf: bytes, date_of_measure, adc_len):
+    return _parse_block(buf, 0, len(buf), date_of_measure, adc_len)
+
+def iter_records(fname: str,
+                 date_of_measure: np.datetime64 = np.datetime64('now'),
+                 blocksize: int = _BLOCKSIZE,
+                 processes: int|None = None):
+    '''
+    Read the GPRMC and ADC records from the pyranometer logger files block by block.
+    Only about blocksize bytes of the file are held in memory at once.
+
+    Parameters
+    ----------
+    fname: string
+        The filename of the logger file
+    date_of_measure: numpy.datetime64
+        Date of measurement to account for gps rollover
+    blocksize: int
+        Number of bytes read from the file at once. The default is 16 MiB.
+    processes: int or None
+        Number of worker processes parsing the blocks in parallel. The file is still read
+        (and decompressed) sequentially, and the blocks are yielded in order.
+        The default is None, which parses in the current process.
+
+    Yields
+    ------
+    rec_adc: ndarray
+        The 10bit ADC readings of the block
+    rec_gprmc: ndarray
+        The GPRMC GPS records of the block (dtype_gprmc), iadc is counted from the start of the file.
+        Nothing is yielded, if the file has less than 20 lines.
+    '''
+    logger.info(f"Start reading records from file: {fname}")
+    date_of_measure = utils.to_datetime64(date_of_measure)
+
+    def collect(result):
+        nonlocal adc_len, iadc
+        rec_adc, rec_gprmc, block_adc_len = result
+        adc_len = adc_len or block_adc_len
+        if rec_adc is None:
+            rec_adc = np.empty((0, adc_len or 0), dtype=np.uint16)
+        # add number of adc values before the block
+        rec_gprmc['iadc'] += iadc
+        iadc += rec_adc.shape[0]
+        return rec_adc, rec_gprmc
+
+    adc_len = None
+    iadc = 0
+    blocks = _iter_blocks(fname, blocksize)
+    if processes is None or processes<2:
+        for buf in blocks:
+            yield collect(_parse_lines(buf, date_of_measure, adc_len))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+            queue = collections.deque()
+            for buf in blocks:
+                if adc_len is None:
+                    # the record length is defined by the first ADC line of the file,
+                    # parse in order until it is known
+                    yield collect(_parse_lines(buf, date_of_measure, adc_len))
+                    continue
+                queue.append(pool.submit(_parse_lines, buf, date_of_measure, adc_len))
+                # limit the number of blocks in memory
+                while len(queue)>2*processes or (queue and queue[0].done()):
+                    yield collect(queue.popleft().result())
+            while queue:
+                yield collect(queue.popleft().result())
+    logger.info("Done reading records from raw file.")
+
 def read_records(fname: str,
-                 date_of_measure: np.datetime64 = np.datetime64('now')) -> (NDArray, NDArray):
+                 date_of_measure: np.datetime64 = np.datetime64('now'),
+                 cache_dir: str|None = None,
+                 cache_size: int = _CACHESIZE,
+                 processes: int|None = None) -> (NDArray, NDArray):
     '''
     Read the GPRMC and ADC records from the pyranometer logger files
 
@@ -120,6 +779,13 @@ def read_records(fname: str,
         The filename of the logger file
     date_of_measure: numpy.datetime64
         Date of measurement to account for gps rollover
+    cache_dir: str or None
+        Directory of the parsed record cache, see iter_cached_records. The default is None (no caching).
+    cache_size: int
+        Maximum size of the record cache in bytes.
+    processes: int or None
+        Number of worker processes to parse large files in parallel, see iter_records.
+        The default is None (no worker processes).
 
     Returns
     -------
@@ -128,56 +794,149 @@ def read_records(fname: str,
     rec_gprmc: recarray
         The GPRMC GPS records
     '''
-    logger.info(f"Start reading records from file: {fname}")
-    date_of_measure = utils.to_datetime64(date_of_measure)
-    # Read file, use errors='ignore' to skip non UTF-8 characters
-    # non UTF-8 characters may arise in broken GPS strings from time to time
-    if fname[-3:]=='.gz':
-        f = gzip.open(fname,'rt',errors='ignore') # open in text mode, ignore non UTF8 characters
+    if cache_dir is None:
+        records = iter_records(fname, date_of_measure, processes=processes)
     else:
-        f = open(fname,'r',errors='ignore')
-    lines =[l.rstrip() for l in f.readlines()]
-    f.close()
-
-    ##- skip almost empty files
-    if len(lines)<20:
-        logger.info("Skip file, as number of records is < 20.")
+        records = iter_cached_records(fname, date_of_measure, cache_dir=cache_dir, cache_size=cache_size,
+                                      processes=processes)
+    rec_adc, rec_gprmc = [], []
+    for adc, gprmc in records:
+        if adc.shape[0]:
+            rec_adc.append(adc)
+        rec_gprmc.append(gprmc)
+    if not rec_gprmc:
         return False,False
+    rec_adc = np.concatenate(rec_adc) if rec_adc else np.array([],dtype=np.uint16)
+    rec_gprmc = np.concatenate(rec_gprmc).view(np.recarray)
+    return rec_adc, rec_gprmc
 
-    # remove last line -> mostly damaged or empty
-    lines=lines[:-1]
-    # remove gps line at the end -> else processing issues
-    if _re_gprmc.match(lines[-1]):
-        lines=lines[:-1]
+# %% ../../nbs/pyrnet/logger.ipynb 24
+class RecordFollower:
+    '''
+    Read the records appended to a logger file, which is still written.
 
-    rec_gprmc = []
-    rec_adc = []
-    iadc = 0
-    for i,l in enumerate(lines):
-        m = _re_gprmc.match(l)
-        if m:
-            r = parse_gprmc(m.group(2), date_of_measure)
-            if not np.isnat(r[0]):
-                # add number of adc values before GPS line
-                rec_gprmc.append(r+(iadc,))
-        elif _re_adc.match(l):
-            r = parse_adc(l)
-            if iadc==0:
-                adc_len=len(r)
-            # if record line is incomplete (due to power cut off)
-            # the line is dropped
-            if len(r)==adc_len:
-                rec_adc.append(r)
-                iadc += 1
+    Parameters
+    ----------
+    fname: string
+        The filename of the logger file
+    date_of_measure: numpy.datetime64
+        Date of measurement to account for gps rollover
+
+    Attributes
+    ----------
+    offset: int
+        Number of bytes of the file parsed so far.
+    iadc: int
+        Number of ADC records read so far.
+    adc_len: int or None
+        Number of columns of the ADC records.
+    '''
+    def __init__(self, fname: str, date_of_measure: np.datetime64 = np.datetime64('now')):
+        self.fname = fname
+        self.date_of_measure = utils.to_datetime64(date_of_measure)
+        self.reset()
+
+    def reset(self):
+        """Start again from the beginning of the file."""
+        self.offset = 0
+        self.iadc = 0
+        self.adc_len = None
+
+    def _complete(self, data: bytes) -> int:
+        # end of the last complete line, a trailing '\r' might be followed by '\n'
+        cut = max(data.rfind(b'\n'), data.rfind(b'\r', 0, len(data)-1)) + 1
+        # keep a GPRMC line at the end, until the next ADC record is written
+        end = cut - (data[cut-2:cut]==b'\r\n') - (cut>0)
+        start = max(data.rfind(b'\n', 0, end), data.rfind(b'\r', 0, end)) + 1
+        line = _decode_buffer(data[start:end]).decode('utf-8').rstrip()
+        if _re_gprmc.match(line):
+            cut = start
+        return cut
+
+    def read(self, blocksize: int = _BLOCKSIZE) -> (NDArray, NDArray):
+        '''
+        Parse the complete records appended to the file since the last call.
+
+        Parameters
+        ----------
+        blocksize: int
+            Number of bytes parsed at once. The default is 16 MiB.
+
+        Returns
+        -------
+        rec_adc: ndarray
+            The new 10bit ADC readings, shape (n, adc_len), n might be zero.
+        rec_gprmc: ndarray
+            The new GPRMC GPS records (dtype_gprmc), iadc is counted from the start of the file.
+        '''
+        if os.path.getsize(self.fname)<self.offset:
+            logger.warning(f"{self.fname} has been truncated, read again from the beginning.")
+            self.reset()
+
+        rec_adc, rec_gprmc = [], []
+        with open(self.fname, 'rb') as f:
+            f.seek(self.offset)
+            rest = b''
+            while data := f.read(blocksize):
+                data = rest + data
+                cut = self._complete(data)
+                rest = data[cut:]
+                buf = _decode_buffer(data[:cut])
+                adc, gprmc, adc_len = _parse_block(buf, 0, len(buf), self.date_of_measure, self.adc_len)
+                self.adc_len = self.adc_len or adc_len
+                gprmc['iadc'] += self.iadc
+                if adc is not None:
+                    self.iadc += adc.shape[0]
+                    rec_adc.append(adc)
+                rec_gprmc.append(gprmc)
+                self.offset += cut
+
+        if rec_adc:
+            rec_adc = np.concatenate(rec_adc)
         else:
-            # unhandled record...
-            pass
-    rec_adc   = np.array(rec_adc,dtype=np.uint16)
-    rec_gprmc = np.array(rec_gprmc,dtype=dtype_gprmc).view(np.recarray)
-    logger.info("Done reading records from raw file.")
-    return rec_adc, rec_gprmc
+            rec_adc = np.empty((0, self.adc_len or 0), dtype=np.uint16)
+        rec_gprmc = np.concatenate(rec_gprmc) if rec_gprmc else np.empty(0, dtype=dtype_gprmc)
+        return rec_adc, rec_gprmc
 
-# %% ../../nbs/pyrnet/logger.ipynb 20
+def follow_records(fname: str,
+                   date_of_measure: np.datetime64 = np.datetime64('now'),
+                   interval: float = 2.,
+                   timeout: float|None = None):
+    '''
+    Poll a growing logger file and yield the appended records.
+
+    Parameters
+    ----------
+    fname: string
+        The filename of the logger file
+    date_of_measure: numpy.datetime64
+        Date of measurement to account for gps rollover
+    interval: float
+        Seconds to wait between polls of the file. The default is 2.
+    timeout: float or None
+        Stop, if the file did not grow for timeout seconds. The default is None (follow forever).
+
+    Yields
+    ------
+    rec_adc: ndarray
+        The new 10bit ADC readings
+    rec_gprmc: ndarray
+        The new GPRMC GPS records (dtype_gprmc), iadc is counted from the start of the file.
+    '''
+    follower = RecordFollower(fname, date_of_measure)
+    idle = 0.
+    while True:
+        rec_adc, rec_gprmc = follower.read()
+        if rec_adc.shape[0] or rec_gprmc.size:
+            idle = 0.
+            yield rec_adc, rec_gprmc
+        elif timeout is not None and idle>=timeout:
+            logger.info(f"{fname} did not grow for {timeout} s, stop following.")
+            return
+        time.sleep(interval)
+        idle += interval
+
+# %% ../../nbs/pyrnet/logger.ipynb 26
 def get_adc_time(rec_adc):
     """
     Get Milliseconds from Start of ADC measurement.
@@ -202,7 +961,139 @@ def get_adc_time(rec_adc):
     ta[1:] = np.cumsum(dt)
     return ta
 
-# %% ../../nbs/pyrnet/logger.ipynb 24
+# %% ../../nbs/pyrnet/logger.ipynb 31
+class AdcTimeSync:
+    '''
+    Online least squares fit of the GPS time to the ADC time, same as in sync_adc_time.
+
+    Attributes
+    ----------
+    count: int
+        Number of GPS records in the fit.
+    gps0: numpy.datetime64
+        Time of the first GPS record, reference of the fit.
+    '''
+    def __init__(self):
+        self.count = 0
+        self.gps0 = None
+        # running means and co-moments of ADC time (x) and GPS time (y) in milliseconds
+        self._mx = self._my = 0.
+        self._cxx = self._cxy = self._cyy = 0.
+
+    def update(self, adctime: ArrayLike, gpstime: ArrayLike):
+        '''
+        Add GPS records to the fit.
+
+        Parameters
+        ----------
+        adctime: ndarray
+            Milliseconds from start of the ADC measurement of the last ADC sample before each GPS record (adctime[iadc]).
+        gpstime: ndarray
+            GPS time
+        '''
+        gpstime = np.asarray(gpstime)
+        if gpstime.size==0:
+            return
+        if self.gps0 is None:
+            self.gps0 = gpstime[0]
+        x = np.asarray(adctime).astype('timedelta64[ms]')/np.timedelta64(1,'ms')
+        y = (gpstime-self.gps0)/np.timedelta64(1,'ms')
+        n = x.size
+        mx, my = np.mean(x), np.mean(y)
+        dx, dy = x-mx, y-my
+        # combine with the previous batches (Chan et al.)
+        total = self.count + n
+        deltax, deltay = mx-self._mx, my-self._my
+        f = self.count*n/total
+        self._cxx += np.dot(dx,dx) + deltax*deltax*f
+        self._cxy += np.dot(dx,dy) + deltax*deltay*f
+        self._cyy += np.dot(dy,dy) + deltay*deltay*f
+        self._mx += deltax*n/total
+        self._my += deltay*n/total
+        self.count = total
+
+    @property
+    def slope(self) -> float:
+        """Slope of the fit [-]"""
+        return self._cxy/self._cxx
+
+    @property
+    def offset(self) -> float:
+        """Offset of the fit [ms]"""
+        return self._my - self.slope*self._mx
+
+    @property
+    def drift(self) -> float:
+        """Drift of the ADC clock [s/day]"""
+        return (1/self.slope-1)*86400
+
+    @property
+    def jitter(self) -> float:
+        """Standard deviation of the fit residuals [ms]"""
+        return np.sqrt(max(self._cyy - self._cxy**2/self._cxx, 0.)/self.count)
+
+    def check(self, max_drift: float = 10.) -> bool:
+        '''
+        Log the fit summary and check plausibility of the fit.
+
+        Parameters
+        ----------
+        max_drift: float
+            Maximum absolute ADC drift [s/day]. The default is 10.
+
+        Returns
+        -------
+        bool
+            True, if the fit is plausible.
+        '''
+        if self.count<2:
+            logger.warning("Not enough GPS records to sync ADC time.")
+            return False
+        logger.info('Sync ADC time to GPS Fit Summary:')
+        logger.info('|-- Drift  : {0:7.2f} [s/day]'.format(self.drift))
+        logger.info('|-- Slope  : {0:13.8f}'.format(self.slope))
+        logger.info('|-- Offset : {0:7.2f} [s]'.format(self.offset/1000))
+        logger.info('|-- Jitter : {0:7.2f} [ms]'.format(self.jitter))
+        if np.abs(self.drift)>max_drift:
+            logger.warning(f"Absolute ADC drift larger than {max_drift} s/day.")
+            return False
+        return True
+
+    def to_utc(self, adctime: ArrayLike) -> NDArray:
+        '''
+        Convert ADC time to GPS time with the current fit.
+
+        Parameters
+        ----------
+        adctime: ndarray
+            Milliseconds from start of the ADC measurement, any chunk of the ADC records.
+
+        Returns
+        -------
+        time: ndarray(datetime64)
+            The time of the ADC records
+        '''
+        ta = np.asarray(adctime).astype('timedelta64[ms]')
+        return self.gps0 + ta*self.slope + np.float64(self.offset).astype('timedelta64[ms]')
+
+    def to_adctime(self, time: ArrayLike) -> NDArray:
+        '''
+        Convert GPS time to ADC time with the current fit, inverse of to_utc.
+
+        Parameters
+        ----------
+        time: ndarray(datetime64)
+            GPS time
+
+        Returns
+        -------
+        adctime: ndarray(float)
+            Milliseconds from start of the ADC measurement.
+        '''
+        y = (np.asarray(time)-self.gps0)/np.timedelta64(1,'ms')
+        return (y - self.offset)/self.slope
+
+# %% ../../nbs/pyrnet/logger.ipynb 32
 def sync_adc_time(adctime, gpstime, iadc, check_results=True):
     '''
     Synchronize the ADC time to the GPS records
@@ -228,29 +1119,16 @@ def sync_adc_time(adctime, gpstime, iadc, check_results=True):
     ta = adctime.astype('timedelta64[ms]')
     # assure int type
     iadc = np.array(iadc).astype(int)
-    # get GPStime of the previous ADC record
+    # fit GPStime to the time of the previous ADC record
     # here we assume, that the last ADC sample stored before a GPS record
     # has the same time as the GPS timestamp
-    t1 = ta[iadc]/np.timedelta64(1,'ms')
-    # time of GPS records from GPRMC record
-    t2 = (gpstime-gpstime[0])/np.timedelta64(1,'ms')
-    a,b = linregress(t1,t2)[:2]
-    t = gpstime[0]+ta*a+b.astype('timedelta64[ms]')
-
-    drift = (1/a-1)*86400
-    logger.info('Sync ADC time to GPS Fit Summary:')
-    logger.info('|-- Drift  : {0:7.2f} [s/day]'.format(drift))
-    logger.info('|-- Slope  : {0:13.8f}'.format(a))
-    logger.info('|-- Offset : {0:7.2f} [s]'.format(b/1000))
-    logger.info('|-- Jitter : {0:7.2f} [ms]'.format(np.std(t2-(a*t1+b))))
-    
-    if check_results:
-        if np.abs(drift)>10:
-            logger.warning("Absolute ADC drift larger than 10 s/day.")
-            return None
-    return t
-
-# %% ../../nbs/pyrnet/logger.ipynb 36
+    sync = AdcTimeSync()
+    sync.update(ta[iadc], gpstime)
+    if not sync.check() and check_results:
+        return None
+    return sync.to_utc(ta)
+
+# %% ../../nbs/pyrnet/logger.ipynb 44
 def adc_binning(rec_adc, time, bins=86400):
     """
     Binning and averaging of ADC samples
@@ -277,38 +1155,28 @@ def adc_binning(rec_adc, time, bins=86400):
     dday = (time-t0)/np.timedelta64(1,'D')
     # calculate time bins of output dataset
     it = np.int64(dday*bins)
-    # index for unique bins (inv_idx) and count of samples per bin (cnt)
-    uval, inv_idx, cnt = np.unique(it,
-                                   return_inverse=True,
-                                   return_counts=True)
-    logger.info(f"ADC records fill {len(uval)} bins of data.")
     # Calculate average of sample values per bin
     # The first two columns of rec_adc will be omitted as they store the
     # internal measures for timing and battery (first two columns)
-    V = np.zeros((len(uval),rec_adc.shape[1]-2))
-    for i in range(V.shape[1]):
-        V[:,i] = np.bincount(inv_idx,weights=rec_adc[:,i+2])/cnt
+    res = utils.binned_statistics(rec_adc[:,2:], it-it.min(), stats=["mean","count"])
+    # keep bins with samples only
+    filled = res["count"][:,0]>0
+    uval = np.flatnonzero(filled) + it.min()
+    V = res["mean"][filled]
+    logger.info(f"ADC records fill {len(uval)} bins of data.")
     bintime = t0+ np.timedelta64(86400000,'ms')*uval.astype(np.float64)/bins
     logger.info(f"ADC records span a time period from {bintime[0]} to {bintime[-1]}.")
     return V, bintime
 
-# %% ../../nbs/pyrnet/logger.ipynb 38
+# %% ../../nbs/pyrnet/logger.ipynb 46
 def resample_mean(ds,freq='1s'):
 
-    # start and end bin time
-    start_time = np.datetime64(
-       pd.to_datetime(ds.time.values[0]).floor(freq)
-    )
-    end_time = np.datetime64(
-        pd.to_datetime(ds.time.values[-1]).floor(freq)
-    )
+    # bin index of the samples and start of the first bin
+    it, start_time = utils.time_slots(ds.time.values, freq)
+    nbins = int(it.max()) + 1
 
     # bin time
-    bintime = pd.date_range(
-        start_time,
-        end_time,
-        freq=freq
-    ).floor(freq)
+    bintime = start_time + np.arange(nbins)*pd.Timedelta(freq).to_timedelta64()
 
     ds_r = ds.assign_coords(
         {
@@ -316,34 +1184,18 @@ def resample_mean(ds,freq='1s'):
         }
     )
 
-    # calculate bin index of output dataset
-    it = np.int64(
-        (ds.time.values - start_time)/pd.Timedelta(freq)
-    )
-
-    # index for unique bins (inv_idx) and count of samples per bin (cnt)
-    uval, inv_idx, cnt = np.unique(it,
-                                   return_inverse=True,
-                                   return_counts=True)
-
     # apply to all time dependent variables
     for var in ds:
         if 'time' in ds[var].dims:
             # replace time dimension with time_resampled
             vardims = ds[var].dims
             newdims = [d if d!='time' else 'time_resampled' for d in vardims]
-            # if only time dimension, take the shortcut
-            if len(vardims)==1:
-                newval = np.bincount(inv_idx,weights=ds[var].values)/cnt
-                ds_r = ds_r.assign( {var: (newdims, newval)})
-            elif len(vardims)==2: # more than the time dimension, assume 2
-                N = ds[var].shape[1]
-                newval = np.zeros((bintime.size,N))
-                for i in range(N):
-                    newval[:,i] = np.bincount(inv_idx,weights=ds[var].values[:,i])/cnt
-                ds_r = ds_r.assign( {var: (newdims, newval)})
-            else:
+            if len(vardims)>2:
                 raise ValueError("logger.resample is implemented for 2dims only.")
+            newval = utils.binned_statistics(
+                ds[var].values, it, nbins, axis=vardims.index('time')
+            )["mean"]
+            ds_r = ds_r.assign( {var: (newdims, newval)})
         # add attributes again
         ds_r[var].attrs.update(ds[var].attrs)
         ds_r[var].encoding.update(ds[var].encoding)
@@ -358,7 +1210,7 @@ def resample_mean(ds,freq='1s'):
     return ds_r
 
 
-# %% ../../nbs/pyrnet/logger.ipynb 40
+# %% ../../nbs/pyrnet/logger.ipynb 48
 def interpolate_coords(rec_gprmc, time):
     """
     Interpolate lat and lon from gps records
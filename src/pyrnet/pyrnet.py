@@ -3,7 +3,7 @@
 # %% auto 0
 __all__ = ['campaign_pfx', 'DATA_URL', 'FNAME_FMT_HDCP2', 'SOLCONST', 'MAX_MISSING', 'MIN_GOOD', 'get_elements',
            'parse_thredds_catalog', 'lookup_fnames', 'read_thredds', 'read_hdcp2', 'read_pyrnet', 'read_calibration',
-           'get_pyrnet_mapping', 'meta_lookup']
+           'get_pyrnet_mapping', 'MetaIndex', 'meta_lookup']
 
 # %% ../../nbs/pyrnet/pyrnet.ipynb 2
 from collections.abc import Iterable
@@ -251,8 +251,8 @@ def read_thredds(dates, *, campaign, stations=None, lvl='l1b', collection=None,
 
         # unify time and station dimension to speed up merging
         date = dst[timevar].values[0].astype("datetime64[D]")
-        timeidx = pd.date_range(date, date + np.timedelta64(1, 'D'), freq=freq, inclusive='left')
-        dst = dst.reindex({timevar: timeidx}, method='nearest',tolerance=np.timedelta64(1,'ms'))
+        nday = pd.Timedelta(1, 'D') // pd.Timedelta(freq)
+        dst = pyrutils.align_to_grid(dst, timevar, date, freq, nday)
         dst = dst.reindex({"station": stations})
 
         # add gti for single stations
@@ -345,8 +345,8 @@ def read_calibration(cfile:str, cdate):
 
     Parameters
     ----------
-    cfile: str
-        Path of the calibration.json
+    cfile: str or dict
+        Path of the calibration.json or its parsed content.
     cdate: list, ndarray, or scalar of type float, datetime or datetime64
         A representation of time. If float, interpreted as Julian date.
     Returns
@@ -355,7 +355,7 @@ def read_calibration(cfile:str, cdate):
         Calibration dictionary sorted by box number.
     """
     cdate = pyrutils.to_datetime64(cdate)
-    calib = pyrutils.read_json(cfile)
+    calib = cfile if isinstance(cfile, dict) else pyrutils.read_json(cfile)
     # parse calibration dates
     cdates = pd.to_datetime(list(calib.keys()), yearfirst=True).values
 
@@ -386,8 +386,8 @@ def get_pyrnet_mapping(fn:str, date):
 
     Parameters
     ----------
-    fn: str
-        Path of the mapping.json
+    fn: str or dict
+        Path of the mapping.json or its parsed content.
     date: list, ndarray, or scalar of type float, datetime or datetime64
         A representation of time. If float, interpreted as Julian date.
     Returns
@@ -396,7 +396,7 @@ def get_pyrnet_mapping(fn:str, date):
         Calibration dictionary sorted by box number.
     """
     date = pyrutils.to_datetime64(date)
-    pyrnetmap = pyrutils.read_json(fn)
+    pyrnetmap = fn if isinstance(fn, dict) else pyrutils.read_json(fn)
     # parse key dates
     # require sort for lookup later
     cdates = pd.to_datetime(list(pyrnetmap.keys()), yearfirst=True).values
@@ -409,24 +409,179 @@ def get_pyrnet_mapping(fn:str, date):
     return  merge([pyrnetmap[key] for key in skeys])
 
 # %% ../../nbs/pyrnet/pyrnet.ipynb 39
-def meta_lookup(date,*,serial=None,box=None,cfile=None, mapfile=None):
-    if cfile is None:
-        cfile = os.path.join(importlib.resources.files("pyrnet"), "share/pyrnet_calibration.json")
-    if mapfile is None:
-        mapfile = os.path.join(importlib.resources.files("pyrnet"), "share/pyrnet_station_map.json")
-
-    map = get_pyrnet_mapping(mapfile,date)
-    calib = read_calibration(cfile,date)
-    
-    CC = calib["CC"] if "CC" in calib else [1]
-
-    if serial is None and box is not None:
-        box=int(box)
-        return f"{box:03d}", map[f"{box:03d}"], calib[f"{box:03d}"], CC
-    elif serial is not None and box is None:
-        res = valfilter(lambda x: serial in x, map)
-        box = list(res.keys())[0]
-        serial = res[box]
-        return box,serial,calib[box], CC
-    else:
-        raise ValueError("At least one of [station,box] have to be specified.")
+def _parse_key_dates(d):
+    # sorted json key dates and keys
+    keys = list(d.keys())
+    dates = pd.to_datetime(keys, yearfirst=True).values
+    isort = np.argsort(dates, kind="stable")
+    return dates[isort], [keys[i] for i in isort]
+
+class MetaIndex:
+    """
+    Interval index of the calibration and box - serial number mapping files.
+    The calibration and mapping valid at a date are those of all json keys before the date,
+    replayed in time order, the same as read_calibration and get_pyrnet_mapping.
+
+    Parameters
+    ----------
+    cfile: str or dict
+        Path of the calibration.json or its parsed content.
+    mapfile: str or dict
+        Path of the mapping.json or its parsed content.
+    """
+    def __init__(self, cfile, mapfile):
+        calib = cfile if isinstance(cfile, dict) else pyrutils.read_json(cfile)
+        pyrnetmap = mapfile if isinstance(mapfile, dict) else pyrutils.read_json(mapfile)
+
+        # calibration: dense (date, box, channel) table, NaN if not available
+        self.cal_dates, keys = _parse_key_dates(calib)
+        boxes = sorted({k for key in keys for k in calib[key] if k!="CC"})
+        self.boxes = boxes
+        self._ibox = {box: i for i, box in enumerate(boxes)}
+        nchannel = max([len(v) for key in keys for k, v in calib[key].items() if k!="CC"], default=0)
+        ncc = max([len(calib[key]["CC"]) for key in keys if "CC" in calib[key]], default=0)
+        self.cal = np.full((len(keys), len(boxes), nchannel), np.nan)
+        self.cal_valid = np.zeros((len(keys), len(boxes)), dtype=bool)
+        self.cc = np.full((len(keys), ncc), np.nan)
+        self.cc_valid = np.zeros(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            if i>0:
+                self.cal[i], self.cal_valid[i] = self.cal[i-1], self.cal_valid[i-1]
+                self.cc[i], self.cc_valid[i] = self.cc[i-1], self.cc_valid[i-1]
+            for k, v in calib[key].items():
+                # update only not None values
+                v = np.array([np.nan if vi is None else vi for vi in v], dtype=float)
+                mask = ~np.isnan(v)
+                if k=="CC":
+                    self.cc[i, :v.size][mask] = v[mask]
+                    self.cc_valid[i] = True
+                else:
+                    self.cal[i, self._ibox[k], :v.size][mask] = v[mask]
+                    self.cal_valid[i, self._ibox[k]] = True
+
+        # mapping: box serials and serial -> box hash per date
+        self.map_dates, keys = _parse_key_dates(pyrnetmap)
+        self._map = []
+        self._serial_box = []
+        state = {}
+        for key in keys:
+            state = {**state, **pyrnetmap[key]}
+            serial_box = {}
+            for box, serials in state.items():
+                for serial in serials:
+                    serial_box.setdefault(serial, box)
+            self._map.append(state)
+            self._serial_box.append(serial_box)
+
+        # dense tables by box number for batch lookups
+        nbox = max([int(b) for m in self._map for b in m] + [int(b) for b in boxes], default=0) + 1
+        self._cal_ibox = np.full(nbox, -1, dtype=int)
+        self._cal_ibox[[int(b) for b in boxes]] = np.arange(len(boxes))
+        nchannel = max([len(v) for m in self._map for v in m.values()], default=0)
+        self._serials = np.full((len(self._map), nbox, nchannel), None, dtype=object)
+        for i, m in enumerate(self._map):
+            for box, serials in m.items():
+                self._serials[i, int(box), :len(serials)] = serials
+
+    def _index(self, dates, key_dates, what):
+        # index of the most recent key before dates
+        dates = np.asarray(pyrutils.to_datetime64(dates)).astype('datetime64[ns]')
+        i = np.searchsorted(key_dates, dates, side='left') - 1
+        if np.any(i<0):
+            raise ValueError(f"No {what} available before {dates[i<0].min()}.")
+        return i
+
+    def _calibration(self, i, box):
+        ibox = self._ibox.get(box)
+        if ibox is None or not self.cal_valid[i, ibox]:
+            raise KeyError(f"No calibration for box {box}.")
+        return [None if np.isnan(v) else float(v) for v in self.cal[i, ibox]]
+
+    def _cc(self, i):
+        if not self.cc_valid[i]:
+            return [1]
+        return [float(v) for v in self.cc[i] if not np.isnan(v)]
+
+    def lookup(self, date, *, serial=None, box=None) -> tuple:
+        """
+        Lookup box number, serial numbers, calibration factors and cosine correction coefficients at date.
+
+        Parameters
+        ----------
+        date: scalar of type float, datetime or datetime64
+            A representation of time. If float, interpreted as Julian date.
+        serial: str or None
+            Serial number of a pyranometer.
+        box: int or None
+            PyrNet box number. One of serial or box has to be specified.
+
+        Returns
+        -------
+        tuple
+            box (str), serials (list of str), calibration factors (list of float or None),
+            cosine correction coefficients (list of float). Same as meta_lookup.
+        """
+        icalib = self._index(date, self.cal_dates, "calibration")
+        imap = self._index(date, self.map_dates, "box mapping")
+        if serial is None and box is not None:
+            box = f"{int(box):03d}"
+        elif serial is not None and box is None:
+            box = self._serial_box[imap].get(serial)
+            if box is None:
+                raise KeyError(f"Serial {serial} not found in box mapping at {date}.")
+        else:
+            raise ValueError("At least one of [station,box] have to be specified.")
+        return box, self._map[imap][box], self._calibration(icalib, box), self._cc(icalib)
+
+    def lookup_batch(self, dates, boxes) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Lookup many (date, box) pairs at once, e.g. for network wide or multi day processing.
+
+        Parameters
+        ----------
+        dates: ndarray of datetime64
+            Dates of the lookup.
+        boxes: ndarray of int
+            PyrNet box numbers, same shape as dates.
+
+        Returns
+        -------
+        serials: ndarray(object), shape (n, channels)
+            Serial numbers, None if not available.
+        cfac: ndarray(float), shape (n, channels)
+            Calibration factors, NaN if not available.
+        cc: ndarray(float), shape (n, coefficients)
+            Cosine correction coefficients, [1, NaN, ...] if not available.
+        """
+        dates, boxes = np.broadcast_arrays(np.asarray(dates), np.asarray(boxes))
+        dates, boxes = dates.ravel(), boxes.ravel().astype(int)
+        icalib = self._index(dates, self.cal_dates, "calibration")
+        imap = self._index(dates, self.map_dates, "box mapping")
+
+        # calibration and cosine correction from the dense tables
+        inside = (boxes>=0)*(boxes<self._cal_ibox.size)
+        ibox = np.full(boxes.size, -1, dtype=int)
+        ibox[inside] = self._cal_ibox[boxes[inside]]
+        valid = (ibox>=0)
+        valid[valid] = self.cal_valid[icalib[valid], ibox[valid]]
+        cfac = np.full((dates.size, self.cal.shape[2]), np.nan)
+        cfac[valid] = self.cal[icalib[valid], ibox[valid]]
+        cc = self.cc[icalib]
+        cc[~self.cc_valid[icalib]] = np.nan
+        cc[~self.cc_valid[icalib], :1] = 1
+
+        # serials from the mapping of each date
+        serials = np.full((dates.size, self._serials.shape[2]), None, dtype=object)
+        serials[inside] = self._serials[imap[inside], boxes[inside]]
+        return serials, cfac, cc
+
+# %% ../../nbs/pyrnet/pyrnet.ipynb 41
+def meta_lookup(date,*,serial=None,box=None,cfile=None, mapfile=None, index=None):
+    if index is None:
+        if cfile is None:
+            cfile = os.path.join(importlib.resources.files("pyrnet"), "share/pyrnet_calibration.json")
+        if mapfile is None:
+            mapfile = os.path.join(importlib.resources.files("pyrnet"), "share/pyrnet_station_map.json")
+        # compile the files, pass a MetaIndex for repeated lookups
+        index = MetaIndex(cfile, mapfile)
+    return index.lookup(date, serial=serial, box=box)
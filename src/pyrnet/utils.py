@@ -1,24 +1,36 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/pyrnet/utils.ipynb.
 
 # %% auto 0
-__all__ = ['EPOCH_JD_2000_0', 'to_datetime64', 'read_json', 'pick', 'omit', 'get_var_attrs', 'get_attrs_enc', 'get_xy_coords',
-           'pairwise_distance_matrix', 'gauss_fwin_fwhm', 'gauss_fwin', 'smooth_fwhm', 'smooth', 'make_iter',
-           'check_tilted', 'calc_apparent_coszen', 'tilt_correction_factor', 'bias_optimize_pitch', 'bias_optimize_yaw',
-           'bias_optimize']
+__all__ = ['logger', 'EPOCH_JD_2000_0', 'to_datetime64', 'read_json', 'pick', 'omit', 'get_var_attrs', 'get_attrs_enc',
+           'get_xy_coords', 'pairwise_distance_matrix', 'gauss_fwin_fwhm', 'gauss_fwin', 'smooth_fwhm', 'smooth',
+           'time_slots', 'binned_statistics', 'grid_slots', 'nan_runs', 'align_to_grid', 'make_iter', 'check_tilted',
+           'calc_apparent_coszen', 'tilt_correction_factor', 'bias_optimize_pitch', 'bias_optimize_yaw',
+           'bias_optimize', 'TaskGraph', 'prefetch', 'BackgroundReader', 'BackgroundWriter']
 
 # %% ../../nbs/pyrnet/utils.ipynb 2
 from numpy.typing import ArrayLike, NDArray
 import numpy as np
+import pandas as pd
+import xarray as xr
 from scipy.signal.windows import gaussian
 import jstyleson as json
 from addict import Dict as adict
 from operator import itemgetter
 from toolz import keyfilter
 import pyproj
+import logging
+import contextlib
+import collections
+import heapq
+import queue
+import threading
+import concurrent.futures
 
 # python -m pip install git+https://github.com/hdeneke/trosat-base.git#egg=trosat-base
 import trosat.sunpos as sp
 
+logger = logging.getLogger(__name__)
+
 # %% ../../nbs/pyrnet/utils.ipynb 5
 EPOCH_JD_2000_0 = np.datetime64("2000-01-01T12:00")
 def to_datetime64(time, epoch=EPOCH_JD_2000_0):
@@ -238,6 +250,255 @@ def smooth(y: ArrayLike, J: float, axis: int = 0) -> NDArray:
 
 
 # %% ../../nbs/pyrnet/utils.ipynb 26
+def time_slots(time: ArrayLike, freq: str) -> (NDArray, np.datetime64):
+    """
+    Integer time slots of width freq. Slots start at the beginning of the first day
+    (same as pandas resample with origin='start_day').
+
+    Parameters
+    ----------
+    time: ndarray(datetime64)
+        Sample times.
+    freq: str
+        Slot width, pandas frequency string of fixed duration, e.g. '1s'.
+
+    Returns
+    -------
+    slots: ndarray(int)
+        Slot number of each sample, the slot of the first sample is 0.
+    start: numpy.datetime64
+        Start time of slot 0.
+    """
+    time = np.asarray(time).astype('datetime64[ns]')
+    width = pd.Timedelta(freq).to_timedelta64()
+    day = time[0].astype('datetime64[D]')
+    start = day + ((time[0]-day)//width)*width
+    return (time-start)//width, start
+
+def binned_statistics(values: ArrayLike,
+                      slots: ArrayLike,
+                      nslots: int|None = None,
+                      stats: list[str] = ["mean"],
+                      axis: int = 0) -> dict:
+    """
+    Statistics of the values within integer slots in a single vectorized sweep, NaN values are skipped.
+
+    Parameters
+    ----------
+    values: ndarray
+        Sample values, e.g. of shape (time, station).
+    slots: ndarray(int)
+        Non negative slot number of each sample, e.g. from time_slots.
+        Samples are sorted by slot if not ascending already.
+    nslots: int or None
+        Number of output slots. The default is None, the largest slot number + 1.
+    stats: list of str
+        Any of "mean", "min", "max", "std" (ddof=1), "var" (ddof=1), "sum" and "count".
+    axis: int
+        Sample axis of values. The default is 0. Fastest for the last axis of a C-contiguous array.
+
+    Returns
+    -------
+    dict
+        Arrays for each statistic, the sample axis is replaced by nslots. Slots without valid
+        samples are NaN, "sum" and "count" are zero.
+    """
+    values = np.moveaxis(np.asarray(values, dtype=np.float64), axis, -1)
+    slots = np.asarray(slots, dtype=np.int64)
+    if nslots is None:
+        nslots = int(slots.max()+1) if slots.size else 0
+    if np.any(slots[1:]<slots[:-1]):
+        isort = np.argsort(slots, kind='stable')
+        slots, values = slots[isort], values[...,isort]
+    # one row per series of samples, the reductions run along contiguous rows
+    v = np.ascontiguousarray(values.reshape(int(np.prod(values.shape[:-1])), values.shape[-1]))
+    shape = values.shape[:-1] + (nslots,)
+
+    def dense(x, fill=np.nan, dtype=np.float64):
+        out = np.full((v.shape[0], nslots), fill, dtype=dtype)
+        if x is not None:
+            out[:,occupied] = x
+        return np.moveaxis(out.reshape(shape), -1, axis)
+
+    if slots.size==0:
+        fills = {"sum": (0., np.float64), "count": (0, np.int64)}
+        return {s: dense(None, *fills.get(s, (np.nan, np.float64))) for s in stats}
+
+    # contiguous segments of samples in the same slot
+    start = np.flatnonzero(np.diff(slots, prepend=-1))
+    occupied = slots[start]
+    size = np.diff(np.append(start, slots.size))
+    isnan = np.isnan(v)
+    hasnan = np.any(isnan)
+    if hasnan:
+        count = np.add.reduceat(~isnan, start, axis=1)
+        v0 = np.where(isnan, 0., v)
+    else:
+        count = np.broadcast_to(size, (v.shape[0], size.size))
+        v0 = v
+    total = np.add.reduceat(v0, start, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total/count
+        if ("std" in stats) or ("var" in stats):
+            dev = v0 - np.repeat(mean, size, axis=1)
+            if hasnan:
+                dev[isnan] = 0.
+            var = np.add.reduceat(dev*dev, start, axis=1)/(count-1)
+            var[count<2] = np.nan
+
+    result = {}
+    for stat in stats:
+        if stat=="mean":
+            result[stat] = dense(mean)
+        elif stat=="min":
+            result[stat] = dense(np.fmin.reduceat(v, start, axis=1))
+        elif stat=="max":
+            result[stat] = dense(np.fmax.reduceat(v, start, axis=1))
+        elif stat=="std":
+            result[stat] = dense(np.sqrt(var))
+        elif stat=="var":
+            result[stat] = dense(var)
+        elif stat=="sum":
+            result[stat] = dense(total, fill=0.)
+        elif stat=="count":
+            result[stat] = dense(count, fill=0, dtype=np.int64)
+        else:
+            raise ValueError(f"Statistic {stat} is not supported.")
+    return result
+
+# %% ../../nbs/pyrnet/utils.ipynb 28
+def grid_slots(time: ArrayLike,
+               start: np.datetime64,
+               freq: str,
+               size: int|None = None,
+               tolerance: np.timedelta64 = np.timedelta64(1, 'ms')) -> (NDArray, NDArray):
+    """
+    Integer slot indices of sample times on the regular grid start + i*freq.
+
+    Parameters
+    ----------
+    time: ndarray(datetime64)
+        Sample times.
+    start: numpy.datetime64
+        Time of the first grid point.
+    freq: str
+        Grid spacing, pandas frequency string of fixed duration, e.g. '1s'.
+    size: int or None
+        Number of grid points. If given, samples outside the grid are off grid. The default is None.
+    tolerance: numpy.timedelta64
+        Maximum distance of a sample to its grid point. The default is 1ms.
+
+    Returns
+    -------
+    slots: ndarray(int)
+        Index of the nearest grid point of each sample.
+    on_grid: ndarray(bool)
+        True if the sample is within tolerance of its grid point.
+    """
+    time = np.asarray(time).astype('datetime64[ns]')
+    isnat = np.isnat(time)
+    dt = (time - np.datetime64(start, 'ns')).astype(np.int64)
+    dt[isnat] = 0
+    width = pd.Timedelta(freq).value
+    slots = (dt + width//2) // width
+    on_grid = ~isnat & (np.abs(dt - slots*width) <= pd.Timedelta(tolerance).value)
+    if size is not None:
+        on_grid &= (slots >= 0) & (slots < size)
+    return slots, on_grid
+
+def nan_runs(values: ArrayLike) -> (NDArray, NDArray, NDArray):
+    """
+    Run-length encoding of the nan gaps along the first axis, for all columns at once.
+
+    Parameters
+    ----------
+    values: array_like
+        Array of shape (time,) or (time, station).
+
+    Returns
+    -------
+    icolumn: ndarray(int)
+        Column (station) index of each gap.
+    istart: ndarray(int)
+        Index of the first nan value of each gap.
+    iend: ndarray(int)
+        Index of the last nan value of each gap.
+        Gaps are sorted by column and start index.
+    """
+    isnan = np.isnan(np.asarray(values, dtype=float))
+    isnan = isnan.reshape(isnan.shape[0], -1)
+    # +1 at the start, -1 after the end of each gap
+    edges = np.diff(np.pad(isnan.T, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    icolumn, istart = np.nonzero(edges == 1)
+    _, iend = np.nonzero(edges == -1)
+    return icolumn, istart, iend - 1
+
+def _promote_dtype(dtype):
+    # dtype and fill value to hold missing values, same as xarray reindex
+    if dtype.kind in "mM":
+        return dtype, np.array("NaT", dtype=dtype)
+    if dtype.kind in "fc":
+        return dtype, np.nan
+    if dtype.kind in "iub":
+        return np.dtype(float), np.nan
+    return np.dtype(object), np.nan
+
+def align_to_grid(ds, dim: str, start: np.datetime64, freq: str, size: int,
+                  tolerance: np.timedelta64 = np.timedelta64(1, 'ms')):
+    """
+    Align dataset to the regular time grid start + i*freq, i<size, along dimension dim.
+    Same as reindex with method='nearest' and tolerance for data on the grid, but without search.
+    Samples off the grid are dropped and reported, missing grid points are filled with nan.
+
+    Parameters
+    ----------
+    ds: xarray.Dataset
+        Dataset with time coordinate dim.
+    dim: str
+        Name of the time dimension.
+    start: numpy.datetime64
+        Time of the first grid point.
+    freq: str
+        Grid spacing, pandas frequency string of fixed duration, e.g. '1s'.
+    size: int
+        Number of grid points.
+    tolerance: numpy.timedelta64
+        Maximum distance of a sample to its grid point. The default is 1ms.
+
+    Returns
+    -------
+    xarray.Dataset
+        Dataset on the regular time grid.
+    """
+    slots, on_grid = grid_slots(ds[dim].values, start, freq, size=size, tolerance=tolerance)
+    if not np.all(on_grid):
+        logger.warning(f"{np.sum(~on_grid)} samples are off the {freq} grid and are dropped.")
+    slots = slots[on_grid]
+    grid = pd.date_range(start, periods=size, freq=freq)
+
+    variables = {}
+    for name, var in ds.variables.items():
+        if name == dim:
+            var = xr.Variable(dim, grid.values, attrs=var.attrs, encoding=var.encoding)
+        elif dim in var.dims:
+            axis = var.dims.index(dim)
+            dtype, fill_value = _promote_dtype(var.dtype)
+            shape = list(var.shape)
+            shape[axis] = size
+            values = np.full(shape, fill_value, dtype=dtype)
+            index = [slice(None)] * var.ndim
+            index[axis] = slots
+            values[tuple(index)] = np.compress(on_grid, var.values, axis=axis)
+            var = xr.Variable(var.dims, values, attrs=var.attrs, encoding=var.encoding)
+        variables[name] = var
+    dsa = xr.Dataset(
+        coords={name: variables[name] for name in ds.coords},
+        attrs=ds.attrs.copy()
+    ).assign({name: variables[name] for name in ds.data_vars})
+    dsa.encoding = ds.encoding.copy()
+    return dsa
+
+# %% ../../nbs/pyrnet/utils.ipynb 30
 def make_iter(x):
     """Check if x is an iterable, if not make it so and return np.array(x).
     """
@@ -274,7 +535,7 @@ def check_tilted(x):
         is_tilted = np.abs(vangle)>0.1
     return is_tilted
 
-# %% ../../nbs/pyrnet/utils.ipynb 27
+# %% ../../nbs/pyrnet/utils.ipynb 31
 def calc_apparent_coszen(pitch,yaw,zen,azi):
     """
     Calculate cosine of apparent zenith angle
@@ -320,3 +581,300 @@ def bias_optimize(vals,ghi,ghi_t,zen,azi):
     dp, dy = vals
     F = ghi_t*tilt_correction_factor(dp, dy, zen, azi)
     return np.nanmean(np.abs(ghi-F))
+
+# %% ../../nbs/pyrnet/utils.ipynb 37
+class TaskGraph:
+    """
+    Graph of tasks with dependencies, run on a local process pool.
+
+    Ready tasks are started in the order they were added. A task is ready if all of its
+    dependencies are done. The results of the dependencies are passed to the task function
+    as additional positional arguments, in order of the dependencies.
+    If a task fails, all tasks depending on it fail as well.
+    """
+    def __init__(self):
+        self.tasks = {}
+        # keys in order of the graph, the tasks added since run started are registered from it
+        self._order = []
+
+    def add(self, key, func, args=(), deps=(), memory=0):
+        """
+        Add a task to the graph.
+
+        Parameters
+        ----------
+        key: hashable
+            Unique name of the task.
+        func: callable
+            Task function, has to be picklable to run in a process pool.
+        args: tuple
+            Positional arguments of func.
+        deps: list
+            Keys of the tasks this task depends on.
+        memory: float
+            Estimated peak memory of the task in bytes. The default is 0.
+        """
+        if key in self.tasks:
+            raise ValueError(f"Task {key} already exists.")
+        self.tasks[key] = (func, tuple(args), tuple(deps), memory)
+        self._order.append(key)
+
+    def run(self, jobs=1, memory=None, callback=None, initializer=None, initargs=()):
+        """
+        Run all tasks of the graph.
+
+        Parameters
+        ----------
+        jobs: int
+            Number of worker processes. If smaller than 2, the tasks run in this process.
+            The default is 1.
+        memory: float or None
+            Limit of the summed memory estimates of the running tasks in bytes. A task is
+            started anyway if no other task is running. The default is None (no limit).
+        callback: callable or None
+            Called as callback(key, result) in this process when a task is done or
+            failed (result None), can add further tasks. The default is None.
+        initializer, initargs:
+            Initializer of the worker processes, see concurrent.futures.ProcessPoolExecutor.
+
+        Returns
+        -------
+        results: dict
+            Results of the done tasks by key.
+        failed: dict
+            Exceptions of the failed tasks by key.
+        """
+        results, failed = {}, {}
+        running = {}
+        used = 0
+        # position in the graph of the registered tasks, number of unfinished dependencies of
+        # the waiting tasks, waiting tasks by dependency and the heap of (position, key) of ready tasks
+        position = {}
+        nwaiting = {}
+        dependents = collections.defaultdict(list)
+        ready = []
+
+        def _register():
+            # tasks added since the last call, e.g. by callback
+            while len(position) < len(self._order):
+                key = self._order[len(position)]
+                position[key] = len(position)
+                deps = self.tasks[key][2]
+                upstream = [dep for dep in deps if dep in failed]
+                if upstream:
+                    _skip(key, upstream[0])
+                    continue
+                pending = [dep for dep in deps if dep not in results]
+                for dep in pending:
+                    dependents[dep].append(key)
+                if pending:
+                    nwaiting[key] = len(pending)
+                else:
+                    heapq.heappush(ready, (position[key], key))
+
+        def _skip(key, dep):
+            # key and all tasks waiting for it fail, as dependency dep failed
+            todo = [(key, dep)]
+            while todo:
+                key, dep = todo.pop()
+                if key in failed:
+                    continue
+                logger.error(f"Task {key} skipped, dependency {dep} failed.")
+                failed[key] = RuntimeError(f"Dependency {dep} failed.")
+                nwaiting.pop(key, None)
+                todo.extend((waiting, key) for waiting in dependents.pop(key, []))
+
+        def _done(key, get_result):
+            try:
+                results[key] = get_result()
+            except Exception as e:
+                logger.exception(f"Task {key} failed: {e}")
+                failed[key] = e
+            if key in failed:
+                for waiting in dependents.pop(key, []):
+                    _skip(waiting, key)
+            else:
+                for waiting in dependents.pop(key, []):
+                    if waiting not in nwaiting:
+                        continue
+                    nwaiting[waiting] -= 1
+                    if nwaiting[waiting] == 0:
+                        del nwaiting[waiting]
+                        heapq.heappush(ready, (position[waiting], waiting))
+            if callback is not None:
+                callback(key, results.get(key, None))
+            _register()
+
+        with contextlib.ExitStack() as stack:
+            pool = None
+            if jobs > 1:
+                pool = stack.enter_context(concurrent.futures.ProcessPoolExecutor(
+                    jobs, initializer=initializer, initargs=initargs
+                ))
+            elif initializer is not None:
+                initializer(*initargs)
+            _register()
+            while True:
+                # start ready tasks in order of the graph, tasks exceeding the memory
+                # limit wait for running tasks, smaller tasks after them may start
+                deferred = []
+                while ready and (pool is None or len(running) < jobs):
+                    index, key = heapq.heappop(ready)
+                    func, args, deps, mem = self.tasks[key]
+                    if running and memory is not None and used + mem > memory:
+                        deferred.append((index, key))
+                        continue
+                    args = args + tuple(results[dep] for dep in deps)
+                    if pool is None:
+                        _done(key, lambda: func(*args))
+                        continue
+                    running[pool.submit(func, *args)] = key
+                    used += mem
+                for item in deferred:
+                    heapq.heappush(ready, item)
+
+                if not running:
+                    break
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    used -= self.tasks[key][3]
+                    _done(key, future.result)
+        
+        # tasks waiting for dependencies, which were never added
+        for key in self.tasks:
+            if key not in results and key not in failed:
+                logger.error(f"Task {key} skipped, unresolved dependencies.")
+                failed[key] = RuntimeError("Unresolved dependencies.")
+        return results, failed
+
+# %% ../../nbs/pyrnet/utils.ipynb 39
+def prefetch(func, items, ahead=1):
+    """
+    Iterate over items, while func of the next items is computed in a background thread.
+
+    Parameters
+    ----------
+    func: callable
+        Called as func(item) in the background thread, e.g. to read an input file.
+    items: iterable
+        Items to iterate over.
+    ahead: int
+        Number of items func is computed for ahead of the current item. The default is 1.
+
+    Yields
+    ------
+    item:
+        The next item.
+    future: concurrent.futures.Future
+        Future of func(item), its result raises the exception of func, if it failed.
+    """
+    items = iter(items)
+    pending = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(1) as pool:
+        try:
+            for item in items:
+                pending.append((item, pool.submit(func, item)))
+                if len(pending) > ahead:
+                    yield pending.popleft()
+            while pending:
+                yield pending.popleft()
+        finally:
+            # the iteration stopped early
+            for _, future in pending:
+                future.cancel()
+
+class BackgroundReader:
+    """
+    Iterate over an iterable, while its next items are produced in a background thread.
+
+    At most maxsize items are produced ahead, e.g. parsed blocks of a raw file. This limits
+    the memory of items waiting to be consumed. Exceptions of the iterable are raised by the
+    iteration. The background thread stops, once the reader is closed or garbage collected.
+    """
+    def __init__(self, iterable, maxsize=2):
+        self._queue = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(iter(iterable),), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # False, if the reader was closed before item was queued
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self, items):
+        try:
+            for item in items:
+                if not self._put((False, item)):
+                    return
+        except Exception as e:
+            self._put((True, e))
+        else:
+            self._put((True, None))
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._stop.is_set():
+            raise StopIteration
+        done, item = self._queue.get()
+        if not done:
+            return item
+        self._stop.set()
+        if item is not None:
+            raise item
+        raise StopIteration
+
+    def close(self):
+        """Stop the background thread."""
+        self._stop.set()
+
+    def __del__(self):
+        self.close()
+
+class BackgroundWriter:
+    """
+    Run write calls in order in a background thread.
+
+    At most maxsize calls are queued, submit blocks until a previous call is done.
+    This limits the memory of datasets waiting to be written.
+    The calls run next to the file access of the submitting thread, direct netCDF4 calls
+    have to hold the netCDF library lock, as the writes of pyrnet.data do.
+    """
+    def __init__(self, maxsize=2):
+        self._pool = concurrent.futures.ThreadPoolExecutor(1)
+        self._slots = threading.Semaphore(maxsize)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue the call func(*args, **kwargs).
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future of the call, its result raises the exception of func, if it failed.
+        """
+        self._slots.acquire()
+        future = self._pool.submit(func, *args, **kwargs)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self):
+        """Wait for all queued calls."""
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,89 @@
+import json
+import random
+
+import numpy as np
+import pytest
+import xarray as xr
+from click.testing import CliRunner
+
+from pyrnet.click import cli
+from test_logger import gprmc_line, write_lines
+
+# without maintenance report
+pytestmark = pytest.mark.filterwarnings("ignore:No report for station")
+
+
+def raw_lines(seed, start, minutes):
+    # logger at 10 Hz with a GPS record every second, noisy ghi and gti counts
+    r = random.Random(seed)
+    t = np.datetime64(start, "ms")
+    lines = []
+    for _ in range(minutes*60):
+        lines.append(gprmc_line(t))
+        t += np.timedelta64(1, "s")
+        for k in range(10):
+            lines.append(f"{k*100} 0 500 500 {r.randrange(190, 210)} 900 {r.randrange(250, 270)}")
+    return lines
+
+
+@pytest.fixture(scope="module")
+def raw_files(tmp_path_factory):
+    path = tmp_path_factory.mktemp("raw")
+    # station 1 has two files and contributes to a day from both
+    return [
+        write_lines(path / f"Pyr{station:03d}_{i:03d}.bin", raw_lines(10*station + i, start, minutes))
+        for station, i, start, minutes in [
+            (1, 0, "2023-01-10T11:00", 40),
+            (1, 1, "2023-01-10T23:45", 30),
+            (2, 0, "2023-01-10T11:00", 40),
+        ]
+    ]
+
+
+@pytest.fixture(scope="module")
+def config(tmp_path_factory):
+    fname = tmp_path_factory.mktemp("config") / "config.json"
+    # no GPS week rollover correction of the synthetic dates, the qc of 10 s data is fast
+    fname.write_text(json.dumps({"date_of_measure": "2019-01-01", "l1bfreq": "10s"}))
+    return str(fname)
+
+
+def run(args, output_path, jobs):
+    output_path.mkdir()
+    result = CliRunner().invoke(cli, ["process", *args, str(output_path), "--jobs", str(jobs)])
+    assert result.exit_code == 0, result.output
+    outputs = {}
+    for fname in sorted(output_path.iterdir()):
+        ds = xr.load_dataset(fname)
+        for attr in ["history", "date_created"]:
+            del ds.attrs[attr]
+        outputs[fname.name] = ds
+    return outputs
+
+
+def assert_outputs_identical(outputs, ref):
+    assert list(outputs) == list(ref)
+    for fname in ref:
+        xr.testing.assert_identical(outputs[fname], ref[fname])
+
+
+def test_process_l1a_jobs(tmp_path, raw_files, config):
+    ref = run(["l1a", *raw_files, "-c", config], tmp_path / "jobs1", 1)
+    assert len(ref) == 3
+    assert_outputs_identical(run(["l1a", *raw_files, "-c", config], tmp_path / "jobs2", 2), ref)
+
+
+@pytest.mark.parametrize("from_raw", [False, True])
+def test_process_l1b_jobs(tmp_path, raw_files, config, from_raw):
+    if from_raw:
+        inputs = [*raw_files, "--from_raw"]
+    else:
+        run(["l1a", *raw_files, "-c", config], tmp_path / "l1a", 1)
+        inputs = sorted(str(fn) for fn in (tmp_path / "l1a").iterdir())
+    ref = run(["l1b", *inputs, "-c", config], tmp_path / "jobs1", 1)
+    assert sorted(ref) == [
+        "2023-01-10_P1D_pyrnet__s001l1bf10s.c01.nc",
+        "2023-01-10_P1D_pyrnet__s002l1bf10s.c01.nc",
+        "2023-01-11_P1D_pyrnet__s001l1bf10s.c01.nc",
+    ]
+    assert_outputs_identical(run(["l1b", *inputs, "-c", config], tmp_path / "jobs2", 2), ref)
@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from pyrnet import data as pyrdata
+from pyrnet import logger as pyrlogger
+from pyrnet.qcrad import QCCode
+
+
+def records(start, hours, counts=(200, 260)):
+    # parsed records of a logger at 10 Hz with a GPS record every second, constant
+    # ghi and gti counts, gti differs from ghi by more than the comparison test allows
+    n = int(hours*3600*10)
+    adc = np.zeros((n, 7), dtype=np.uint16)
+    adc[:,0] = (np.arange(n)*100) % 1000
+    adc[:,2:] = [500, 500, counts[0], 900, counts[1]]
+    gps = np.zeros(n//10, dtype=pyrlogger.dtype_gprmc).view(np.recarray)
+    gps.time = np.datetime64(start, 'ms') + np.arange(gps.size)*np.timedelta64(1, 's')
+    gps.status = b'A'
+    # daylight at midnight UTC
+    gps.lat, gps.lon = 35., 139.
+    gps.iadc = np.arange(gps.size)*10
+    return [(adc, gps)]
+
+
+def to_l1a(station, start, hours, counts=(200, 260), session=None):
+    # without maintenance report
+    with pytest.warns(UserWarning):
+        return pyrdata.to_l1a(f"Pyr{station:03d}_000.bin", station=station, report=None,
+                              records=records(start, hours, counts), session=session)
+
+
+@pytest.fixture(scope="module")
+def l1a_midnight():
+    return to_l1a(9, "2022-08-30T23:20", 1.5)
+
+
+def test_iter_l1b_daily_midnight(l1a_midnight):
+    whole = pyrdata.to_l1b(l1a_midnight)
+    days = list(pyrdata.iter_l1b_daily(l1a_midnight))
+    assert [str(ds.time.values[0].astype("datetime64[D]")) for ds in days] == ["2022-08-30", "2022-08-31"]
+    # the comparison test of the first minutes of a day uses the samples before midnight
+    for ds in days:
+        ref = whole.sel(time=ds.time)
+        np.testing.assert_array_equal(ds.qc_flag_ghi.values, ref.qc_flag_ghi.values)
+        np.testing.assert_array_equal(ds.ghi.values, ref.ghi.values)
+    assert np.all(days[1].qc_flag_ghi.values[:60] == QCCode.compare_to_low)
+    assert days[1].time.encoding["units"] == "seconds since 2022-08-31T00:00Z"
+
+
+
+# 10 s resolution, the qc of a full day grid is fast
+SESSION_10S = pyrdata.ProcessingSession({"l1bfreq": "10s"})
+
+
+def l1b_day(station, start, hours, counts):
+    ds = to_l1a(station, start, hours, counts, session=SESSION_10S)
+    return next(pyrdata.iter_l1b_daily(ds, session=SESSION_10S))
+
+
+def write_l1b(fname, first, second, inplace, monkeypatch):
+    # write first, then merge second into the file in place or by rewriting the file
+    pyrdata.to_netcdf_l1b(first, fname, freq="10s")
+    update = pyrdata._update_netcdf_l1b
+    updated = []
+    def spy(*args, **kwargs):
+        updated.append(inplace and update(*args, **kwargs))
+        return updated[-1]
+    monkeypatch.setattr(pyrdata, "_update_netcdf_l1b", spy)
+    pyrdata.to_netcdf_l1b(second, fname, freq="10s")
+    monkeypatch.undo()
+    assert updated == [inplace]
+    ds = xr.load_dataset(fname)
+    for attr in ["history", "date_created"]:
+        del ds.attrs[attr]
+    return ds
+
+
+@pytest.mark.parametrize("case", ["append_station", "overwrite_interval"])
+def test_to_netcdf_l1b_inplace(tmp_path, monkeypatch, case):
+    first = l1b_day(9, "2022-08-30T10:00", 1, (200, 260))
+    if case == "append_station":
+        second = l1b_day(10, "2022-08-30T10:00", 1, (300, 310))
+    else:
+        second = l1b_day(9, "2022-08-30T10:20", 0.5, (250, 260))
+    inplace = write_l1b(tmp_path / "inplace.nc", first, second, True, monkeypatch)
+    rewrite = write_l1b(tmp_path / "rewrite.nc", first, second, False, monkeypatch)
+    xr.testing.assert_identical(inplace, rewrite)
+    # values of the second dataset overwrite the file
+    station = second.station.values[0]
+    np.testing.assert_allclose(
+        inplace.ghi.sel(station=station, time=second.time).values,
+        second.ghi.sel(station=station).values,
+        rtol=1e-3
+    )
+    assert inplace.station.size == (2 if case == "append_station" else 1)
+
+
+def test_processing_manifest(tmp_path):
+    raw = tmp_path / "Pyr009_000.bin"
+    raw.write_text("raw")
+    calibration = tmp_path / "calibration.json"
+    calibration.write_text("{}")
+    out = tmp_path / "out.nc"
+    out.write_text("l1a")
+    cfg = pyrdata.get_config({"file_calibration": str(calibration)})
+    report = {"009": {"maintenance": 1}, "010": {"maintenance": 1}}
+    task = f"l1a:{raw}"
+
+    def key(config=cfg, report=report):
+        with pyrdata.ProcessingManifest(str(tmp_path / "manifest.sqlite")) as manifest:
+            return manifest.task_key([str(raw)], config, report=report, station=9)
+
+    def is_current(key):
+        with pyrdata.ProcessingManifest(str(tmp_path / "manifest.sqlite")) as manifest:
+            return manifest.is_current(task, key)
+
+    first = key()
+    assert not is_current(first)
+    with pyrdata.ProcessingManifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        manifest.record(task, first, [str(out)])
+    # unchanged inputs are skipped
+    assert key() == first and is_current(first)
+    # the cache directory and the report of other stations are no dependencies
+    assert key({**cfg, "cache_dir": str(tmp_path)}) == first
+    assert key(report={**report, "010": {"maintenance": 2}}) == first
+
+    # changed config, config file and report of the station
+    assert not is_current(key({**cfg, "stripminutes": 10}))
+    assert not is_current(key(report={**report, "009": {"maintenance": 2}}))
+    calibration.write_text('{"a": 1}')
+    assert not is_current(key())
+    calibration.write_text("{}")
+    assert is_current(key())
+
+    # changed input
+    raw.write_text("raw2")
+    assert not is_current(key())
+    raw.write_text("raw")
+    assert is_current(key())
+
+    # missing output
+    out.unlink()
+    assert not is_current(first)
+
+    # tasks without outputs run again
+    with pyrdata.ProcessingManifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        manifest.record(task, first, [])
+    out.write_text("l1a")
+    assert not is_current(first)
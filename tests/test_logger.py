@@ -0,0 +1,262 @@
+import gzip
+import os
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pyrnet import logger as pyrlogger
+
+EXAMPLE_DATA = Path(__file__).parents[1] / "example_data"
+DATE_OF_MEASURE = np.datetime64("2023-01-10")
+
+
+def nmea(body, checksum=None):
+    xor = 0
+    for ch in body:
+        xor ^= ord(ch)
+    return f"${body}*{xor if checksum is None else checksum:02X}"
+
+
+def gprmc_line(t, lat=5123.4127, lon=1153.1153, checksum=None):
+    t = t.astype("datetime64[ms]").item()
+    body = (f"GPRMC,{t:%H%M%S}.{t.microsecond//1000:03d},A,{lat:09.4f},N,{lon:010.4f},E,"
+            f"0.06,0.00,{t:%d%m%y},,,A")
+    return f"{t:%Y%m%d,%H%M%S} 0 " + nmea(body, checksum)
+
+
+def adc_line(r, ncols=7):
+    return " ".join(str(r.randrange(1024)) for _ in range(ncols))
+
+
+def read_records_by_line(fname, date_of_measure):
+    """
+    Reference: the line by line parser of read_records before the vectorized one.
+    In addition, GPRMC records with an invalid NMEA checksum are rejected.
+    """
+    opener = gzip.open if fname.endswith(".gz") else open
+    with opener(fname, "rt", errors="ignore") as f:
+        lines = [l.rstrip() for l in f.readlines()]
+    if len(lines) < 20:
+        return False, False
+    lines = lines[:-1]
+    if pyrlogger._re_gprmc.match(lines[-1]):
+        lines = lines[:-1]
+
+    rec_gprmc, rec_adc = [], []
+    for l in lines:
+        m = pyrlogger._re_gprmc.match(l)
+        if m:
+            body = "GPRMC," + m.group(2)
+            valid = nmea(body) == "$" + body + m.group(3).upper()
+            if not valid:
+                continue
+            r = pyrlogger.parse_gprmc(m.group(2), date_of_measure)
+            if not np.isnat(r[0]):
+                rec_gprmc.append(r + (len(rec_adc),))
+        elif pyrlogger._re_adc.match(l):
+            r = pyrlogger.parse_adc(l)
+            if not rec_adc:
+                adc_len = len(r)
+            if len(r) == adc_len:
+                rec_adc.append(r)
+    rec_adc = np.array(rec_adc, dtype=np.uint16)
+    rec_gprmc = np.array(rec_gprmc, dtype=pyrlogger.dtype_gprmc).view(np.recarray)
+    return rec_adc, rec_gprmc
+
+
+def synthetic_lines(seed, nlines=400):
+    r = random.Random(seed)
+    t = np.datetime64("2023-01-10T11:21:04.065")
+    lines = []
+    for i in range(nlines):
+        if i % 10 == 0:
+            lines.append(gprmc_line(t, lat=r.uniform(5000, 5200), lon=r.uniform(1100, 1200)))
+            t += np.timedelta64(1, "s")
+        else:
+            lines.append(adc_line(r))
+    return lines
+
+
+def assert_records_equal(fname, date_of_measure=DATE_OF_MEASURE):
+    rec_adc, rec_gprmc = pyrlogger.read_records(fname, date_of_measure)
+    ref_adc, ref_gprmc = read_records_by_line(fname, date_of_measure)
+    np.testing.assert_array_equal(rec_adc, ref_adc)
+    np.testing.assert_array_equal(rec_gprmc, ref_gprmc)
+    # blocks of a few lines, each block starts with a different line
+    for blocksize in (64, 997):
+        records = list(pyrlogger.iter_records(fname, date_of_measure, blocksize=blocksize))
+        np.testing.assert_array_equal(np.concatenate([adc for adc, _ in records]), ref_adc)
+        np.testing.assert_array_equal(np.concatenate([gps for _, gps in records]), ref_gprmc)
+    return rec_adc, rec_gprmc
+
+
+def write_lines(path, lines, newline="\n", compress=False):
+    data = (newline.join(lines) + newline).encode("utf-8")
+    if compress:
+        path = path.with_suffix(".bin.gz")
+        with gzip.open(path, "wb") as f:
+            f.write(data)
+    else:
+        path.write_bytes(data)
+    return str(path)
+
+
+def test_read_records_example_data():
+    rec_adc, rec_gprmc = assert_records_equal(str(EXAMPLE_DATA / "Pyr9_000.bin"), np.datetime64("2022-08-30"))
+    assert rec_adc.shape[0] > 0 and rec_gprmc.size > 0
+    assert np.all(np.diff(rec_gprmc.iadc) >= 0)
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+@pytest.mark.parametrize("compress", [False, True])
+def test_read_records_synthetic(tmp_path, newline, compress):
+    lines = synthetic_lines(0)
+    fname = write_lines(tmp_path / "Pyr001_000.bin", lines, newline, compress)
+    rec_adc, rec_gprmc = assert_records_equal(fname)
+    # the last line is dropped
+    assert rec_adc.shape == (359, 7)
+    assert rec_gprmc.size == 40
+
+
+def test_read_records_short_lines(tmp_path):
+    lines = synthetic_lines(1)
+    # lone "$" lines and other lines shorter than any GPRMC field window
+    for i, l in [(3, "$"), (25, "$"), (47, "1"), (48, ""), (49, "12 34"),
+                 (80, "1,2 3 $GPRMC,*00"), (81, "$GPRMC,"), (120, "   ")]:
+        lines.insert(i, l)
+    assert_records_equal(write_lines(tmp_path / "Pyr001_000.bin", lines))
+
+
+def test_read_records_bad_checksum(tmp_path):
+    lines = synthetic_lines(2)
+    t = np.datetime64("2023-01-10T12:00:00")
+    # wrong and non hexadecimal checksums, lower case hexadecimal digits are valid
+    lines[30] = gprmc_line(t, checksum=0)
+    lines[50] = lines[50][:-2] + lines[50][-2:].lower()
+    lines[70] = lines[70][:-2] + "ZZ"
+    # latitude changed after the checksum was computed
+    i = lines[90].index(",A,") + 3
+    lines[90] = lines[90][:i] + str((int(lines[90][i]) + 1) % 10) + lines[90][i+1:]
+    rec_adc, rec_gprmc = assert_records_equal(write_lines(tmp_path / "Pyr001_000.bin", lines))
+    assert rec_gprmc.size == 40 - 3
+
+
+def test_read_records_first_line(tmp_path):
+    # the first GPRMC candidate of the file (and of the blocks) is damaged,
+    # field windows left of the first line must not be shifted into other lines
+    lines = synthetic_lines(3)
+    lines[0] = lines[0][lines[0].index("$"):]
+    lines[10] = "0 " + lines[10][lines[10].index("$"):]
+    lines.insert(1, "$GPRMC,")
+    rec_adc, rec_gprmc = assert_records_equal(write_lines(tmp_path / "Pyr001_000.bin", lines))
+    assert rec_gprmc.size == 40 - 2
+
+
+def test_read_records_broken_lines(tmp_path):
+    lines = synthetic_lines(4)
+    r = random.Random(4)
+    for i in r.sample(range(len(lines)), 40):
+        l = lines[i]
+        k = r.randrange(len(l))
+        lines[i] = r.choice([l[:k], l[:k] + "é" + l[k+1:], l[:k] + "  " + l[k:], l[:k] + "," + l[k+1:]])
+    # incomplete ADC line
+    lines[33] = "1 2 3"
+    assert_records_equal(write_lines(tmp_path / "Pyr001_000.bin", lines))
+
+
+def test_read_records_out_of_bounds(tmp_path):
+    lines = synthetic_lines(5)
+    lines[42] = "1 2 3 4 5 6 65536"
+    with pytest.raises(OverflowError):
+        pyrlogger.read_records(write_lines(tmp_path / "Pyr001_000.bin", lines), DATE_OF_MEASURE)
+    # leading zeros fit into uint16
+    lines[42] = "1 2 3 4 5 6 0000000000065535"
+    assert_records_equal(write_lines(tmp_path / "Pyr001_000.bin", lines))
+
+
+def test_parse_gprmc_lines():
+    t = np.datetime64("2023-01-10T11:21:04.065")
+    lines = [gprmc_line(t + np.timedelta64(i, "s")) for i in range(3)]
+    lines += [gprmc_line(t, checksum=0), lines[0].replace("1153.", "1153"), "$"]
+    rec = pyrlogger.parse_gprmc_lines(lines, DATE_OF_MEASURE)
+    for l, r in zip(lines[:3], rec[:3]):
+        m = pyrlogger._re_gprmc.match(l)
+        ref = pyrlogger.parse_gprmc(m.group(2), DATE_OF_MEASURE)
+        assert (r["time"], r["status"].decode(), r["lat"], r["lon"]) == ref
+    assert np.all(rec["status"][3:] == b"V")
+    assert np.all(np.isnat(rec["time"][3:]))
+
+
+def read_cached(fname, cache_dir, date_of_measure=DATE_OF_MEASURE, cache_size=2**31):
+    records = list(pyrlogger.iter_cached_records(fname, date_of_measure, cache_dir=str(cache_dir),
+                                                 cache_size=cache_size))
+    rec_adc = np.concatenate([adc for adc, _ in records])
+    rec_gprmc = np.concatenate([gps for _, gps in records])
+    return rec_adc, rec_gprmc
+
+
+def cache_entries(cache_dir):
+    return sorted(p.name for p in cache_dir.glob("*.npz"))
+
+
+def test_cached_records_hit(tmp_path, monkeypatch):
+    fname = write_lines(tmp_path / "Pyr001_000.bin", synthetic_lines(6))
+    cache_dir = tmp_path / "cache"
+    ref_adc, ref_gprmc = read_cached(fname, cache_dir)
+    assert len(cache_entries(cache_dir)) == 1
+
+    # a cache hit does not parse the file again
+    def fail(*args, **kwargs):
+        raise AssertionError("cache miss")
+    monkeypatch.setattr(pyrlogger, "iter_records", fail)
+    rec_adc, rec_gprmc = read_cached(fname, cache_dir)
+    np.testing.assert_array_equal(rec_adc, ref_adc)
+    np.testing.assert_array_equal(rec_gprmc, ref_gprmc)
+
+
+def test_cached_records_key(tmp_path):
+    lines = synthetic_lines(7)
+    fname = write_lines(tmp_path / "Pyr001_000.bin", lines)
+    cache_dir = tmp_path / "cache"
+    read_cached(fname, cache_dir)
+    # same GPS week rollover period -> same entry
+    read_cached(fname, cache_dir, np.datetime64("2020-01-01"))
+    assert len(cache_entries(cache_dir)) == 1
+
+    # date_of_measure of the config in another rollover period, the GPS dates differ
+    ref_adc, ref_gprmc = pyrlogger.read_records(fname, np.datetime64("2019-05-01"))
+    rec_adc, rec_gprmc = read_cached(fname, cache_dir, np.datetime64("2019-05-01"))
+    np.testing.assert_array_equal(rec_gprmc, ref_gprmc)
+    assert not np.array_equal(rec_gprmc["time"], pyrlogger.read_records(fname, DATE_OF_MEASURE)[1]["time"])
+    assert len(cache_entries(cache_dir)) == 2
+
+    # changed raw file
+    lines[5] = "1 2 3 4 5 6 7"
+    write_lines(tmp_path / "Pyr001_000.bin", lines)
+    ref_adc, ref_gprmc = pyrlogger.read_records(fname, DATE_OF_MEASURE)
+    rec_adc, rec_gprmc = read_cached(fname, cache_dir)
+    np.testing.assert_array_equal(rec_adc, ref_adc)
+    np.testing.assert_array_equal(rec_adc[4], [1, 2, 3, 4, 5, 6, 7])
+    assert len(cache_entries(cache_dir)) == 3
+
+
+def test_cached_records_evict(tmp_path):
+    cache_dir = tmp_path / "cache"
+    fnames = [write_lines(tmp_path / f"Pyr00{i}_000.bin", synthetic_lines(i)) for i in range(1, 4)]
+    entries = []
+    for i, fname in enumerate(fnames[:2]):
+        read_cached(fname, cache_dir)
+        entry, = set(cache_entries(cache_dir)) - set(entries)
+        entries.append(entry)
+        # distinct, increasing access times
+        os.utime(cache_dir / entry, (1000 + i, 1000 + i))
+    size = (cache_dir / entries[0]).stat().st_size
+
+    # the hit marks the first entry as recently used, the second is evicted
+    read_cached(fnames[0], cache_dir)
+    read_cached(fnames[2], cache_dir, cache_size=int(2.5 * size))
+    assert len(cache_entries(cache_dir)) == 2
+    assert entries[0] in cache_entries(cache_dir)
+    assert entries[1] not in cache_entries(cache_dir)
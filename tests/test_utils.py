@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from pyrnet import utils as pyrutils
+
+
+def record(log, key, *deps):
+    log.append(key)
+    return (key,) + deps
+
+
+def append(log, key, *deps):
+    log.append(key)
+
+
+def failing(*args):
+    raise ValueError("failed")
+
+
+def interval(duration):
+    # start and end of the task, CLOCK_MONOTONIC is the same in all processes
+    t0 = time.monotonic()
+    time.sleep(duration)
+    return t0, time.monotonic()
+
+
+def test_taskgraph_order():
+    log = []
+    graph = pyrutils.TaskGraph()
+    graph.add("a", record, args=(log, "a"), deps=["c"])
+    graph.add("b", record, args=(log, "b"))
+    graph.add("c", record, args=(log, "c"), deps=["b"])
+    graph.add("d", record, args=(log, "d"))
+    graph.add("e", record, args=(log, "e"), deps=["a", "d"])
+    results, failed = graph.run()
+    assert not failed
+    # ready tasks in order of the graph, waiting tasks as soon as their dependencies are done
+    assert log == ["b", "c", "a", "d", "e"]
+    # results of the dependencies are passed in order of the dependencies
+    assert results["e"] == ("e", ("a", ("c", ("b",))), ("d",))
+
+
+def test_taskgraph_long_chain():
+    # added in reverse order, every task becomes ready by the task done before
+    log = []
+    graph = pyrutils.TaskGraph()
+    n = 20000
+    for i in range(n):
+        graph.add(i, append, args=(log, i), deps=[i+1] if i < n-1 else [])
+    results, failed = graph.run()
+    assert not failed
+    assert log == list(range(n-1, -1, -1))
+
+
+def test_taskgraph_failed():
+    log = []
+    graph = pyrutils.TaskGraph()
+    graph.add("a", failing)
+    graph.add("b", record, args=(log, "b"), deps=["a"])
+    graph.add("c", record, args=(log, "c"), deps=["b"])
+    graph.add("d", record, args=(log, "d"))
+    graph.add("e", record, args=(log, "e"), deps=["missing"])
+    results, failed = graph.run()
+    assert log == ["d"]
+    assert set(results) == {"d"}
+    assert isinstance(failed["a"], ValueError)
+    assert set(failed) == {"a", "b", "c", "e"}
+
+
+def test_taskgraph_callback():
+    log = []
+    graph = pyrutils.TaskGraph()
+    graph.add("a", record, args=(log, "a"))
+    graph.add("b", record, args=(log, "b"))
+    done = []
+    def callback(key, result):
+        done.append(key)
+        # tasks added while running, depending on done and on later tasks
+        if key == "a":
+            graph.add("c", record, args=(log, "c"), deps=["b", "a"])
+            graph.add("d", failing, deps=["a"])
+            graph.add("e", record, args=(log, "e"), deps=["d"])
+    results, failed = graph.run(callback=callback)
+    assert log == ["a", "b", "c"]
+    assert results["c"] == ("c", ("b",), ("a",))
+    assert set(failed) == {"d", "e"}
+    # skipped tasks are not reported to the callback
+    assert done == ["a", "b", "c", "d"]
+
+
+@pytest.mark.parametrize("memory", [None, 10])
+def test_taskgraph_memory(memory):
+    graph = pyrutils.TaskGraph()
+    mem = {"a": 6, "b": 6, "c": 3, "d": 3, "e": 20}
+    for key, m in mem.items():
+        graph.add(key, interval, args=(0.5,), memory=m)
+    results, failed = graph.run(jobs=3, memory=memory)
+    assert not failed and set(results) == set(mem)
+    # summed memory of the running tasks at the start of every task
+    peak = 0
+    for key, (t0, _) in results.items():
+        running = [k for k, (s, e) in results.items() if s <= t0 < e]
+        if memory is not None and mem[key] > memory:
+            # tasks exceeding the limit run alone
+            assert running == [key]
+            continue
+        peak = max(peak, sum(mem[k] for k in running))
+    if memory is None:
+        assert peak > 10
+    else:
+        assert peak <= memory